@@ -1,3 +1,25 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import QuarantinedReading, Tariff, TariffBand
+
+
+class TariffBandInline(admin.TabularInline):
+    model = TariffBand
+    fields = ("name", "weekdays", "start_hour", "end_hour", "rate", "status")
+    extra = 1
+
+
+@admin.register(Tariff)
+class TariffAdmin(admin.ModelAdmin):
+    list_display = ("name", "organization", "valid_from", "energy_rate", "demand_charge_per_kw", "fixed_fee", "currency", "status")
+    list_filter = ("status", "currency")
+    search_fields = ("name", "organization__name")
+    inlines = [TariffBandInline]
+
+
+@admin.register(QuarantinedReading)
+class QuarantinedReadingAdmin(admin.ModelAdmin):
+    list_display = ("device_id", "measured_at", "reason", "limit_kwh", "received_at")
+    list_filter = ("reason",)
+    readonly_fields = ("device", "measured_at", "reason", "values", "limit_kwh", "received_at")
+    date_hierarchy = "received_at"
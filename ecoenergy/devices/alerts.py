@@ -0,0 +1,140 @@
+# devices/alerts.py
+#
+# ──────────────────────────────────────────────────────────────────────────────
+# Propósito del módulo
+# ──────────────────────────────────────────────────────────────────────────────
+# Evaluación de AlertRule sobre lotes de lecturas y registro de AlertEvent.
+#
+# - ThresholdTable carga UNA vez los umbrales efectivos (producto × regla) en
+#   matrices NumPy, respetando la misma prioridad que
+#   AlertRule.effective_thresholds_for (override de ProductAlertRule si define
+#   min y max; si no, los defaults de la regla).
+# - evaluate() compara todas las lecturas del lote contra todas las reglas en
+#   una sola pasada vectorizada y devuelve, por lectura, la regla más severa.
+#   Cada regla se evalúa sobre la métrica que indica su unidad (kWh, W, A, V...)
+#   con el umbral convertido a la unidad canónica (devices/units.py). Los
+#   umbrales propios de un producto están en su ProductAlertRule.unit_override
+#   si la define: métrica y escala salen de esa unidad, por celda.
+# - record_alert_events() / close_alert_events() son el camino "bulk" para
+#   abrir y cerrar AlertEvent (resolved_at = NULL significa alerta abierta), y
+#   publish_alert_events() avisa las transiciones al dashboard en vivo.
+# ──────────────────────────────────────────────────────────────────────────────
+
+import numpy as np
+
+from .events import broker
+from .models import AlertEvent, AlertRule, ProductAlertRule
+from .units import METRIC_FIELDS, UNIT_INDEX
+
+# Orden de prioridad cuando una lectura gatilla varias reglas a la vez
+SEVERITY_RANK = {
+    AlertRule.Severity.CRITICAL: 0,
+    AlertRule.Severity.HIGH: 1,
+    AlertRule.Severity.MEDIUM: 2,
+    AlertRule.Severity.LOW: 3,
+}
+
+class ThresholdTable:
+    """Umbrales efectivos de las reglas activas para un conjunto de productos."""
+
+    def __init__(self, product_ids, units=None):
+        units = tuple(UNIT_INDEX) if units is None else units
+        product_ids = sorted(set(product_ids))
+        self.product_index = {pid: i for i, pid in enumerate(product_ids)}
+
+        links = list(
+            ProductAlertRule.objects.filter(
+                product_id__in=product_ids,
+                status="ACTIVE",
+                alert_rule__status="ACTIVE",
+                alert_rule__unit__in=units,
+            ).select_related("alert_rule")
+        )
+        rules = {link.alert_rule_id: link.alert_rule for link in links}
+        self.rules = sorted(rules.values(), key=lambda r: (SEVERITY_RANK.get(r.severity, 99), r.id))
+        rule_index = {rule.id: j for j, rule in enumerate(self.rules)}
+
+        shape = (len(product_ids), len(self.rules))
+        # Métrica (columna de la matriz de lecturas) y unidad de cada (producto, regla):
+        # la de la regla, salvo que el producto use umbrales propios en otra unidad
+        self.metric = np.tile(
+            np.array([METRIC_FIELDS.index(UNIT_INDEX[r.unit][0]) for r in self.rules], dtype=np.int64), (shape[0], 1)
+        )
+        self.units = {}
+        self.low = np.full(shape, np.nan)
+        self.high = np.full(shape, np.nan)
+        for link in links:
+            rule = link.alert_rule
+            i, j = self.product_index[link.product_id], rule_index[rule.id]
+            if link.min_threshold is not None and link.max_threshold is not None:
+                lo, hi = link.min_threshold, link.max_threshold
+                unit = link.unit_override or rule.unit
+            else:
+                lo, hi = rule.default_min_threshold, rule.default_max_threshold
+                unit = rule.unit
+            if unit not in UNIT_INDEX:
+                continue        # unidad desconocida: el umbral no se puede interpretar, no gatilla
+            # Umbrales llevados a la unidad canónica de la métrica (ej.: kW -> W)
+            field, factor = UNIT_INDEX[unit]
+            self.metric[i, j] = METRIC_FIELDS.index(field)
+            self.units[i, j] = unit
+            self.low[i, j] = np.nan if lo is None else lo * factor
+            self.high[i, j] = np.nan if hi is None else hi * factor
+
+    def evaluate(self, product_ids, values):
+        """
+        values: matriz (lecturas × METRIC_FIELDS) en unidades canónicas, NaN si
+        la lectura no trae esa métrica.
+        Retorna un array con el índice (en self.rules) de la regla más severa
+        gatillada por cada lectura, o -1 si ninguna aplica.
+        """
+        values = np.asarray(values, dtype=np.float64).reshape(-1, len(METRIC_FIELDS))
+        if not self.rules or not len(values):
+            return np.full(len(values), -1, dtype=np.int64)
+
+        rows = np.fromiter((self.product_index[p] for p in product_ids), dtype=np.int64, count=len(values))
+        # Cada columna j toma la métrica de la regla j para el producto de la lectura: (lecturas × reglas)
+        v = np.take_along_axis(values, self.metric[rows], axis=1)
+        # Comparar contra NaN siempre da False: umbral o métrica ausente = no gatilla
+        with np.errstate(invalid="ignore"):
+            hit = (v < self.low[rows]) | (v > self.high[rows])
+        # Las reglas están ordenadas por severidad: la primera columna True es la más grave
+        first = hit.argmax(axis=1)
+        return np.where(hit.any(axis=1), first, -1)
+
+    def rule_at(self, index):
+        return self.rules[index] if index >= 0 else None
+
+    def unit_for(self, product_id, index):
+        """Unidad en que están los umbrales de la regla `index` para ese producto."""
+        return self.units.get((self.product_index[product_id], index), self.rules[index].unit)
+
+
+def record_alert_events(events):
+    """Crea en bloque los AlertEvent dados (instancias sin guardar)."""
+    return AlertEvent.objects.bulk_create(events)
+
+
+def close_alert_events(alert_rule, device_ids, resolved_at):
+    """Cierra con un solo UPDATE las alertas abiertas de una regla en esos dispositivos."""
+    return AlertEvent.objects.filter(
+        alert_rule=alert_rule, device_id__in=device_ids, resolved_at__isnull=True
+    ).update(resolved_at=resolved_at)
+
+
+def publish_alert_events(events, event_type="alert"):
+    """
+    Publica transiciones de alerta en el pub/sub en vivo.
+    Cada evento necesita device (con organization_id y name) y alert_rule cargados.
+    """
+    for e in events:
+        broker.publish(e.device.organization_id, event_type, {
+            "organization_id": e.device.organization_id,
+            "device_id": e.device_id,
+            "device": e.device.name,
+            "rule": e.alert_rule.name,
+            "severity": e.alert_rule.severity,
+            "occurred_at": e.occurred_at.isoformat(),
+            "resolved_at": e.resolved_at.isoformat() if e.resolved_at else None,
+            "message": e.message,
+        })
@@ -0,0 +1,188 @@
+# devices/anomaly.py
+#
+# ──────────────────────────────────────────────────────────────────────────────
+# Propósito del módulo
+# ──────────────────────────────────────────────────────────────────────────────
+# Detector de consumo anómalo en línea, complemento de los umbrales fijos de
+# AlertRule: encuentra equipos que se alejan de SU consumo habitual (ej.: un
+# compresor que empieza a fallar y consume de más a la misma hora de siempre).
+#
+# - Señal: potencia media de cada lectura (kWh / horas desde la anterior, el
+#   mismo intervalo que usa devices/validation.py).
+# - Estado O(1) por dispositivo: media y varianza EWMA por hora de la semana
+#   (168 casillas), guardado como matriz float32 en DeviceAnomalyState.
+# - Puntaje: |valor - media| / desviación de esa hora. Sobre
+#   settings.ANOMALY_SCORE_THRESHOLD se abre un AlertEvent; se cierra cuando
+#   el puntaje baja de CLEAR_RATIO veces el umbral.
+#
+# Corre dentro de la transacción de ingesta: el estado de los dispositivos del
+# lote se lee con UNA consulta (SELECT ... FOR UPDATE) a arrays NumPy, cada
+# lectura actualiza su casilla en memoria y se guarda todo en bloque al final.
+# No hay lecturas a la base por cada medición.
+# ──────────────────────────────────────────────────────────────────────────────
+
+import math
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .alerts import close_alert_events, record_alert_events
+from .models import AlertEvent, AlertRule, DeviceAnomalyState
+from .timeseries import local_calendar
+
+ANOMALY_RULE_NAME = "Anomalous Consumption"
+
+SEASON_SLOTS = 168
+MEAN, VAR, COUNT = 0, 1, 2
+
+# Peso de cada lectura nueva en la media/varianza de su hora de la semana
+ANOMALY_ALPHA = 0.05
+# Lecturas de una casilla antes de empezar a puntuarla
+ANOMALY_WARMUP = 8
+# Piso de la desviación: relativo a la media y absoluto (kW), para consumos muy estables
+MIN_STD_RATIO = 0.05
+MIN_STD_KW = 0.01
+# Histéresis: la alerta se cierra bajo esta fracción del umbral
+CLEAR_RATIO = 0.5
+# Lecturas tras un hueco más largo no representan una hora típica: se ignoran
+MAX_GAP_S = 6 * 3600
+
+
+def get_anomaly_rule():
+    """Regla de catálogo usada para los eventos de consumo anómalo."""
+    rule, _ = AlertRule.objects.get_or_create(
+        name=ANOMALY_RULE_NAME,
+        severity=AlertRule.Severity.MEDIUM,
+        defaults={"unit": "kW"},
+    )
+    return rule
+
+
+class AnomalyStore:
+    """
+    Estado de un conjunto de dispositivos como arrays: state (dispositivos x 3 x 168)
+    con media, varianza y conteo por hora de la semana, e índice por device_id.
+    """
+
+    def __init__(self, device_ids, lock=False):
+        self.ids = sorted(set(device_ids))
+        self.row = {pk: i for i, pk in enumerate(self.ids)}
+        self.state = np.zeros((len(self.ids), 3, SEASON_SLOTS))
+        self.anomalous = np.zeros(len(self.ids), dtype=bool)
+        self.score = np.zeros(len(self.ids))
+
+        saved = DeviceAnomalyState.objects.filter(device_id__in=self.ids)
+        self.saved = {s.device_id: s for s in (saved.select_for_update() if lock else saved)}
+        for pk, s in self.saved.items():
+            i = self.row[pk]
+            self.state[i] = np.frombuffer(bytes(s.state), dtype=np.float32).reshape(3, SEASON_SLOTS)
+            self.anomalous[i] = s.anomalous
+            self.score[i] = s.score
+
+    def update(self, row, slot, value, threshold):
+        """
+        Puntúa `value` contra la casilla (row, slot) y la actualiza.
+        Retorna (puntaje, media esperada antes de actualizar).
+        """
+        cell = self.state[row, :, slot]
+        mean, var, count = cell
+        score = 0.0
+        if count >= ANOMALY_WARMUP:
+            std = max(math.sqrt(var), MIN_STD_RATIO * abs(mean), MIN_STD_KW)
+            score = abs(value - mean) / std
+            # Un pico mueve la línea base a lo más `threshold` desviaciones: una
+            # falla puntual no la contamina, un cambio sostenido igual la arrastra
+            value = min(max(value, mean - threshold * std), mean + threshold * std)
+
+        # Promedio acumulado hasta que 1/n baja de alpha; desde ahí EWMA
+        alpha = max(ANOMALY_ALPHA, 1 / (count + 1))
+        diff = value - mean
+        increment = alpha * diff
+        cell[MEAN] = mean + increment
+        cell[VAR] = (1 - alpha) * (var + diff * increment)
+        cell[COUNT] = min(count + 1, 1e6)
+        self.score[row] = score
+        return score, mean
+
+    def save(self):
+        created, changed = [], []
+        now = timezone.now()
+        for pk, i in self.row.items():
+            s = self.saved.get(pk)
+            if s is None:
+                s = DeviceAnomalyState(device_id=pk)
+                created.append(s)
+            else:
+                changed.append(s)
+            s.state = self.state[i].astype(np.float32).tobytes()
+            s.anomalous = bool(self.anomalous[i])
+            s.score = float(self.score[i])
+            s.updated_at = now
+        DeviceAnomalyState.objects.bulk_create(created)
+        DeviceAnomalyState.objects.bulk_update(changed, ["state", "anomalous", "score", "updated_at"])
+
+
+def detect_anomalies(readings, energy, elapsed, device_map, threshold=None):
+    """
+    readings: lecturas aceptadas, ordenadas por (device_id, measured_at).
+    energy / elapsed: kWh y segundos desde la lectura anterior de cada una.
+    Actualiza el estado, crea los AlertEvent abiertos y cierra los que
+    volvieron a la normalidad. Debe llamarse dentro de la transacción de ingesta.
+    Retorna (eventos abiertos, eventos cerrados).
+    """
+    threshold = settings.ANOMALY_SCORE_THRESHOLD if threshold is None else threshold
+    store = AnomalyStore([r["device_id"] for r in readings], lock=True)
+
+    n = len(readings)
+    epoch = np.fromiter((int(r["measured_at"].timestamp()) for r in readings), dtype=np.int64, count=n)
+    hour, weekday, _ = local_calendar(epoch)
+    slots = weekday * 24 + hour
+    with np.errstate(divide="ignore", invalid="ignore"):
+        kw = energy / (elapsed / 3600)
+    usable = np.isfinite(kw) & (elapsed <= MAX_GAP_S)
+
+    rule = None
+    opened = {}
+    resolved = {}
+    events = []
+    for i in np.flatnonzero(usable).tolist():
+        r = readings[i]
+        row = store.row[r["device_id"]]
+        score, expected = store.update(row, int(slots[i]), float(kw[i]), threshold)
+        if score >= threshold and not store.anomalous[row]:
+            store.anomalous[row] = True
+            rule = rule or get_anomaly_rule()
+            event = AlertEvent(
+                device=device_map[r["device_id"]],
+                alert_rule=rule,
+                occurred_at=r["measured_at"],
+                message=f"{kw[i]:.2f} kW vs. {expected:.2f} kW habituales a esta hora (puntaje {score:.1f})",
+            )
+            events.append(event)
+            opened[r["device_id"]] = event
+        elif store.anomalous[row] and score < threshold * CLEAR_RATIO:
+            store.anomalous[row] = False
+            if r["device_id"] in opened:
+                # Abierta y cerrada en el mismo lote: se guarda ya resuelta
+                opened.pop(r["device_id"]).resolved_at = r["measured_at"]
+            else:
+                resolved[r["device_id"]] = r["measured_at"]
+
+    store.save()
+
+    # Cerrar antes de crear: una alerta reabierta en este lote no debe cerrarse
+    closed = []
+    if resolved:
+        rule = rule or get_anomaly_rule()
+        closed = list(
+            AlertEvent.objects.filter(alert_rule=rule, device_id__in=list(resolved), resolved_at__isnull=True)
+            .prefetch_related("device", "alert_rule")     # sin join: device/regla pueden estar en otra BD
+        )
+        for device_id, at in resolved.items():
+            close_alert_events(rule, [device_id], at)
+        for event in closed:
+            event.resolved_at = resolved[event.device_id]
+
+    record_alert_events(events)
+    return events, closed
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class DevicesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'devices'
+
+    def ready(self):
+        # Invalida las facturas cacheadas al cambiar una tarifa (devices/billing.py)
+        from . import billing  # noqa: F401
+        # Invalida el listado de zonas al mover dispositivos o zonas (devices/zones.py)
+        from . import zones  # noqa: F401
@@ -0,0 +1,129 @@
+# devices/benchmark.py
+#
+# ──────────────────────────────────────────────────────────────────────────────
+# Propósito del módulo
+# ──────────────────────────────────────────────────────────────────────────────
+# Benchmark de organizaciones: en qué percentil de la flota completa está el
+# consumo de cada organización, por categoría de producto.
+#
+# Métricas (últimos BENCHMARK_DAYS de rollups diarios):
+# - DEVICE_KWH: kWh/día de cada dispositivo activo (total / días con datos).
+#   La organización se compara con el promedio de sus equipos de la categoría.
+# - ZONE_KWH: kWh/día de cada zona (suma de sus dispositivos), sin categoría.
+#
+# La flota está repartida en shards: cada shard resume sus valores en sketches
+# de cuantiles (devices/sketches.py) y solo esos sketches viajan; se combinan
+# sumando conteos, sin juntar todos los valores en memoria. El percentil de
+# cada organización se lee del sketch combinado y se guarda en
+# OrganizationBenchmark; el dashboard solo lee esa tabla.
+#
+# Lo corre periódicamente:  python manage.py benchmark_organizations
+# ──────────────────────────────────────────────────────────────────────────────
+
+from collections import defaultdict
+from datetime import timedelta
+
+import numpy as np
+from django.db import router, transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from ecoenergy.sharding import fan_out
+
+from .models import Device, MeasurementRollup, OrganizationBenchmark, Product
+from .rollups import floor_day
+from .sketches import QuantileSketch
+
+BENCHMARK_DAYS = 30
+BENCHMARK_BATCH_SIZE = 500
+
+DEVICE_KWH = OrganizationBenchmark.Metric.DEVICE_KWH
+ZONE_KWH = OrganizationBenchmark.Metric.ZONE_KWH
+
+
+def group_mean(groups, values):
+    """(grupos distintos, promedio de `values` en cada uno)."""
+    keys, inverse = np.unique(groups, return_inverse=True)
+    return keys, np.bincount(inverse, values) / np.bincount(inverse)
+
+
+def shard_benchmark(start, end, category_of):
+    """
+    Resume el shard actual. Retorna (sketches {(métrica, category_id): sketch},
+    valores {(organization_id, métrica, category_id): valor}); category_id None
+    es "todas las categorías".
+    """
+    devices = list(Device.objects.filter(status="ACTIVE").values_list("id", "organization_id", "zone_id", "product_id"))
+    # Rollups en la base de series temporales: sin join, agrupado por dispositivo
+    usage = {
+        row["device_id"]: row["total"] / row["days"]
+        for row in MeasurementRollup.objects.filter(
+            device_id__in=[d[0] for d in devices], resolution=MeasurementRollup.Resolution.DAY,
+            bucket_start__gte=start, bucket_start__lt=end,
+        )
+        .values("device_id")
+        .annotate(total=Sum("energy_kwh"), days=Count("id"))
+        .order_by()
+    }
+    kept = [(org, zone, category_of.get(product, -1), usage[pk]) for pk, org, zone, product in devices if pk in usage]
+    if not kept:
+        return {}, {}
+    org, zone, category, kwh = (np.array(col) for col in zip(*kept))
+    org, zone, category = org.astype(np.int64), zone.astype(np.int64), category.astype(np.int64)
+
+    sketches = {(DEVICE_KWH, None): QuantileSketch.from_values(kwh)}
+    values = {}
+    for org_id, mean in zip(*group_mean(org, kwh)):
+        values[(int(org_id), DEVICE_KWH, None)] = float(mean)
+
+    categorized = category >= 0
+    for category_id in np.unique(category[categorized]).tolist():
+        sketches[(DEVICE_KWH, category_id)] = QuantileSketch.from_values(kwh[category == category_id])
+    # (organización, categoría) empaquetados en un entero para agrupar con np.unique
+    width = int(category.max()) + 1
+    packed, means = group_mean(org[categorized] * width + category[categorized], kwh[categorized])
+    for key, mean in zip(packed.tolist(), means):
+        values[(key // width, DEVICE_KWH, key % width)] = float(mean)
+
+    zones, first, inverse = np.unique(zone, return_index=True, return_inverse=True)
+    zone_kwh = np.bincount(inverse, kwh)
+    sketches[(ZONE_KWH, None)] = QuantileSketch.from_values(zone_kwh)
+    for org_id, mean in zip(*group_mean(org[first], zone_kwh)):
+        values[(int(org_id), ZONE_KWH, None)] = float(mean)
+    return sketches, values
+
+
+def benchmark_organizations(now=None):
+    """
+    Recalcula OrganizationBenchmark con la flota de todos los shards.
+    Retorna la cantidad de filas escritas.
+    """
+    end = floor_day(now or timezone.now())
+    start = end - timedelta(days=BENCHMARK_DAYS)
+    # Catálogo global: categoría de cada producto, sin join desde el device (otro shard)
+    category_of = dict(Product.objects.values_list("id", "category_id"))
+
+    parts = defaultdict(list)
+    values = {}
+    for shard_sketches, shard_values in fan_out(lambda: shard_benchmark(start, end, category_of)):
+        for key, sketch in shard_sketches.items():
+            parts[key].append(sketch)
+        values.update(shard_values)     # cada organización vive en un solo shard
+    fleet = {key: QuantileSketch.merge_all(sketches) for key, sketches in parts.items()}
+    quantiles = {key: sketch.quantile([0.5, 0.9]) for key, sketch in fleet.items()}
+
+    rows = []
+    for (organization_id, metric, category_id), value in values.items():
+        sketch = fleet[(metric, category_id)]
+        p50, p90 = quantiles[(metric, category_id)]
+        rows.append(OrganizationBenchmark(
+            organization_id=organization_id, category_id=category_id, metric=metric,
+            value=round(value, 4), percentile=round(100 * sketch.rank(value), 1),
+            fleet_p50=round(float(p50), 4), fleet_p90=round(float(p90), 4), peers=sketch.count,
+            period_start=start, period_end=end,
+        ))
+
+    with transaction.atomic(using=router.db_for_write(OrganizationBenchmark)):
+        OrganizationBenchmark.objects.all().delete()
+        OrganizationBenchmark.objects.bulk_create(rows, batch_size=BENCHMARK_BATCH_SIZE)
+    return len(rows)
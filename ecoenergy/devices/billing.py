@@ -0,0 +1,257 @@
+# devices/billing.py
+#
+# ──────────────────────────────────────────────────────────────────────────────
+# Propósito del módulo
+# ──────────────────────────────────────────────────────────────────────────────
+# Motor de costos: valoriza el consumo de una organización con su Tariff
+# (bandas horarias, cargo por demanda y cargo fijo) para un periodo de
+# facturación (mes calendario, hora local).
+#
+# 1) Se cargan los rollups horarios del periodo como arrays NumPy
+#    (devices/timeseries.py: load_hourly_arrays).
+# 2) La tarifa se convierte en una tabla 7x24 (día de la semana x hora) de
+#    precios; el precio de cada fila es un solo indexado rates[día, hora].
+# 3) Los desgloses diario, por banda, zona y dispositivo son np.bincount
+#    sobre el mismo vector de costos: una pasada, sin loops por fila.
+#
+# La demanda facturada es el máximo de 15 minutos del mes (DemandPeak, ver
+# devices/demand.py); sin él se aproxima con la hora de mayor consumo.
+#
+# El resultado (dict serializable) se cachea por (organización, periodo) con
+# las claves versionadas de organizations/cache.py; cambiar la tarifa o
+# desactivar la organización lo invalida. price_invoices lo precalcula.
+# ──────────────────────────────────────────────────────────────────────────────
+
+from datetime import date, datetime
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from ecoenergy.sharding import use_organization
+from organizations.cache import invalidate_tenant, tenant_cache_key
+
+from .demand import peak_for
+from .models import Device, Tariff, TariffBand, Zone
+from .timeseries import load_hourly_arrays, local_calendar
+from .zones import rollup_subtrees, tree_order
+
+# El mes en curso cambia con cada refresh_rollups; los cerrados casi nunca
+BILLING_CACHE_TIMEOUT_OPEN = 15 * 60
+BILLING_CACHE_TIMEOUT_CLOSED = 7 * 24 * 3600
+
+BASE_BAND = "Base"
+
+
+def parse_period(value=None):
+    """
+    "YYYY-MM" -> (etiqueta, inicio, fin) del mes en hora local (fin exclusivo).
+    Sin valor, el mes en curso. Lanza ValueError si el formato es inválido.
+    """
+    if value:
+        try:
+            year, month = (int(part) for part in value.split("-"))
+            first = date(year, month, 1)
+        except ValueError:
+            raise ValueError(f"Periodo inválido: {value} (se espera YYYY-MM)")
+    else:
+        first = timezone.localdate().replace(day=1)
+    following = date(first.year + first.month // 12, first.month % 12 + 1, 1)
+    start = timezone.make_aware(datetime.combine(first, datetime.min.time()))
+    end = timezone.make_aware(datetime.combine(following, datetime.min.time()))
+    return f"{first:%Y-%m}", start, end
+
+
+def tariff_for(organization_id, start):
+    """Tarifa activa vigente al inicio del periodo (la de valid_from más reciente)."""
+    return (
+        Tariff.objects.filter(organization_id=organization_id, status="ACTIVE", valid_from__lte=start.date())
+        .order_by("-valid_from")
+        .first()
+    )
+
+
+def rate_tables(tariff):
+    """
+    Tablas 7x24 (día de la semana x hora local) de precio por kWh y de índice
+    de banda (0 = base), más los nombres de las bandas en ese orden.
+    """
+    rates = np.full((7, 24), tariff.energy_rate, dtype=np.float64)
+    band_index = np.zeros((7, 24), dtype=np.int64)
+    names = [BASE_BAND]
+    for band in tariff.bands.filter(status="ACTIVE").order_by("id"):
+        days = [int(d) for d in band.weekdays if d.isdigit() and int(d) < 7]
+        names.append(band.name)
+        for day in days:
+            rates[day, band.start_hour:band.end_hour] = band.rate
+            band_index[day, band.start_hour:band.end_hour] = len(names) - 1
+    return rates, band_index, names
+
+
+def peak_demand(epoch, energy):
+    """
+    Demanda máxima aproximada desde rollups horarios (si no hay DemandPeak de
+    15 minutos): kWh de la hora de mayor consumo de toda la organización =
+    kW promedio de esa hora.
+    Retorna (kW, timestamp epoch de la hora) o (0.0, None) si no hay datos.
+    """
+    if not len(epoch):
+        return 0.0, None
+    hours, inverse = np.unique(epoch, return_inverse=True)
+    totals = np.bincount(inverse, weights=energy)
+    top = int(totals.argmax())
+    return float(totals[top]), int(hours[top])
+
+
+def _to_datetime(seconds):
+    return timezone.localtime(datetime.fromtimestamp(seconds, tz=timezone.get_current_timezone()))
+
+
+def price_period(organization_id, period=None):
+    """
+    Valoriza el periodo para la organización. Retorna un dict con totales y
+    desgloses (daily, bands, zones, devices), o None si no tiene tarifa vigente.
+    """
+    label, start, end = parse_period(period)
+    tariff = tariff_for(organization_id, start)
+    if tariff is None:
+        return None
+    rates, band_index, band_names = rate_tables(tariff)
+
+    with use_organization(organization_id):
+        devices = list(Device.objects.filter(organization_id=organization_id).values_list("id", "name", "zone_id"))
+        zones = list(Zone.objects.filter(organization_id=organization_id).values("id", "name", "path", "parent_id"))
+        device, epoch, energy = load_hourly_arrays([d[0] for d in devices], start, end)
+        peak = peak_for(organization_id, start.date())
+
+    hour, weekday, dates = local_calendar(epoch)
+    cost = energy * rates[weekday, hour]
+
+    # Día del periodo de cada fila (fecha local - primer día)
+    first_day = np.datetime64(start.date(), "D")
+    n_days = int((np.datetime64(end.date(), "D") - first_day).astype(np.int64))
+    day = (dates - first_day).astype(np.int64)
+    daily_kwh = np.bincount(day, weights=energy, minlength=n_days)
+    daily_cost = np.bincount(day, weights=cost, minlength=n_days)
+
+    bands = band_index[weekday, hour]
+    band_kwh = np.bincount(bands, weights=energy, minlength=len(band_names))
+    band_cost = np.bincount(bands, weights=cost, minlength=len(band_names))
+
+    # Dispositivos -> posición en `devices`; zonas -> posición en `zone_ids`
+    device_ids = np.array([d[0] for d in devices], dtype=np.int64)
+    order = np.argsort(device_ids)
+    position = order[np.searchsorted(device_ids, device, sorter=order)] if len(device) else device
+    device_kwh = np.bincount(position, weights=energy, minlength=len(devices))
+    device_cost = np.bincount(position, weights=cost, minlength=len(devices))
+
+    zone_ids = sorted({d[2] for d in devices})
+    zone_position = {zid: i for i, zid in enumerate(zone_ids)}
+    zone_of_device = np.array([zone_position[d[2]] for d in devices], dtype=np.int64)
+    zone_kwh = np.bincount(zone_of_device, weights=device_kwh, minlength=len(zone_ids))
+    zone_cost = np.bincount(zone_of_device, weights=device_cost, minlength=len(zone_ids))
+
+    # Totales de cada subárbol (zona + subzonas) para bajar de edificio a sala
+    zone_names = {z["id"]: z["name"] for z in zones}
+    subtrees = rollup_subtrees(
+        {z["id"]: z["path"] for z in zones},
+        {zid: np.array([k, c]) for zid, k, c in zip(zone_ids, zone_kwh, zone_cost)},
+    )
+    own = dict(zip(zone_ids, zip(zone_kwh, zone_cost)))
+
+    # Demanda de 15 minutos medida en línea (devices/demand.py); si no existe, la horaria
+    if peak is not None:
+        peak_kw, peak_at = peak.demand_kw, timezone.localtime(peak.interval_start)
+        device_names = {str(pk): name for pk, name, _ in devices}
+        peak_devices = [
+            {"device": device_names.get(pk, pk), "energy_kwh": kwh} for pk, kwh in peak.devices.items()
+        ]
+    else:
+        peak_kw, peak_epoch = peak_demand(epoch, energy)
+        peak_at = _to_datetime(peak_epoch) if peak_epoch is not None else None
+        peak_devices = []
+    energy_cost = float(cost.sum())
+    demand_charge = peak_kw * tariff.demand_charge_per_kw
+
+    return {
+        "organization_id": organization_id,
+        "period": label,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "tariff": tariff.name,
+        "currency": tariff.currency,
+        "energy_kwh": round(float(energy.sum()), 3),
+        "energy_cost": round(energy_cost, 2),
+        "peak_kw": round(peak_kw, 3),
+        "peak_at": peak_at.isoformat() if peak_at is not None else None,
+        "peak_interval": "15min" if peak is not None else "1h",
+        "peak_devices": peak_devices,
+        "demand_charge": round(demand_charge, 2),
+        "fixed_fee": round(tariff.fixed_fee, 2),
+        "total": round(energy_cost + demand_charge + tariff.fixed_fee, 2),
+        "daily": [
+            {"date": str(first_day + i), "energy_kwh": round(float(k), 3), "cost": round(float(c), 2)}
+            for i, (k, c) in enumerate(zip(daily_kwh, daily_cost))
+        ],
+        "bands": [
+            {"name": name, "energy_kwh": round(float(k), 3), "cost": round(float(c), 2)}
+            for name, k, c in zip(band_names, band_kwh, band_cost)
+        ],
+        "zones": [
+            {
+                "zone_id": z["id"], "zone": z["name"], "parent_id": z["parent_id"],
+                "depth": z["path"].count(Zone.PATH_SEPARATOR) - 1,
+                "energy_kwh": round(float(own.get(z["id"], (0, 0))[0]), 3),
+                "cost": round(float(own.get(z["id"], (0, 0))[1]), 2),
+                "subtree_kwh": round(float(subtrees[z["id"]][0]), 3),
+                "subtree_cost": round(float(subtrees[z["id"]][1]), 2),
+            }
+            for z in tree_order(zones) if z["id"] in subtrees
+        ],
+        "devices": sorted(
+            (
+                {
+                    "device_id": pk, "device": name, "zone": zone_names.get(zid, ""),
+                    "energy_kwh": round(float(k), 3), "cost": round(float(c), 2),
+                }
+                for (pk, name, zid), k, c in zip(devices, device_kwh, device_cost)
+            ),
+            key=lambda row: -row["cost"],
+        ),
+        "computed_at": timezone.now().isoformat(),
+    }
+
+
+def _cache_timeout(end):
+    return BILLING_CACHE_TIMEOUT_OPEN if end > timezone.now() else BILLING_CACHE_TIMEOUT_CLOSED
+
+
+def precompute_invoice(organization_id, period=None):
+    """Recalcula el periodo y reemplaza la entrada en caché."""
+    label, _, end = parse_period(period)
+    result = price_period(organization_id, label)
+    cache.set(tenant_cache_key(organization_id, "invoice", label), result, _cache_timeout(end))
+    return result
+
+
+def invoice(organization_id, period=None):
+    """Factura del periodo desde caché (se calcula si no está)."""
+    label, _, _ = parse_period(period)
+    result = cache.get(tenant_cache_key(organization_id, "invoice", label))
+    if result is None:
+        result = precompute_invoice(organization_id, label)
+    return result
+
+
+@receiver([post_save, post_delete], sender=Tariff)
+def _tariff_changed(sender, instance, **kwargs):
+    invalidate_tenant(instance.organization_id)
+
+
+@receiver([post_save, post_delete], sender=TariffBand)
+def _tariff_band_changed(sender, instance, **kwargs):
+    organization_id = Tariff.objects.filter(pk=instance.tariff_id).values_list("organization_id", flat=True).first()
+    if organization_id is not None:
+        invalidate_tenant(organization_id)
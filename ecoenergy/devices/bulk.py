@@ -0,0 +1,82 @@
+# devices/bulk.py
+#
+# ──────────────────────────────────────────────────────────────────────────────
+# Propósito del módulo
+# ──────────────────────────────────────────────────────────────────────────────
+# Acciones masivas sobre dispositivos desde lista_dispositivos:
+# - "deactivate":     status = INACTIVE (mismo borrado lógico que eliminar_dispositivo)
+# - "move_zone":      reasignar a otra zona de la MISMA organización
+# - "change_product": cambiar el producto del catálogo
+#
+# Cada acción es: 1 SELECT de los ids en alcance (para el resumen por id) y
+# 1 UPDATE acotado al mismo alcance del usuario (queryset ya filtrado por
+# organización), en vez de un fetch + save() por dispositivo.
+# ──────────────────────────────────────────────────────────────────────────────
+
+from django.db import router, transaction
+from django.utils import timezone
+
+from .models import Device
+from .zones import invalidate_zone_summary
+
+BULK_MAX_IDS = 1000
+
+BULK_ACTIONS = ("deactivate", "move_zone", "change_product")
+
+# Motivos por id en el resumen
+RESULT_OK = "ok"
+RESULT_NOT_FOUND = "not_found"                  # inexistente, inactivo o fuera de alcance
+RESULT_OTHER_ORGANIZATION = "other_organization"
+RESULT_UNCHANGED = "unchanged"
+
+
+def parse_device_ids(raw_ids):
+    """Normaliza la lista de ids (únicos, en orden). Lanza ValueError si es inválida."""
+    if not isinstance(raw_ids, list) or not raw_ids:
+        raise ValueError("ids debe ser una lista no vacía")
+    if len(raw_ids) > BULK_MAX_IDS:
+        raise ValueError(f"Máximo {BULK_MAX_IDS} dispositivos por acción")
+    try:
+        return list(dict.fromkeys(int(i) for i in raw_ids))
+    except (TypeError, ValueError):
+        raise ValueError("ids debe contener solo números")
+
+
+def apply_bulk_action(devices, action, ids, zone=None, product=None):
+    """
+    Aplica `action` a los dispositivos `ids` dentro del queryset permitido
+    `devices` (alcance del usuario). Retorna {"updated": int, "results": {id: motivo}}.
+    """
+    if action not in BULK_ACTIONS:
+        raise ValueError(f"Acción inválida: {action}")
+
+    scope = devices.filter(pk__in=ids, status="ACTIVE")
+    results = dict.fromkeys(ids, RESULT_NOT_FOUND)
+    eligible = []
+    organization_ids = set()
+    for pk, organization_id, zone_id, product_id in scope.values_list(
+        "id", "organization_id", "zone_id", "product_id"
+    ):
+        if action == "move_zone" and organization_id != zone.organization_id:
+            results[pk] = RESULT_OTHER_ORGANIZATION
+        elif (action == "move_zone" and zone_id == zone.id) or (action == "change_product" and product_id == product.id):
+            results[pk] = RESULT_UNCHANGED
+        else:
+            results[pk] = RESULT_OK
+            eligible.append(pk)
+            organization_ids.add(organization_id)
+
+    changes = {
+        "deactivate": {"status": "INACTIVE"},
+        "move_zone": {"zone": zone},
+        "change_product": {"product": product},
+    }[action]
+    updated = 0
+    if eligible:
+        # Mismo alcance que la lectura: el UPDATE nunca sale de la organización del usuario
+        with transaction.atomic(using=router.db_for_write(Device)):
+            updated = scope.filter(pk__in=eligible).update(updated_at=timezone.now(), **changes)
+        if action != "change_product":
+            # El UPDATE no emite post_save: conteos por zona del listado de zonas
+            invalidate_zone_summary(*organization_ids)
+    return {"updated": updated, "results": results}
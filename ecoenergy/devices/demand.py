@@ -0,0 +1,271 @@
+# devices/demand.py
+#
+# ──────────────────────────────────────────────────────────────────────────────
+# Propósito del módulo
+# ──────────────────────────────────────────────────────────────────────────────
+# Demanda de 15 minutos (la que cobra la distribuidora) calculada en línea:
+#
+# 1) record_demand(measurements) corre dentro de la transacción de ingesta:
+#    suma la energía del lote por (zona, intervalo de 15 min) y la acumula en
+#    DemandInterval: crea las filas que falten ignorando conflictos, las relee
+#    con SELECT ... FOR UPDATE y suma (bulk_update). Dos lotes concurrentes
+#    sobre el mismo intervalo se serializan en el bloqueo en vez de chocar con
+#    la restricción única o duplicar filas; igual con los DemandPeak del mes.
+# 2) Con los totales ya actualizados de los intervalos tocados, compara contra
+#    el máximo vigente del mes (DemandPeak) de cada zona y de la organización.
+#    Solo cuando el máximo sube se consulta qué dispositivos aportaron en ese
+#    intervalo (un rango de 15 minutos en Measurement).
+#
+# Así el máximo del mes se lee directo de DemandPeak, sin recorrer la tabla
+# cruda. rebuild_demand() recalcula un mes completo desde Measurement (para
+# datos anteriores a este módulo o correcciones): la BD suma cada bloque de
+# dispositivos por (dispositivo, intervalo) día por día, y NumPy acumula esas
+# sumas parciales por (zona, intervalo). La memoria depende de los intervalos
+# resultantes, no de la cantidad de lecturas del mes.
+# ──────────────────────────────────────────────────────────────────────────────
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+import numpy as np
+from django.db import router, transaction
+from django.db.models import Sum
+from django.db.models.functions import ExtractMinute, Floor, TruncHour
+from django.utils import timezone
+
+from .models import DemandInterval, DemandPeak, Device, Measurement
+from .offline import chunked
+
+INTERVAL_MINUTES = 15
+INTERVAL_SECONDS = INTERVAL_MINUTES * 60
+INTERVALS_PER_HOUR = 60 // INTERVAL_MINUTES
+
+# Dispositivos que se guardan como "aportantes" del máximo
+PEAK_TOP_DEVICES = 10
+
+DEMAND_BATCH_SIZE = 2000
+
+# Ventana de cada consulta de rebuild_demand() (por bloque de dispositivos)
+REBUILD_WINDOW = timedelta(days=1)
+
+
+def floor_interval(dt):
+    return dt.replace(minute=dt.minute - dt.minute % INTERVAL_MINUTES, second=0, microsecond=0)
+
+
+def billing_month(dt):
+    """Primer día del mes (hora local) al que pertenece el instante."""
+    return timezone.localtime(dt).date().replace(day=1)
+
+
+def to_kw(energy_kwh):
+    return energy_kwh * INTERVALS_PER_HOUR
+
+
+def _contributors(organization_id, zone_id, interval_start):
+    """{device_id: kWh} de los dispositivos que más consumieron en el intervalo."""
+    devices = Device.objects.filter(organization_id=organization_id)
+    if zone_id is not None:
+        devices = devices.filter(zone_id=zone_id)
+    rows = (
+        Measurement.objects.filter(
+            device_id__in=list(devices.values_list("id", flat=True)),
+            measured_at__gte=interval_start,
+            measured_at__lt=interval_start + timedelta(minutes=INTERVAL_MINUTES),
+        )
+        .values("device_id")
+        .annotate(total=Sum("energy_kwh"))
+        .order_by("-total")[:PEAK_TOP_DEVICES]
+    )
+    return {str(r["device_id"]): round(r["total"], 4) for r in rows}
+
+
+def update_peaks(candidates):
+    """
+    candidates: {(organization_id, zone_id | None, interval_start): kWh}.
+    Sube el DemandPeak del mes correspondiente donde el candidato lo supera.
+    Retorna la cantidad de máximos actualizados.
+    """
+    best = {}
+    for (organization_id, zone_id, start), kwh in candidates.items():
+        key = (organization_id, zone_id, billing_month(start))
+        if key not in best or kwh > best[key][1]:
+            best[key] = (start, kwh)
+    if not best:
+        return 0
+
+    # Los máximos que falten se crean en 0; luego se releen bloqueados
+    DemandPeak.objects.bulk_create(
+        [
+            DemandPeak(organization_id=organization_id, zone_id=zone_id, month=month, interval_start=start, demand_kw=0)
+            for (organization_id, zone_id, month), (start, _) in best.items()
+        ],
+        ignore_conflicts=True,
+    )
+    current = {
+        (p.organization_id, p.zone_id, p.month): p
+        for p in DemandPeak.objects.select_for_update().filter(
+            organization_id__in={k[0] for k in best}, month__in={k[2] for k in best}
+        )
+    }
+    changed = []
+    for (organization_id, zone_id, month), (start, kwh) in best.items():
+        peak = current[(organization_id, zone_id, month)]
+        demand_kw = to_kw(kwh)
+        if demand_kw <= peak.demand_kw:
+            continue
+        peak.interval_start = start
+        peak.demand_kw = demand_kw
+        peak.devices = _contributors(organization_id, zone_id, start)
+        changed.append(peak)
+
+    DemandPeak.objects.bulk_update(changed, ["interval_start", "demand_kw", "devices", "updated_at"])
+    return len(changed)
+
+
+def record_demand(measurements):
+    """
+    Acumula las mediciones (ya guardadas, con .device cargado) en sus
+    intervalos de 15 minutos y actualiza los máximos mensuales.
+    Debe llamarse dentro de la transacción de ingesta.
+    """
+    sums = defaultdict(float)
+    for m in measurements:
+        sums[(m.device.organization_id, m.device.zone_id, floor_interval(m.measured_at))] += m.energy_kwh
+    if not sums:
+        return 0
+
+    starts = {k[2] for k in sums}
+    DemandInterval.objects.bulk_create(
+        [
+            DemandInterval(organization_id=organization_id, zone_id=zone_id, interval_start=start, energy_kwh=0)
+            for organization_id, zone_id, start in sums
+        ],
+        ignore_conflicts=True,
+    )
+    locked = {
+        (i.zone_id, i.interval_start): i
+        for i in DemandInterval.objects.select_for_update().filter(
+            zone_id__in={k[1] for k in sums}, interval_start__in=starts
+        )
+    }
+    changed = []
+    candidates = {}
+    for (organization_id, zone_id, start), kwh in sums.items():
+        interval = locked[(zone_id, start)]
+        interval.energy_kwh += kwh
+        changed.append(interval)
+        candidates[(organization_id, zone_id, start)] = interval.energy_kwh
+
+    DemandInterval.objects.bulk_update(changed, ["energy_kwh"])
+
+    # Total de la organización en los intervalos tocados (todas sus zonas)
+    totals = (
+        DemandInterval.objects.filter(organization_id__in={k[0] for k in sums}, interval_start__in=starts)
+        .values("organization_id", "interval_start")
+        .annotate(total=Sum("energy_kwh"))
+        .order_by()
+    )
+    for row in totals:
+        candidates[(row["organization_id"], None, row["interval_start"])] = row["total"]
+
+    return update_peaks(candidates)
+
+
+def peak_for(organization_id, month, zone_id=None):
+    """DemandPeak del mes (primer día, date) para la organización o una zona, o None."""
+    return DemandPeak.objects.filter(organization_id=organization_id, zone_id=zone_id, month=month).first()
+
+
+def _interval_sums(device_ids, start, end):
+    """
+    (device_id, hora, cuarto de hora, kWh) de los dispositivos en [start, end),
+    agregados en la BD: una fila por dispositivo e intervalo, no por lectura.
+    """
+    return (
+        Measurement.objects.filter(device_id__in=device_ids, measured_at__gte=start, measured_at__lt=end)
+        .annotate(hour=TruncHour("measured_at"), quarter=Floor(ExtractMinute("measured_at") / INTERVAL_MINUTES))
+        .values("device_id", "hour", "quarter")
+        .annotate(total=Sum("energy_kwh"))
+        .order_by()
+        .values_list("device_id", "hour", "quarter", "total")
+    )
+
+
+def rebuild_demand(start, end):
+    """
+    Recalcula DemandInterval [start, end) desde Measurement y luego los
+    máximos de los meses tocados. start/end deben caer en límites de intervalo.
+    Retorna (intervalos, máximos) escritos.
+    """
+    zone_of = {}
+    organization_of = {}
+    for pk, organization_id, zone_id in Device.objects.values_list("id", "organization_id", "zone_id"):
+        zone_of[pk] = zone_id
+        organization_of[zone_id] = organization_id
+
+    # Sumas parciales por (zona, intervalo), clave zona<<32 | intervalo
+    keys, totals = np.zeros(0, dtype=np.int64), np.zeros(0)
+    for ids in chunked(zone_of):
+        window = start
+        while window < end:
+            rows = list(_interval_sums(ids, window, min(window + REBUILD_WINDOW, end)))
+            window += REBUILD_WINDOW
+            n = len(rows)
+            zone = np.fromiter((zone_of[r[0]] for r in rows), dtype=np.int64, count=n)
+            slot = np.fromiter(
+                (int(r[1].timestamp()) // INTERVAL_SECONDS + int(r[2]) for r in rows), dtype=np.int64, count=n,
+            )
+            energy = np.fromiter((r[3] for r in rows), dtype=np.float64, count=n)
+            # Se combinan con lo acumulado: np.unique + bincount sobre ambas partes
+            keys, inverse = np.unique(np.r_[keys, (zone << 32) | slot], return_inverse=True)
+            totals = np.bincount(inverse, weights=np.r_[totals, energy], minlength=len(keys))
+
+    intervals = [
+        DemandInterval(
+            organization_id=organization_of[int(key >> 32)], zone_id=int(key >> 32),
+            interval_start=datetime.fromtimestamp(int(key & 0xFFFFFFFF) * INTERVAL_SECONDS, tz=dt_timezone.utc),
+            energy_kwh=float(kwh),
+        )
+        for key, kwh in zip(keys, totals)
+    ]
+
+    months = _months_between(start, end)
+    with transaction.atomic(using=router.db_for_write(DemandInterval)):
+        DemandInterval.objects.filter(interval_start__gte=start, interval_start__lt=end).delete()
+        DemandInterval.objects.bulk_create(intervals, batch_size=DEMAND_BATCH_SIZE)
+        DemandPeak.objects.filter(month__in=months).delete()
+        peaks = _rebuild_peaks(months)
+    return len(intervals), peaks
+
+
+def _next_month(month):
+    return month.replace(year=month.year + month.month // 12, month=month.month % 12 + 1)
+
+
+def _months_between(start, end):
+    """Meses locales (primer día) que se solapan con [start, end)."""
+    months = [billing_month(start)]
+    last = billing_month(end - timedelta(microseconds=1))
+    while months[-1] < last:
+        months.append(_next_month(months[-1]))
+    return months
+
+
+def _rebuild_peaks(months):
+    """Máximos de zona y organización de los meses indicados, desde DemandInterval."""
+    window = (
+        timezone.make_aware(datetime.combine(months[0], datetime.min.time())),
+        timezone.make_aware(datetime.combine(_next_month(months[-1]), datetime.min.time())),
+    )
+    by_zone = DemandInterval.objects.filter(interval_start__gte=window[0], interval_start__lt=window[1])
+    candidates = {}
+    for organization_id, zone_id, start, kwh in by_zone.values_list("organization_id", "zone_id", "interval_start", "energy_kwh"):
+        candidates[(organization_id, zone_id, start)] = kwh
+    by_organization = (
+        by_zone.values("organization_id", "interval_start").annotate(total=Sum("energy_kwh")).order_by()
+    )
+    for row in by_organization:
+        candidates[(row["organization_id"], None, row["interval_start"])] = row["total"]
+    return update_peaks(candidates)
@@ -0,0 +1,86 @@
+# devices/events.py
+#
+# ──────────────────────────────────────────────────────────────────────────────
+# Propósito del módulo
+# ──────────────────────────────────────────────────────────────────────────────
+# Pub/sub en memoria (dentro del proceso) para empujar eventos en vivo al
+# dashboard vía Server-Sent Events:
+# - La ingesta publica "measurements" y "alert" por organización.
+# - Cada conexión SSE abierta se suscribe a su organización con una cola asyncio;
+#   el Encargado puede suscribirse a toda la flota (organization_id=None).
+#
+# Notas:
+# - La ingesta corre en vistas síncronas (hilos), y las conexiones SSE en el
+#   event loop de ASGI; por eso publish() entrega con call_soon_threadsafe.
+# - Las colas son acotadas: si un cliente es lento se descartan eventos suyos
+#   en vez de acumular memoria (el dashboard puede recargarse para resincronizar).
+# - Al ser en memoria, solo llegan eventos publicados en el mismo proceso.
+# ──────────────────────────────────────────────────────────────────────────────
+
+import asyncio
+import threading
+from collections import defaultdict
+
+SUBSCRIBER_QUEUE_SIZE = 256
+
+# Clave de las suscripciones que reciben eventos de todas las organizaciones
+FLEET = None
+
+
+class Subscription:
+    """Cola de eventos de una conexión SSE, ligada al event loop que la creó."""
+
+    def __init__(self, organization_id):
+        self.organization_id = organization_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.dropped = 0
+
+    def _offer(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class EventBroker:
+    """Registro de suscripciones por organización."""
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, organization_id):
+        sub = Subscription(organization_id)
+        with self._lock:
+            self._subscribers[organization_id].add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subscribers.get(sub.organization_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.organization_id]
+
+    def has_subscribers(self, organization_id):
+        return bool(self._subscribers.get(organization_id) or self._subscribers.get(FLEET))
+
+    def publish(self, organization_id, event_type, data):
+        """Entrega {"type", "data"} a los suscriptores de la organización y de la flota."""
+        with self._lock:
+            subs = [*self._subscribers.get(organization_id, ()), *self._subscribers.get(FLEET, ())]
+        event = {"type": event_type, "data": data}
+        for sub in subs:
+            try:
+                sub.loop.call_soon_threadsafe(sub._offer, event)
+            except RuntimeError:
+                # El loop ya se cerró (servidor apagándose): se limpia la suscripción
+                self.unsubscribe(sub)
+
+
+broker = EventBroker()
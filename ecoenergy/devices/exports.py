@@ -0,0 +1,243 @@
+# devices/exports.py
+#
+# ──────────────────────────────────────────────────────────────────────────────
+# Propósito del módulo
+# ──────────────────────────────────────────────────────────────────────────────
+# Exportación CSV en streaming del historial de un cliente (tenant):
+# - Measurement en resolución cruda, horaria o diaria
+# - AlertEvent
+#
+# La idea clave es NO construir el archivo en memoria: las filas se escriben
+# una a una hacia un StreamingHttpResponse y se leen de la BD en páginas de
+# EXPORT_CHUNK_SIZE por keyset ("filas después de la última vista", sobre el
+# mismo orden del índice (device, tiempo)). .iterator() no alcanza: mysqlclient
+# trae el resultado COMPLETO de cada consulta a memoria del cliente. Con
+# páginas acotadas la memoria del worker se mantiene constante aunque se
+# exporte un año de datos de toda la flota.
+# ──────────────────────────────────────────────────────────────────────────────
+
+import csv
+import zlib
+from datetime import datetime, time, timedelta
+
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .offline import chunked
+from .units import METRIC_FIELDS
+from .zones import filter_zone_subtree
+
+# Filas leídas por viaje a la BD (una página). Suficiente para amortizar el
+# round-trip sin que una página pese más de unos pocos cientos de KB.
+EXPORT_CHUNK_SIZE = 2000
+
+RESOLUTIONS = {
+    "raw": None,
+    "hourly": TruncHour,
+    "daily": TruncDay,
+}
+
+
+class Echo:
+    """Pseudo-buffer para csv.writer: devuelve lo escrito en vez de guardarlo."""
+
+    def write(self, value):
+        return value
+
+
+def parse_bound(value, end=False):
+    """
+    Convierte "YYYY-MM-DD" o un datetime ISO en un datetime aware.
+    Para fechas sin hora, el límite superior se toma como fin del día.
+    Retorna None si el valor viene vacío; lanza ValueError si es inválido.
+    """
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Fecha inválida: {value}")
+        parsed = datetime.combine(day, time.max if end else time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_export_filters(params):
+    """
+    Lee los filtros comunes de exportación desde request.GET.
+    Lanza ValueError con un mensaje legible si algún filtro es inválido.
+    """
+    resolution = params.get("resolution", "raw")
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"Resolución inválida: {resolution}")
+
+    filters = {
+        "device": params.get("device") or None,
+        "zone": params.get("zone") or None,
+        "start": parse_bound(params.get("start")),
+        "end": parse_bound(params.get("end"), end=True),
+        "resolution": resolution,
+        "gzip": params.get("gzip") in ("1", "true", "yes"),
+    }
+    for key in ("device", "zone"):
+        if filters[key] is not None and not str(filters[key]).isdigit():
+            raise ValueError(f"Identificador inválido para {key}: {filters[key]}")
+    return filters
+
+
+def filter_devices(devices, filters):
+    """
+    Aplica los filtros de dispositivo/zona sobre el queryset de Device del usuario.
+    La zona incluye sus subzonas (devices/zones.py).
+    """
+    if filters["device"]:
+        devices = devices.filter(pk=filters["device"])
+    if filters["zone"]:
+        devices = filter_zone_subtree(devices, filters["zone"])
+    return devices
+
+
+def filter_period(qs, filters, time_field="measured_at"):
+    """Aplica el rango de fechas sobre Measurement o AlertEvent."""
+    if filters["start"]:
+        qs = qs.filter(**{f"{time_field}__gte": filters["start"]})
+    if filters["end"]:
+        qs = qs.filter(**{f"{time_field}__lte": filters["end"]})
+    return qs
+
+
+def device_querysets(model, device_ids, filters, time_field="measured_at"):
+    """
+    Querysets de Measurement o AlertEvent de los dispositivos, uno por bloque de
+    ids (límite de variables de SQLite, ver devices/offline.py), en orden de
+    device_id y con el periodo aplicado. Cada uno queda fijo a su BD: el
+    streaming se consume después de salir de la vista.
+    """
+    querysets = []
+    for ids in chunked(sorted(device_ids)):
+        qs = filter_period(model.objects.filter(device_id__in=ids), filters, time_field)
+        querysets.append(qs.using(qs.db))
+    return querysets
+
+
+def keyset_pages(qs, after, size=None):
+    """
+    Recorre un queryset ya ordenado (values/values_list) en páginas de `size`
+    filas (EXPORT_CHUNK_SIZE por defecto): cada página filtra con after(última
+    fila), un Q con las filas que van después de ella en ese orden. Nunca hay
+    más de una página en memoria.
+    """
+    size = size or EXPORT_CHUNK_SIZE
+    page = list(qs[:size])
+    while page:
+        yield from page
+        if len(page) < size:
+            return
+        page = list(qs.filter(after(page[-1]))[:size])
+
+
+def after_row(time_field, device_id, at, pk):
+    """Q de las filas después de (device_id, at, pk) en orden (device_id, tiempo, id)."""
+    return (
+        Q(device_id__gt=device_id)
+        | Q(device_id=device_id, **{f"{time_field}__gt": at})
+        | Q(device_id=device_id, **{time_field: at, "id__gt": pk})
+    )
+
+
+def next_bucket(resolution, bucket):
+    """Inicio del bucket (hora o día local) siguiente a `bucket`."""
+    if resolution == "hourly":
+        return bucket + timedelta(hours=1)
+    day = timezone.localtime(bucket).date() + timedelta(days=1)
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def measurement_rows(querysets, resolution, device_names):
+    """
+    Genera (cabecera, filas...) para Measurement, recorriendo los querysets en orden.
+    - raw: una fila por medición.
+    - hourly/daily: una fila por (dispositivo, bucket), agregada en la BD.
+    device_names ({id: nombre}) evita el join con device, que puede estar en
+    otra base de datos (ver ecoenergy/routers.py).
+    """
+    trunc = RESOLUTIONS[resolution]
+    if trunc is None:
+        yield ["device_id", "device", "measured_at", *METRIC_FIELDS, "triggered_alert_id"]
+        for qs in querysets:
+            rows = keyset_pages(
+                qs.order_by("device_id", "measured_at", "id")
+                .values_list("device_id", "measured_at", "id", *METRIC_FIELDS, "triggered_alert_id"),
+                lambda row: after_row("measured_at", *row[:3]),
+            )
+            for device_id, measured_at, _, *metrics, alert_id in rows:
+                yield [
+                    device_id, device_names.get(device_id, ""), measured_at.isoformat(),
+                    *("" if value is None else value for value in metrics), alert_id or "",
+                ]
+        return
+
+    # Páginas de buckets completos: el LIMIT se aplica después del GROUP BY, y
+    # la página siguiente empieza en el bucket que sigue al último (por measured_at)
+    def after_bucket(row):
+        return Q(device_id__gt=row["device_id"]) | Q(
+            device_id=row["device_id"], measured_at__gte=next_bucket(resolution, row["bucket"]),
+        )
+
+    yield ["device_id", "device", "bucket", "energy_kwh", "min_kwh", "max_kwh", "readings"]
+    for qs in querysets:
+        rows = keyset_pages(
+            qs.annotate(bucket=trunc("measured_at"))
+            .values("device_id", "bucket")
+            .annotate(
+                total=Sum("energy_kwh"),
+                low=Min("energy_kwh"),
+                high=Max("energy_kwh"),
+                readings=Count("id"),
+            )
+            .order_by("device_id", "bucket"),
+            after_bucket,
+        )
+        for row in rows:
+            yield [
+                row["device_id"], device_names.get(row["device_id"], ""), row["bucket"].isoformat(),
+                row["total"], row["low"], row["high"], row["readings"],
+            ]
+
+
+def alert_event_rows(querysets, device_names, rules):
+    """Genera (cabecera, filas...) para AlertEvent. rules: {id: (nombre, severidad)}."""
+    yield ["device_id", "device", "occurred_at", "resolved_at", "alert_rule", "severity", "message"]
+    for qs in querysets:
+        rows = keyset_pages(
+            qs.order_by("device_id", "occurred_at", "id")
+            .values_list("device_id", "occurred_at", "id", "resolved_at", "alert_rule_id", "message"),
+            lambda row: after_row("occurred_at", *row[:3]),
+        )
+        for device_id, occurred_at, _, resolved_at, rule_id, message in rows:
+            rule, severity = rules.get(rule_id, ("", ""))
+            yield [
+                device_id, device_names.get(device_id, ""), occurred_at.isoformat(),
+                resolved_at.isoformat() if resolved_at else "", rule, severity, message,
+            ]
+
+
+def gzip_stream(chunks):
+    """Comprime al vuelo un iterable de str en formato gzip (wbits=31)."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_csv(rows, compress=False):
+    """Convierte un iterable de filas en un iterable de líneas CSV (o bytes gzip)."""
+    writer = csv.writer(Echo())
+    lines = (writer.writerow(row) for row in rows)
+    return gzip_stream(lines) if compress else lines
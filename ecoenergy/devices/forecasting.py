@@ -0,0 +1,164 @@
+# devices/forecasting.py
+#
+# ──────────────────────────────────────────────────────────────────────────────
+# Propósito del módulo
+# ──────────────────────────────────────────────────────────────────────────────
+# Pronóstico de consumo por dispositivo para los próximos 7 días.
+#
+# Modelo: Holt-Winters aditivo con estacionalidad semanal (168 horas, que ya
+# contiene el perfil diario), ajustado sobre las últimas HISTORY_WEEKS de
+# rollups horarios. Es liviano y suficiente para comparar real vs. esperado.
+#
+# Vectorización: la historia de TODOS los dispositivos es una matriz
+# (dispositivos x horas). La recursión de Holt-Winters avanza hora a hora,
+# pero cada paso actualiza nivel, tendencia y estación de toda la flota con
+# operaciones de arrays: el costo en Python es O(horas), no O(dispositivos x horas).
+#
+# El resultado va a DeviceForecast (168 float32 por dispositivo). Lo corre
+# cada noche:  python manage.py forecast_devices
+#
+# consumption_vs_forecast() compara lo medido con lo esperado (el dashboard
+# del Cliente Admin lo usa para el consumo de hoy): solo lee los pronósticos.
+# ──────────────────────────────────────────────────────────────────────────────
+
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+import numpy as np
+from django.db import router, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Device, DeviceForecast, Measurement
+from .offline import chunked
+from .rollups import floor_hour
+from .timeseries import load_hourly_arrays
+
+SEASON_HOURS = 168
+HISTORY_WEEKS = 4
+HORIZON_HOURS = 168
+
+# Suavizamiento: nivel, tendencia y estación
+ALPHA = 0.2
+BETA = 0.01
+GAMMA = 0.1
+
+FORECAST_BATCH_SIZE = 500
+
+
+def history_matrix(device_ids, start, hours):
+    """Matriz (dispositivos x horas) de kWh desde start; 0 donde no hay rollup."""
+    device, epoch, energy = load_hourly_arrays(device_ids, start, start + timedelta(hours=hours))
+    ids = np.asarray(device_ids, dtype=np.int64)
+    order = np.argsort(ids)
+    rows = order[np.searchsorted(ids, device, sorter=order)] if len(device) else device
+    cols = (epoch - int(start.timestamp())) // 3600
+    matrix = np.zeros((len(ids), hours))
+    matrix[rows, cols] = energy
+    return matrix
+
+
+def holt_winters(history, season=SEASON_HOURS, horizon=HORIZON_HOURS, alpha=ALPHA, beta=BETA, gamma=GAMMA):
+    """
+    Holt-Winters aditivo para varias series a la vez (una por fila).
+    Requiere al menos dos temporadas de historia. Retorna (pronóstico
+    (filas x horizon), error absoluto medio de un paso por fila).
+    """
+    n, hours = history.shape
+    first, second = history[:, :season], history[:, season:2 * season]
+    level = first.mean(axis=1)
+    trend = (second.mean(axis=1) - level) / season
+    seasonal = first - level[:, None]
+
+    abs_error = np.zeros(n)
+    for t in range(season, hours):
+        slot = t % season
+        y = history[:, t]
+        s = seasonal[:, slot]
+        abs_error += np.abs(y - (level + trend + s))
+        new_level = alpha * (y - s) + (1 - alpha) * (level + trend)
+        trend = beta * (new_level - level) + (1 - beta) * trend
+        seasonal[:, slot] = gamma * (y - new_level) + (1 - gamma) * s
+        level = new_level
+
+    steps = np.arange(1, horizon + 1)
+    slots = (hours + steps - 1) % season
+    forecast = level[:, None] + trend[:, None] * steps + seasonal[:, slots]
+    return np.clip(forecast, 0, None), abs_error / (hours - season)
+
+
+def forecast_devices(now=None):
+    """
+    Ajusta y guarda el pronóstico de los dispositivos activos del shard actual
+    que tienen datos desde el inicio de la ventana. Retorna cuántos se pronosticaron.
+    """
+    end = floor_hour(now or timezone.now())
+    hours = HISTORY_WEEKS * SEASON_HOURS
+    start = end - timedelta(hours=hours)
+
+    device_ids = list(Device.objects.filter(status="ACTIVE").order_by("id").values_list("id", flat=True))
+    history = history_matrix(device_ids, start, hours)
+
+    # Solo dispositivos con datos en la primera semana: con menos historia los
+    # ceros iniciales se confundirían con consumo nulo
+    eligible = history[:, :SEASON_HOURS].any(axis=1)
+    forecast, mae = holt_winters(history[eligible])
+    ids = np.asarray(device_ids, dtype=np.int64)[eligible]
+
+    rows = [
+        DeviceForecast(
+            device_id=int(pk), start=end,
+            hourly_kwh=values.astype(np.float32).tobytes(), mae=float(error),
+        )
+        for pk, values, error in zip(ids, forecast, mae)
+    ]
+    with transaction.atomic(using=router.db_for_write(DeviceForecast)):
+        DeviceForecast.objects.filter(device_id__in=device_ids).delete()
+        DeviceForecast.objects.bulk_create(rows, batch_size=FORECAST_BATCH_SIZE)
+    return len(rows)
+
+
+def forecast_series(device_ids, start=None, end=None):
+    """
+    Consumo esperado (suma de los dispositivos) por hora en [start, end),
+    desde los pronósticos guardados. Retorna (timestamps ms epoch, kWh).
+    """
+    total = None
+    first = None
+    for forecast in DeviceForecast.objects.filter(device_id__in=device_ids):
+        values = np.frombuffer(bytes(forecast.hourly_kwh), dtype=np.float32).astype(np.float64)
+        if total is None:
+            total, first = values.copy(), forecast.start
+        elif forecast.start == first:
+            total += values
+        # Pronósticos de otra corrida (desfasados) se ignoran: no suman hora con hora
+    if total is None:
+        return np.empty(0), np.empty(0)
+
+    t = (int(first.timestamp()) + np.arange(len(total)) * 3600) * 1000.0
+    keep = np.ones(len(t), dtype=bool)
+    if start is not None:
+        keep &= t >= start.timestamp() * 1000
+    if end is not None:
+        keep &= t < end.timestamp() * 1000
+    return t[keep], total[keep]
+
+
+def consumption_vs_forecast(device_ids, start, end):
+    """
+    Consumo real de los dispositivos frente al esperado en las horas de
+    [start, end) que cubre el pronóstico vigente (empieza a la hora en que
+    corrió el job): {"actual", "expected", "deviation", "since"}, con
+    deviation = (real - esperado) / esperado. None si no hay pronóstico.
+    """
+    t, values = forecast_series(device_ids, start, end)
+    expected = float(values.sum())
+    if expected <= 0:
+        return None
+    since = datetime.fromtimestamp(t[0] / 1000, tz=dt_timezone.utc)
+    actual = sum(
+        Measurement.objects.filter(device_id__in=ids, measured_at__gte=since, measured_at__lt=end)
+        .aggregate(total=Sum("energy_kwh"))["total"] or 0
+        for ids in chunked(device_ids)
+    )
+    return {"actual": actual, "expected": expected, "deviation": (actual - expected) / expected, "since": since}
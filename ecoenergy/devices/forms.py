@@ -265,7 +265,7 @@ class DeviceForm(BaseForm):
 class ZoneForm(BaseForm):
     class Meta:
         model = Zone
-        fields = ['name', 'status']
+        fields = ['name', 'parent', 'status']
         widgets = {
             'name': forms.TextInput(attrs={
                 'class': 'form-control',
@@ -273,10 +273,12 @@ class ZoneForm(BaseForm):
                 'minlength': '3',
                 'maxlength': '120'
             }),
+            'parent': forms.Select(attrs={'class': 'form-control'}),
             'status': forms.Select(attrs={'class': 'form-control'}),
         }
         labels = {
             'name': 'Nombre de la Zona',
+            'parent': 'Zona Padre',
             'status': 'Estado',
         }
 
@@ -284,24 +286,43 @@ class ZoneForm(BaseForm):
         self.organization = kwargs.pop('organization', None)
         super().__init__(*args, **kwargs)
 
+        # Padre: zonas activas de la organización, sin la propia zona ni sus subzonas
+        parents = Zone.objects.filter(organization=self.organization, status='ACTIVE')
+        if self.instance and self.instance.pk:
+            parents = parents.exclude(pk__in=self.instance.subtree().values('pk'))
+        self.fields['parent'].queryset = parents.order_by('path')
+        self.fields['parent'].required = False
+        self.fields['parent'].empty_label = '— Zona raíz —'
+        self.fields['parent'].label_from_instance = lambda zone: f"{'· ' * zone.depth}{zone.name}"
+
     def clean_name(self):
         name = self.cleaned_data.get('name')
         if name and len(name.strip()) < 3:
             raise forms.ValidationError("El nombre debe tener al menos 3 caracteres.")
-        
-        # Check uniqueness within organization
+        return name.strip()
+
+    def clean(self):
+        cleaned_data = super().clean()
+        name = cleaned_data.get('name')
+        parent = cleaned_data.get('parent')
+
+        if parent and parent.depth + 1 >= Zone.MAX_DEPTH:
+            self.add_error('parent', f"La jerarquía de zonas admite hasta {Zone.MAX_DEPTH} niveles.")
+
+        # Check uniqueness within organization and parent zone
         if name and self.organization:
             existing = Zone.objects.filter(
                 organization=self.organization,
+                parent=parent,
                 name=name,
                 status='ACTIVE'
             )
             if self.instance and self.instance.pk:
                 existing = existing.exclude(pk=self.instance.pk)
             if existing.exists():
-                raise forms.ValidationError("Ya existe una zona con este nombre en tu organización.")
-        
-        return name.strip()
+                self.add_error('name', "Ya existe una zona con este nombre en esa ubicación.")
+
+        return cleaned_data
 
 class MeasurementForm(BaseForm):
     energy_kwh = forms.FloatField(
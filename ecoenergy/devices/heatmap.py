@@ -0,0 +1,110 @@
+# devices/heatmap.py
+#
+# ──────────────────────────────────────────────────────────────────────────────
+# Propósito del módulo
+# ──────────────────────────────────────────────────────────────────────────────
+# Mapa de calor de consumo: matriz 24 x 7 (hora del día x día de la semana)
+# con el kWh promedio de un dispositivo, una zona (con sus subzonas) o una
+# organización en un periodo de días completos.
+#
+# - Fuente: rollups horarios como arrays NumPy (load_hourly_arrays).
+# - Reducción: la casilla de cada hora es hora * 7 + día, así la matriz sale
+#   de UN np.bincount ponderado por los kWh (suma de todos los dispositivos).
+# - Promedio: la suma de cada casilla se divide por las veces que esa hora
+#   de la semana aparece en el periodo (haya o no datos).
+#
+# Se cachea por organización, alcance y periodo (tenant_cache_key): pintar el
+# mapa es una lectura de caché. Los periodos incluyen el día en curso, por
+# eso la entrada expira sola a los HEATMAP_TIMEOUT segundos.
+# ──────────────────────────────────────────────────────────────────────────────
+
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.utils import timezone
+
+from ecoenergy.sharding import use_organization
+from organizations.cache import tenant_cache_key
+
+from .models import Device
+from .timeseries import load_hourly_arrays, local_calendar
+from .zones import filter_zone_subtree
+
+HEATMAP_DAYS = (7, 30, 90, 365)
+HEATMAP_MAX_DAYS = 366
+HEATMAP_TIMEOUT = 60 * 15
+HEATMAP_SCOPES = ("device", "zone", "organization")
+WEEKDAYS = ("Lun", "Mar", "Mié", "Jue", "Vie", "Sáb", "Dom")
+
+CELLS = 24 * 7
+
+
+def hour_week_cells(epoch):
+    """Casilla (hora * 7 + día de la semana) de cada timestamp, en hora local."""
+    hour, weekday, _ = local_calendar(epoch)
+    return hour * 7 + weekday
+
+
+def build_heatmap(device_ids, start, end):
+    """
+    Matriz 24 x 7 de kWh promedio (suma de los dispositivos) en [start, end).
+    Retorna un dict serializable a JSON.
+    """
+    _, epoch, energy = load_hourly_arrays(device_ids, start, end)
+    total = np.bincount(hour_week_cells(epoch), weights=energy, minlength=CELLS)
+
+    # Veces que cada hora de la semana aparece en el calendario del periodo
+    calendar = np.arange(int(start.timestamp()), int(end.timestamp()), 3600, dtype=np.int64)
+    occurrences = np.bincount(hour_week_cells(calendar), minlength=CELLS)
+    average = np.divide(total, occurrences, out=np.zeros(CELLS), where=occurrences > 0).reshape(24, 7)
+
+    return {
+        "hours": list(range(24)),
+        "weekdays": list(WEEKDAYS),
+        "matrix": average.round(4).tolist(),
+        "max": round(float(average.max()), 4),
+        "total_kwh": round(float(energy.sum()), 3),
+        "devices": len(device_ids),
+    }
+
+
+def heatmap_period(days=None, start_date=None, end_date=None):
+    """
+    Periodo de días completos en hora local como (inicio, fin) aware. Por
+    defecto, los últimos `days` días incluyendo hoy. Lanza ValueError si es inválido.
+    """
+    end_date = (end_date or timezone.localdate()) + timedelta(days=1)
+    start_date = start_date or end_date - timedelta(days=days or 30)
+    if start_date >= end_date:
+        raise ValueError("El inicio debe ser anterior al fin.")
+    if (end_date - start_date).days > HEATMAP_MAX_DAYS:
+        raise ValueError(f"El periodo no puede superar {HEATMAP_MAX_DAYS} días.")
+    return (
+        timezone.make_aware(datetime.combine(start_date, time.min)),
+        timezone.make_aware(datetime.combine(end_date, time.min)),
+    )
+
+
+def consumption_heatmap(organization_id, scope, scope_id, start, end):
+    """
+    build_heatmap() del alcance dentro de la organización, cacheado por
+    (organización, alcance, periodo). None si el alcance no tiene dispositivos.
+    """
+    key = tenant_cache_key(organization_id, "heatmap", scope, scope_id, start.date(), end.date())
+    data = cache.get(key)
+    if data is not None:
+        return data
+
+    with use_organization(organization_id):
+        devices = Device.objects.filter(organization_id=organization_id)
+        if scope == "zone":
+            devices = filter_zone_subtree(devices, scope_id)
+        elif scope == "device":
+            devices = devices.filter(pk=scope_id)
+        device_ids = list(devices.values_list("id", flat=True))
+        if not device_ids:
+            return None
+        data = build_heatmap(device_ids, start, end)
+    cache.set(key, data, HEATMAP_TIMEOUT)
+    return data
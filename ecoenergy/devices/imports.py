@@ -0,0 +1,291 @@
+# devices/imports.py
+#
+# ──────────────────────────────────────────────────────────────────────────────
+# Propósito del módulo
+# ──────────────────────────────────────────────────────────────────────────────
+# Importación masiva de Product y Device desde CSV.
+#
+# A diferencia de los formularios (ProductForm.clean_sku, DeviceForm.clean_name),
+# que hacen una consulta de unicidad por registro, aquí la validación es por
+# conjuntos:
+# 1) Se leen todas las filas y se juntan los nombres/SKU que aparecen.
+# 2) Con UNA consulta por tipo se cargan los SKU y pares (organización, nombre)
+#    existentes, y se resuelven categorías, organizaciones, zonas y productos.
+# 3) Cada fila se valida en memoria (incluidos duplicados dentro del archivo).
+# 4) Las filas válidas se insertan con bulk_create; las inválidas se devuelven
+#    con su número de línea y motivo, para descargarlas, corregirlas y reimportar.
+# ──────────────────────────────────────────────────────────────────────────────
+
+import csv
+import io
+import re
+from collections import defaultdict
+
+from django.db import router, transaction
+from django.db.models import Q
+
+from ecoenergy.sharding import shard_for_organization, use_shard
+from organizations.models import Organization
+
+from .models import Category, Device, Product, Zone
+from .zones import invalidate_zone_summary, path_ids
+
+IMPORT_MAX_ROWS = 5000
+# Separador de la ruta de zona en el CSV: "Edificio A/Piso 1"
+ZONE_PATH_SEPARATOR = "/"
+IMPORT_BATCH_SIZE = 500
+
+SKU_RE = re.compile(r"^[A-Z0-9-]+$")
+
+PRODUCT_COLUMNS = [
+    "name", "category", "sku", "manufacturer", "model_name", "description",
+    "nominal_voltage_v", "max_current_a", "standby_power_w", "reporting_interval_s",
+]
+PRODUCT_REQUIRED = {"name", "category", "sku"}
+
+DEVICE_COLUMNS = ["organization", "zone", "product", "name", "max_power_w", "serial_number"]
+DEVICE_REQUIRED = {"zone", "product", "name", "max_power_w"}
+
+
+class ImportResult:
+    """Resumen de una importación: cantidad creada y filas rechazadas."""
+
+    def __init__(self, fieldnames):
+        self.fieldnames = fieldnames
+        self.created = 0
+        self.errors = []
+
+    def reject(self, line, row, message):
+        self.errors.append((line, row, message))
+
+    def error_rows(self):
+        """Filas rechazadas con sus columnas originales + línea y motivo (para stream_csv)."""
+        yield ["line", *self.fieldnames, "error"]
+        for line, row, message in self.errors:
+            yield [line, *(row.get(f, "") for f in self.fieldnames), message]
+
+
+def read_csv(data, required):
+    """
+    Lee un CSV (bytes o str) y retorna (columnas, [(línea, fila), ...]).
+    Lanza ValueError si faltan columnas obligatorias o excede IMPORT_MAX_ROWS.
+    """
+    if isinstance(data, bytes):
+        try:
+            data = data.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise ValueError("El archivo debe estar codificado en UTF-8")
+    reader = csv.DictReader(io.StringIO(data))
+    fieldnames = [f.strip() for f in reader.fieldnames or []]
+    missing = required - set(fieldnames)
+    if missing:
+        raise ValueError(f"Faltan columnas obligatorias: {', '.join(sorted(missing))}")
+    reader.fieldnames = fieldnames
+
+    rows = []
+    # Línea 1 = cabecera
+    for line, row in enumerate(reader, start=2):
+        rows.append((line, {k: (v or "").strip() for k, v in row.items() if k is not None}))
+        if len(rows) > IMPORT_MAX_ROWS:
+            raise ValueError(f"El archivo excede el máximo de {IMPORT_MAX_ROWS} filas")
+    return fieldnames, rows
+
+
+def _optional_float(row, field):
+    value = row.get(field)
+    if not value:
+        return None
+    number = float(value)
+    if number < 0:
+        raise ValueError(f"{field} no puede ser negativo")
+    return number
+
+
+def import_products(data):
+    """Importa productos del catálogo desde CSV (ver PRODUCT_COLUMNS)."""
+    fieldnames, rows = read_csv(data, PRODUCT_REQUIRED)
+    result = ImportResult(fieldnames)
+
+    categories = {
+        c.name: c for c in Category.objects.filter(name__in={r["category"] for _, r in rows}, status="ACTIVE")
+    }
+    taken_skus = set(Product.objects.filter(sku__in={r["sku"] for _, r in rows}).values_list("sku", flat=True))
+
+    products = []
+    seen = set()
+    for line, row in rows:
+        name, sku = row["name"], row["sku"]
+        if len(name) < 3:
+            result.reject(line, row, "El nombre debe tener al menos 3 caracteres.")
+            continue
+        if not SKU_RE.match(sku) or len(sku) > 80:
+            result.reject(line, row, "SKU solo puede contener letras mayúsculas, números y guiones.")
+            continue
+        if sku in taken_skus:
+            result.reject(line, row, "Este SKU ya existe. Debe ser único.")
+            continue
+        if sku in seen:
+            result.reject(line, row, "SKU repetido en el archivo.")
+            continue
+        category = categories.get(row["category"])
+        if category is None:
+            result.reject(line, row, f'Categoría inexistente o inactiva: "{row["category"]}"')
+            continue
+        try:
+            specs = {f: _optional_float(row, f) for f in ("nominal_voltage_v", "max_current_a", "standby_power_w")}
+            interval = int(row.get("reporting_interval_s") or 900)
+            if interval < 1:
+                raise ValueError("reporting_interval_s debe ser mayor a 0")
+        except ValueError as e:
+            result.reject(line, row, str(e))
+            continue
+
+        seen.add(sku)
+        products.append(Product(
+            name=name, category=category, sku=sku,
+            manufacturer=row.get("manufacturer", ""), model_name=row.get("model_name", ""),
+            description=row.get("description", ""), reporting_interval_s=interval, **specs,
+        ))
+
+    with transaction.atomic(using=router.db_for_write(Product)):
+        Product.objects.bulk_create(products, batch_size=IMPORT_BATCH_SIZE)
+    result.created = len(products)
+    return result
+
+
+def _resolve_products(keys):
+    """{sku: producto} y {nombre: [productos]} de los productos activos mencionados."""
+    by_sku, by_name = {}, defaultdict(list)
+    for p in Product.objects.filter(Q(sku__in=keys) | Q(name__in=keys), status="ACTIVE").only("id", "name", "sku"):
+        by_sku[p.sku] = p
+        by_name[p.name].append(p)
+    return by_sku, by_name
+
+
+def _zone_path_key(value):
+    return tuple(part.strip() for part in value.split(ZONE_PATH_SEPARATOR) if part.strip()) or ("",)
+
+
+def _zone_keys(zones):
+    """
+    Claves de búsqueda de las zonas activas: (organización, nombres desde la
+    raíz) y (organización, nombre). Los nombres de los ancestros salen de
+    Zone.path, sin consultas extra.
+    """
+    rows = list(zones.values_list("id", "organization_id", "name", "path", "status"))
+    names = {pk: name for pk, _, name, _, _ in rows}
+    for pk, organization_id, name, path, status in rows:
+        if status != "ACTIVE":
+            continue
+        route = ZONE_PATH_SEPARATOR.join(names.get(ancestor, "") for ancestor in path_ids(path))
+        yield (organization_id, _zone_path_key(route)), pk
+        yield (organization_id, name.strip()), pk
+
+
+def import_devices(data, organization=None):
+    """
+    Importa dispositivos desde CSV (ver DEVICE_COLUMNS).
+    - organization: si se indica, todas las filas son de esa organización
+      (Cliente Admin); si no, la columna "organization" es obligatoria (Encargado).
+    Zonas y productos se indican por nombre (el producto también por SKU). Si
+    el nombre de la zona se repite bajo distintos padres, se indica su ruta
+    ("Edificio A/Piso 1").
+    """
+    fieldnames, rows = read_csv(data, DEVICE_REQUIRED if organization else DEVICE_REQUIRED | {"organization"})
+    result = ImportResult(fieldnames)
+
+    if organization is not None:
+        organizations = {organization.name: organization}
+    else:
+        organizations = {
+            o.name: o for o in Organization.objects.filter(name__in={r["organization"] for _, r in rows}, is_active=True)
+        }
+    by_sku, by_name = _resolve_products({r["product"] for _, r in rows})
+
+    # Zonas y nombres existentes: una consulta por shard involucrado
+    device_names = {r["name"] for _, r in rows}
+    org_ids_by_shard = defaultdict(set)
+    for org in organizations.values():
+        org_ids_by_shard[shard_for_organization(org.id)].add(org.id)
+    zones, taken = defaultdict(list), set()
+    for shard, org_ids in org_ids_by_shard.items():
+        with use_shard(shard):
+            for key, zone_id in _zone_keys(Zone.objects.filter(organization_id__in=org_ids)):
+                zones[key].append(zone_id)
+            # Todos los estados: la BD exige (organization, name) único igual
+            taken.update(
+                Device.objects.filter(organization_id__in=org_ids, name__in=device_names)
+                .values_list("organization_id", "name")
+            )
+
+    devices_by_shard = defaultdict(list)
+    seen = set()
+    for line, row in rows:
+        if organization is not None:
+            org = organization
+            if row.get("organization") and row["organization"] != organization.name:
+                result.reject(line, row, "Solo puede importar dispositivos de su organización.")
+                continue
+        else:
+            org = organizations.get(row["organization"])
+            if org is None:
+                result.reject(line, row, f'Organización inexistente o inactiva: "{row["organization"]}"')
+                continue
+
+        name = row["name"]
+        if len(name) < 3 or len(name) > 160:
+            result.reject(line, row, "El nombre debe tener entre 3 y 160 caracteres.")
+            continue
+        if (org.id, name) in taken:
+            result.reject(line, row, "Ya existe un dispositivo con este nombre en la organización seleccionada.")
+            continue
+        if (org.id, name) in seen:
+            result.reject(line, row, "Nombre de dispositivo repetido en el archivo.")
+            continue
+
+        # Ruta desde la raíz ("Edificio A/Piso 1") o nombre solo, que debe ser único
+        zone_key = _zone_path_key(row["zone"])
+        zone_ids = zones.get((org.id, zone_key if len(zone_key) > 1 else row["zone"].strip()), [])
+        if len(zone_ids) != 1:
+            reason = (
+                'es ambigua (indique la ruta, ej.: "Edificio A/Piso 1")' if zone_ids
+                else "no existe en la organización o está inactiva"
+            )
+            result.reject(line, row, f'La zona "{row["zone"]}" {reason}.')
+            continue
+
+        product = by_sku.get(row["product"])
+        if product is None:
+            matches = by_name.get(row["product"], [])
+            if len(matches) != 1:
+                reason = "es ambiguo (use el SKU)" if matches else "no existe o está inactivo"
+                result.reject(line, row, f'El producto "{row["product"]}" {reason}.')
+                continue
+            product = matches[0]
+
+        try:
+            max_power_w = int(row["max_power_w"])
+        except ValueError:
+            result.reject(line, row, "max_power_w debe ser un número entero.")
+            continue
+        if not 1 <= max_power_w <= 50000:
+            result.reject(line, row, "max_power_w debe estar entre 1 y 50000.")
+            continue
+        serial_number = row.get("serial_number", "")
+        if len(serial_number) > 120:
+            result.reject(line, row, "serial_number admite hasta 120 caracteres.")
+            continue
+
+        seen.add((org.id, name))
+        devices_by_shard[shard_for_organization(org.id)].append(Device(
+            organization_id=org.id, zone_id=zone_ids[0], product_id=product.id,
+            name=name, max_power_w=max_power_w, serial_number=serial_number,
+        ))
+
+    for shard, devices in devices_by_shard.items():
+        with use_shard(shard), transaction.atomic(using=router.db_for_write(Device)):
+            Device.objects.bulk_create(devices, batch_size=IMPORT_BATCH_SIZE)
+        result.created += len(devices)
+        # bulk_create no emite post_save: el listado de zonas se invalida a mano
+        invalidate_zone_summary(*(d.organization_id for d in devices))
+    return result
@@ -0,0 +1,256 @@
+# devices/ingestion.py
+#
+# ──────────────────────────────────────────────────────────────────────────────
+# Propósito del módulo
+# ──────────────────────────────────────────────────────────────────────────────
+# Camino único de ingesta de lecturas (Measurement). Por cada lote:
+# 1) Valida dispositivos con UNA consulta (solo ACTIVE, dentro del alcance y
+#    de organizaciones activas).
+# 2) Filtra lecturas imposibles (devices/validation.py): las duplicadas se
+#    rechazan y las demás van a QuarantinedReading, nunca a Measurement.
+# 3) Evalúa reglas de alerta para el resto del lote (devices/alerts.py).
+# 4) Inserta mediciones y eventos de alerta con bulk_create en una transacción,
+#    y en la misma acumula la demanda de 15 minutos (devices/demand.py) y
+#    puntúa el consumo contra lo habitual del dispositivo (devices/anomaly.py).
+# 5) Al confirmar la transacción publica los eventos en vivo (devices/events.py).
+#
+# Una "transición" de alerta es el paso de un dispositivo a una regla gatillada
+# distinta de la de su lectura anterior; solo esas generan AlertEvent. El estado
+# previo sale de Device.last_alert, que se actualiza en bloque con cada lote.
+# ──────────────────────────────────────────────────────────────────────────────
+
+from collections import defaultdict
+
+import numpy as np
+from django.db import router, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from organizations.cache import paused_organization_ids
+
+from .alerts import ThresholdTable, publish_alert_events, record_alert_events
+from .anomaly import detect_anomalies
+from .demand import record_demand
+from .events import broker
+from .models import AlertEvent, Device, Measurement, QuarantinedReading
+from .units import METRIC_FIELDS, METRICS, UNIT_INDEX, to_canonical
+from .validation import DUPLICATE, ENERGY, check_plausibility, quarantine_values
+
+# Límite de lecturas por lote para acotar memoria y duración de la transacción
+MAX_BATCH_SIZE = 5000
+
+
+def parse_reading(raw):
+    """
+    Normaliza una lectura a columnas canónicas. Acepta:
+    - columnas directas: {"device_id", "energy_kwh", "power_w"?, "current_a"?, "voltage_v"?}
+    - métricas con unidad: {"device_id", "energy": 1500, "power": 1.2, "units": {"energy": "Wh", "power": "kW"}}
+    más "measured_at" opcional (ISO). Lanza ValueError con el motivo si no es válida.
+    """
+    try:
+        device_id = int(raw["device_id"])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("device_id es obligatorio y numérico")
+
+    units = raw.get("units") or {}
+    if not isinstance(units, dict):
+        raise ValueError("units debe ser un objeto {métrica: unidad}")
+
+    reading = {"device_id": device_id}
+    for metric, (field, _) in METRICS.items():
+        try:
+            if raw.get(field) is not None:
+                reading[field] = float(raw[field])
+            elif raw.get(metric) is not None:
+                reading[field] = to_canonical(metric, raw[metric], units.get(metric))[1]
+            else:
+                reading[field] = None
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"{metric}: {e}")
+    if reading["energy_kwh"] is None:
+        raise ValueError("energy_kwh (o energy con su unidad) es obligatorio")
+
+    measured_at = raw.get("measured_at")
+    if measured_at:
+        measured_at = parse_datetime(str(measured_at))
+        if measured_at is None:
+            raise ValueError("measured_at no es una fecha ISO válida")
+        if timezone.is_naive(measured_at):
+            measured_at = timezone.make_aware(measured_at)
+    else:
+        measured_at = timezone.now()
+    reading["measured_at"] = measured_at
+    return reading
+
+
+def ingest_readings(readings, devices=None):
+    """
+    Ingresa un lote de lecturas crudas (lista de dicts).
+    - devices: queryset de Device permitidos (alcance del usuario); por defecto todos.
+    Retorna {"accepted": int, "alerts": int, "anomalies": int, "quarantined": int,
+    "rejected": [{"index", "reason"}]}.
+    """
+    if len(readings) > MAX_BATCH_SIZE:
+        raise ValueError(f"El lote excede el máximo de {MAX_BATCH_SIZE} lecturas")
+
+    rejected = []
+    parsed = []
+    for index, raw in enumerate(readings):
+        try:
+            reading = parse_reading(raw)
+        except ValueError as e:
+            rejected.append({"index": index, "reason": str(e)})
+            continue
+        reading["index"] = index
+        parsed.append(reading)
+
+    devices = Device.objects.all() if devices is None else devices
+    device_map = {
+        d.id: d
+        for d in devices.filter(id__in={r["device_id"] for r in parsed}, status="ACTIVE")
+        .only(
+            "id", "name", "organization_id", "zone_id", "product_id", "max_power_w",
+            "last_measured_at", "last_energy_kwh", "last_alert_id",
+        )
+    }
+
+    # Organizaciones desactivadas: la ingesta queda en pausa desde el instante
+    # en que se desactivan, aunque la cascada sobre sus devices siga en curso
+    paused = paused_organization_ids()
+
+    accepted = []
+    for r in parsed:
+        device = device_map.get(r["device_id"])
+        if device is None:
+            rejected.append({"index": r["index"], "reason": "Dispositivo inexistente, inactivo o fuera de alcance"})
+        elif device.organization_id in paused:
+            rejected.append({"index": r["index"], "reason": "Organización desactivada: ingesta en pausa"})
+        else:
+            accepted.append(r)
+
+    if not accepted:
+        return {"accepted": 0, "alerts": 0, "anomalies": 0, "quarantined": 0, "rejected": rejected}
+
+    # Orden temporal por dispositivo: necesario para detectar transiciones
+    accepted.sort(key=lambda r: (r["device_id"], r["measured_at"]))
+    values = np.array(
+        [[np.nan if r[f] is None else r[f] for f in METRIC_FIELDS] for r in accepted],
+        dtype=np.float64,
+    )
+
+    # Plausibilidad: lo imposible va a cuarentena y no sigue a alertas ni mediciones
+    reasons, limits, elapsed = check_plausibility(accepted, values, device_map)
+    quarantined = []
+    keep = []
+    for i, (r, reason) in enumerate(zip(accepted, reasons)):
+        if reason is None:
+            keep.append(i)
+        elif reason == DUPLICATE:
+            rejected.append({"index": r["index"], "reason": "Lectura duplicada: ya fue registrada"})
+        else:
+            quarantined.append(QuarantinedReading(
+                device=device_map[r["device_id"]],
+                measured_at=r["measured_at"],
+                reason=reason,
+                values=quarantine_values(r),
+                limit_kwh=float(limits[i]) if reason == QuarantinedReading.Reason.ABOVE_CAPACITY else None,
+            ))
+            label = QuarantinedReading.Reason(reason).label
+            rejected.append({"index": r["index"], "reason": f"En cuarentena: {label.lower()}"})
+    accepted = [accepted[i] for i in keep]
+    values = values[keep]
+    elapsed = elapsed[keep]
+
+    if not accepted:
+        with transaction.atomic(using=router.db_for_write(QuarantinedReading)):
+            QuarantinedReading.objects.bulk_create(quarantined)
+        return {"accepted": 0, "alerts": 0, "anomalies": 0, "quarantined": len(quarantined), "rejected": rejected}
+
+    product_ids = [device_map[r["device_id"]].product_id for r in accepted]
+    table = ThresholdTable(product_ids)
+    rule_indexes = table.evaluate(product_ids, values)
+
+    measurements = []
+    events = []
+    # Estado de alerta previo de cada dispositivo: el de su última lectura conocida
+    previous = {device_id: d.last_alert_id for device_id, d in device_map.items()}
+    for r, rule_index in zip(accepted, rule_indexes):
+        device = device_map[r["device_id"]]
+        rule = table.rule_at(int(rule_index))
+        measurements.append(Measurement(
+            device=device,
+            measured_at=r["measured_at"],
+            triggered_alert=rule,
+            **{f: r[f] for f in METRIC_FIELDS},
+        ))
+        if rule is not None and previous.get(device.id) != rule.id:
+            unit = table.unit_for(device.product_id, int(rule_index))
+            field, factor = UNIT_INDEX[unit]
+            events.append(AlertEvent(
+                device=device,
+                alert_rule=rule,
+                occurred_at=r["measured_at"],
+                message=f"{r[field] / factor:g} {unit} fuera de umbral",
+            ))
+        previous[device.id] = rule.id if rule else None
+
+    # Mediciones/eventos (series temporales) y Device pueden estar en bases distintas
+    timeseries_db = router.db_for_write(Measurement)
+    with transaction.atomic(using=timeseries_db), transaction.atomic(using=router.db_for_write(Device)):
+        Measurement.objects.bulk_create(measurements)
+        QuarantinedReading.objects.bulk_create(quarantined)
+        record_alert_events(events)
+        update_last_readings(measurements)
+        record_demand(measurements)
+        anomalies, resolved = detect_anomalies(accepted, values[:, ENERGY], elapsed, device_map)
+        transaction.on_commit(lambda: publish_ingested(measurements, events + anomalies, resolved), using=timeseries_db)
+
+    return {
+        "accepted": len(measurements), "alerts": len(events), "anomalies": len(anomalies),
+        "quarantined": len(quarantined), "rejected": rejected,
+    }
+
+
+def update_last_readings(measurements):
+    """
+    Actualiza en bloque last_measured_at / last_energy_kwh / last_alert de cada
+    dispositivo con su lectura más reciente del lote (si es más nueva que la guardada).
+    """
+    latest = {}
+    for m in measurements:
+        current = latest.get(m.device_id)
+        if current is None or m.measured_at >= current.measured_at:
+            latest[m.device_id] = m
+
+    devices = []
+    for m in latest.values():
+        device = m.device
+        if device.last_measured_at is not None and device.last_measured_at > m.measured_at:
+            continue
+        device.last_measured_at = m.measured_at
+        device.last_energy_kwh = m.energy_kwh
+        device.last_alert = m.triggered_alert
+        devices.append(device)
+
+    Device.objects.bulk_update(devices, ["last_measured_at", "last_energy_kwh", "last_alert"])
+    return len(devices)
+
+
+def publish_ingested(measurements, events, resolved=()):
+    """Publica mediciones y transiciones de alerta agrupadas por organización."""
+    by_org = defaultdict(list)
+    for m in measurements:
+        if broker.has_subscribers(m.device.organization_id):
+            by_org[m.device.organization_id].append({
+                "organization_id": m.device.organization_id,
+                "device_id": m.device_id,
+                "device": m.device.name,
+                "measured_at": m.measured_at.isoformat(),
+                **{f: getattr(m, f) for f in METRIC_FIELDS},
+                "alert": m.triggered_alert.name if m.triggered_alert else None,
+            })
+    for organization_id, rows in by_org.items():
+        broker.publish(organization_id, "measurements", rows)
+
+    publish_alert_events(events)
+    publish_alert_events(resolved, event_type="alert_resolved")
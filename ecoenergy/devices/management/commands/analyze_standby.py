@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from devices.standby import analyze_standby
+from ecoenergy.sharding import all_shards, use_shard
+
+
+class Command(BaseCommand):
+    help = 'Rank devices by energy wasted above their product standby power'
+
+    def handle(self, *args, **options):
+        total = 0
+        for shard in all_shards():
+            with use_shard(shard):
+                total += analyze_standby()
+
+        self.stdout.write(self.style.SUCCESS(f'Standby analysis updated for {total} devices'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from devices.benchmark import benchmark_organizations
+
+
+class Command(BaseCommand):
+    help = 'Rank each organization consumption against the whole fleet, per product category'
+
+    def handle(self, *args, **options):
+        total = benchmark_organizations()
+        self.stdout.write(self.style.SUCCESS(f'Benchmarks updated: {total} rows'))
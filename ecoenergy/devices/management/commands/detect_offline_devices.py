@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from devices.offline import sweep_offline_devices
+from ecoenergy.sharding import all_shards, use_shard
+
+
+class Command(BaseCommand):
+    help = 'Open/close "device offline" alerts for devices that stopped reporting'
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        opened = closed = 0
+        for shard in all_shards():
+            with use_shard(shard):
+                shard_opened, shard_closed = sweep_offline_devices()
+            opened += shard_opened
+            closed += shard_closed
+        elapsed_ms = (time.monotonic() - started) * 1000
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Offline sweep: {opened} opened, {closed} closed in {elapsed_ms:.0f} ms'
+        ))
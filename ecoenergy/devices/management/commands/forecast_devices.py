@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from devices.forecasting import forecast_devices
+from ecoenergy.sharding import all_shards, use_shard
+
+
+class Command(BaseCommand):
+    help = 'Fit the weekly Holt-Winters model and store each device 7-day hourly forecast'
+
+    def handle(self, *args, **options):
+        total = 0
+        for shard in all_shards():
+            with use_shard(shard):
+                total += forecast_devices()
+
+        self.stdout.write(self.style.SUCCESS(f'Forecasts updated for {total} devices'))
@@ -0,0 +1,51 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from devices.imports import import_devices, import_products
+from organizations.models import Organization
+
+
+class Command(BaseCommand):
+    help = 'Bulk import products or devices from a CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=['products', 'devices'])
+        parser.add_argument('path', help='CSV file (UTF-8, header row required).')
+        parser.add_argument('--organization', type=int,
+                            help='Import every device into this organization id (ignores the organization column).')
+        parser.add_argument('--errors', help='Write rejected rows to this CSV file.')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], 'rb') as f:
+                data = f.read()
+        except OSError as e:
+            raise CommandError(str(e))
+
+        try:
+            if options['kind'] == 'products':
+                result = import_products(data)
+            else:
+                organization = None
+                if options['organization']:
+                    try:
+                        organization = Organization.objects.get(pk=options['organization'])
+                    except Organization.DoesNotExist:
+                        raise CommandError(f"Organization {options['organization']} does not exist")
+                result = import_devices(data, organization=organization)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for line, _, message in result.errors[:20]:
+            self.stderr.write(f'  line {line}: {message}')
+        if len(result.errors) > 20:
+            self.stderr.write(f'  ... {len(result.errors) - 20} more')
+
+        if options['errors'] and result.errors:
+            with open(options['errors'], 'w', newline='', encoding='utf-8') as f:
+                csv.writer(f).writerows(result.error_rows())
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{options["kind"].capitalize()} imported: {result.created} created, {len(result.errors)} rejected'
+        ))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from devices.billing import parse_period, precompute_invoice
+from organizations.models import Organization
+
+
+class Command(BaseCommand):
+    help = 'Price the billing period of every active organization and cache the invoices'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period', help='Billing period YYYY-MM (default: current month).')
+        parser.add_argument('--organization', type=int, help='Only this organization id.')
+
+    def handle(self, *args, **options):
+        try:
+            label, _, _ = parse_period(options['period'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        organizations = Organization.objects.filter(is_active=True)
+        if options['organization']:
+            organizations = organizations.filter(pk=options['organization'])
+
+        priced = skipped = 0
+        for organization_id in organizations.values_list('id', flat=True):
+            if precompute_invoice(organization_id, label) is None:
+                skipped += 1
+            else:
+                priced += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Invoices for {label}: {priced} priced, {skipped} without tariff'
+        ))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from devices.billing import parse_period
+from devices.demand import rebuild_demand
+from ecoenergy.sharding import all_shards, use_shard
+
+
+class Command(BaseCommand):
+    help = 'Rebuild 15-minute demand intervals and monthly peaks from raw measurements'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period', help='Month YYYY-MM (default: current month).')
+
+    def handle(self, *args, **options):
+        try:
+            label, start, end = parse_period(options['period'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        total_intervals = total_peaks = 0
+        for shard in all_shards():
+            with use_shard(shard):
+                intervals, peaks = rebuild_demand(start, end)
+                total_intervals += intervals
+                total_peaks += peaks
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Demand for {label}: {total_intervals} intervals, {total_peaks} peaks'
+        ))
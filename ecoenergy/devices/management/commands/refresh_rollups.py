@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from devices.exports import parse_bound
+from devices.rollups import floor_day, refresh_rollups
+from ecoenergy.sharding import all_shards, use_shard
+
+
+class Command(BaseCommand):
+    help = 'Recalculate hourly and daily measurement rollups'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=2,
+                            help='Recalculate the last N hours (default: 2).')
+        parser.add_argument('--since', help='Backfill from this date (YYYY-MM-DD), one day per transaction.')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+
+        if options['since']:
+            try:
+                start = floor_day(parse_bound(options['since']))
+            except (TypeError, ValueError) as e:
+                raise CommandError(str(e))
+            windows = []
+            while start < now:
+                windows.append((start, min(start + timedelta(days=1), now)))
+                start += timedelta(days=1)
+        else:
+            windows = [(now - timedelta(hours=options['hours']), now)]
+
+        total_hourly = total_daily = 0
+        for shard in all_shards():
+            with use_shard(shard):
+                for start, end in windows:
+                    hourly, daily = refresh_rollups(start, end)
+                    total_hourly += hourly
+                    total_daily += daily
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rollups updated: {total_hourly} hourly, {total_daily} daily buckets'
+        ))
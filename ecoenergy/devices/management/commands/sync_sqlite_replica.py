@@ -0,0 +1,34 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Copy the SQLite primary into the local SQLite replica files (stand-in for replication)'
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES['default']
+        if 'sqlite3' not in primary['ENGINE']:
+            raise CommandError('Only for SQLite; real replicas are fed by database replication.')
+        pairs = [('default', settings.DATABASE_REPLICAS), ('timeseries', settings.TIMESERIES_REPLICAS)]
+        if not any(replicas for _, replicas in pairs):
+            raise CommandError('No replicas configured (set DB_REPLICA_NAMES or DB_TS_REPLICA_NAMES).')
+
+        for primary_alias, replicas in pairs:
+            if not replicas:
+                continue
+            source = sqlite3.connect(settings.DATABASES[primary_alias]['NAME'])
+            try:
+                for alias in replicas:
+                    target = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+                    try:
+                        # API de backup de SQLite: copia consistente aunque el primario esté en uso
+                        source.backup(target)
+                    finally:
+                        target.close()
+                    self.stdout.write(f'Synced {alias} <- {primary_alias}')
+            finally:
+                source.close()
+
+        self.stdout.write(self.style.SUCCESS('Replicas synced'))
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MeasurementRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('HOUR', 'Hourly'), ('DAY', 'Daily')], max_length=4)),
+                ('bucket_start', models.DateTimeField(help_text='Inicio del bucket (hora o día, UTC).')),
+                ('energy_kwh', models.FloatField(help_text='Suma de energía en el bucket (kWh).')),
+                ('min_kwh', models.FloatField(help_text='Lectura mínima del bucket.')),
+                ('max_kwh', models.FloatField(help_text='Lectura máxima del bucket.')),
+                ('readings', models.PositiveIntegerField(help_text='Cantidad de mediciones agregadas.')),
+                ('device', models.ForeignKey(help_text='Dispositivo agregado.', on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='devices.device')),
+            ],
+            options={
+                'verbose_name': 'Measurement Rollup',
+                'verbose_name_plural': 'Measurement Rollups',
+                'db_table': 'measurement_rollup',
+                'ordering': ['device_id', 'bucket_start'],
+                'indexes': [models.Index(fields=['resolution', 'bucket_start'], name='measurement_resolut_4006cc_idx')],
+                'constraints': [models.UniqueConstraint(fields=('device', 'resolution', 'bucket_start'), name='uix_rollup_device_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:19
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0002_measurement_rollup'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='alertevent',
+            name='occurred_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='Momento en que se generó el evento de alerta.'),
+        ),
+        migrations.AlterField(
+            model_name='measurement',
+            name='measured_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='Momento en que se registró la medición.'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:20
+
+import django.db.models.deletion
+from django.db import migrations, models, router
+
+
+def backfill_last_reading(apps, schema_editor):
+    # Una sola pasada: la última medición de cada dispositivo vía subconsulta
+    Device = apps.get_model('devices', 'Device')
+    Measurement = apps.get_model('devices', 'Measurement')
+    db = schema_editor.connection.alias
+    if not router.allow_migrate_model(db, Device) or not router.allow_migrate_model(db, Measurement):
+        # Mediciones en otra BD (series temporales): no hay subconsulta posible
+        return
+    latest = Measurement.objects.using(db).filter(device=models.OuterRef('pk')).order_by('-measured_at')
+    devices = Device.objects.using(db).annotate(
+        lm_at=models.Subquery(latest.values('measured_at')[:1]),
+        lm_kwh=models.Subquery(latest.values('energy_kwh')[:1]),
+        lm_alert=models.Subquery(latest.values('triggered_alert_id')[:1]),
+    ).filter(lm_at__isnull=False)
+    batch = []
+    for device in devices.iterator(chunk_size=1000):
+        device.last_measured_at = device.lm_at
+        device.last_energy_kwh = device.lm_kwh
+        device.last_alert_id = device.lm_alert
+        batch.append(device)
+    Device.objects.using(db).bulk_update(batch, ['last_measured_at', 'last_energy_kwh', 'last_alert'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0003_measured_at_default_now'),
+        ('organizations', '0005_organization_is_active_alter_usuario_phone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='device',
+            name='last_alert',
+            field=models.ForeignKey(blank=True, editable=False, help_text='Regla gatillada por la última medición (si aplica).', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='devices.alertrule'),
+        ),
+        migrations.AddField(
+            model_name='device',
+            name='last_energy_kwh',
+            field=models.FloatField(blank=True, editable=False, help_text='Energía de la última medición recibida (kWh).', null=True),
+        ),
+        migrations.AddField(
+            model_name='device',
+            name='last_measured_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Momento de la última medición recibida.', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='device',
+            index=models.Index(fields=['status', 'last_measured_at'], name='device_status_last_seen_idx'),
+        ),
+        migrations.RunPython(backfill_last_reading, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0004_device_last_reading'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alertevent',
+            name='resolved_at',
+            field=models.DateTimeField(blank=True, help_text='Momento en que la alerta dejó de estar vigente.', null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='reporting_interval_s',
+            field=models.PositiveIntegerField(default=900, help_text='Intervalo esperado entre lecturas (segundos).'),
+        ),
+        migrations.AddIndex(
+            model_name='alertevent',
+            index=models.Index(fields=['alert_rule', 'resolved_at'], name='alert_event_alert_r_cd90d9_idx'),
+        ),
+    ]
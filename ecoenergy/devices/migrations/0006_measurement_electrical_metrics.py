@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0005_offline_detection'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='measurement',
+            name='current_a',
+            field=models.FloatField(blank=True, help_text='Corriente (A).', null=True),
+        ),
+        migrations.AddField(
+            model_name='measurement',
+            name='power_w',
+            field=models.FloatField(blank=True, help_text='Potencia instantánea (W).', null=True),
+        ),
+        migrations.AddField(
+            model_name='measurement',
+            name='voltage_v',
+            field=models.FloatField(blank=True, help_text='Voltaje (V).', null=True),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0006_measurement_electrical_metrics'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='alertevent',
+            name='alert_rule',
+            field=models.ForeignKey(db_constraint=False, help_text='Regla de alerta que se disparó.', on_delete=django.db.models.deletion.DO_NOTHING, related_name='alert_events', to='devices.alertrule'),
+        ),
+        migrations.AlterField(
+            model_name='alertevent',
+            name='device',
+            field=models.ForeignKey(db_constraint=False, help_text='Dispositivo donde ocurrió la alerta.', on_delete=django.db.models.deletion.DO_NOTHING, related_name='alert_events', to='devices.device'),
+        ),
+        migrations.AlterField(
+            model_name='measurement',
+            name='device',
+            field=models.ForeignKey(db_constraint=False, help_text='Dispositivo al que pertenece la medición.', on_delete=django.db.models.deletion.DO_NOTHING, related_name='measurements', to='devices.device'),
+        ),
+        migrations.AlterField(
+            model_name='measurement',
+            name='triggered_alert',
+            field=models.ForeignKey(blank=True, db_constraint=False, help_text='Regla de alerta que coincidió con esta medición (si aplica).', null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='triggered_measurements', to='devices.alertrule'),
+        ),
+        migrations.AlterField(
+            model_name='measurementrollup',
+            name='device',
+            field=models.ForeignKey(db_constraint=False, help_text='Dispositivo agregado.', on_delete=django.db.models.deletion.DO_NOTHING, related_name='rollups', to='devices.device'),
+        ),
+    ]
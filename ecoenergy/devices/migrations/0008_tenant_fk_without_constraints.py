@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0007_timeseries_fk_without_constraints'),
+        ('organizations', '0005_organization_is_active_alter_usuario_phone'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='device',
+            name='last_alert',
+            field=models.ForeignKey(blank=True, db_constraint=False, editable=False, help_text='Regla gatillada por la última medición (si aplica).', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='devices.alertrule'),
+        ),
+        migrations.AlterField(
+            model_name='device',
+            name='organization',
+            field=models.ForeignKey(db_constraint=False, help_text='Organización (cliente) dueña del dispositivo.', on_delete=django.db.models.deletion.PROTECT, related_name='devices', to='organizations.organization'),
+        ),
+        migrations.AlterField(
+            model_name='device',
+            name='product',
+            field=models.ForeignKey(db_constraint=False, help_text='Producto del que deriva este dispositivo concreto.', on_delete=django.db.models.deletion.PROTECT, related_name='devices', to='devices.product'),
+        ),
+        migrations.AlterField(
+            model_name='zone',
+            name='organization',
+            field=models.ForeignKey(db_constraint=False, help_text='Organización (cliente) propietaria de la zona.', on_delete=django.db.models.deletion.PROTECT, related_name='zones', to='organizations.organization'),
+        ),
+    ]
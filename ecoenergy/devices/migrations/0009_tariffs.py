@@ -0,0 +1,60 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0008_tenant_fk_without_constraints'),
+        ('organizations', '0006_background_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tariff',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('ACTIVE', 'Activo'), ('INACTIVE', 'Inactivo')], default='ACTIVE', help_text='Estado lógico del registro.', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Fecha/hora de creación (solo se setea una vez).')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Fecha/hora de última actualización.')),
+                ('deleted_at', models.DateTimeField(blank=True, help_text='Marca de borrado lógico; no elimina físicamente el registro.', null=True)),
+                ('name', models.CharField(max_length=120)),
+                ('currency', models.CharField(default='CLP', help_text='Código ISO de la moneda.', max_length=3)),
+                ('energy_rate', models.FloatField(help_text='Precio por kWh fuera de las bandas horarias.')),
+                ('demand_charge_per_kw', models.FloatField(default=0, help_text='Cargo por kW de demanda máxima del periodo.')),
+                ('fixed_fee', models.FloatField(default=0, help_text='Cargo fijo por periodo de facturación.')),
+                ('valid_from', models.DateField(help_text='Primer día en que rige la tarifa.')),
+                ('organization', models.ForeignKey(help_text='Organización a la que se factura con esta tarifa.', on_delete=django.db.models.deletion.PROTECT, related_name='tariffs', to='organizations.organization')),
+            ],
+            options={
+                'verbose_name': 'Tariff',
+                'verbose_name_plural': 'Tariffs',
+                'db_table': 'tariff',
+                'ordering': ['organization_id', '-valid_from'],
+                'unique_together': {('organization', 'valid_from')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TariffBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('ACTIVE', 'Activo'), ('INACTIVE', 'Inactivo')], default='ACTIVE', help_text='Estado lógico del registro.', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Fecha/hora de creación (solo se setea una vez).')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Fecha/hora de última actualización.')),
+                ('deleted_at', models.DateTimeField(blank=True, help_text='Marca de borrado lógico; no elimina físicamente el registro.', null=True)),
+                ('name', models.CharField(help_text='Ej.: "Punta", "Valle".', max_length=60)),
+                ('weekdays', models.CharField(default='0123456', help_text='Días en que aplica: 0=lunes ... 6=domingo (ej.: 01234 = lunes a viernes).', max_length=7)),
+                ('start_hour', models.PositiveSmallIntegerField(help_text='Hora local de inicio (0-23).')),
+                ('end_hour', models.PositiveSmallIntegerField(help_text='Hora local de término, exclusiva (1-24).')),
+                ('rate', models.FloatField(help_text='Precio por kWh dentro de la banda.')),
+                ('tariff', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bands', to='devices.tariff')),
+            ],
+            options={
+                'db_table': 'tariff_band',
+                'ordering': ['tariff_id', 'id'],
+                'constraints': [models.CheckConstraint(condition=models.Q(('start_hour__lt', models.F('end_hour')), ('end_hour__lte', 24)), name='tariff_band_hours_valid')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0009_tariffs'),
+        ('organizations', '0006_background_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DemandInterval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('interval_start', models.DateTimeField(help_text='Inicio del intervalo de 15 minutos (UTC).')),
+                ('energy_kwh', models.FloatField(help_text='Energía de la zona en el intervalo (kWh).')),
+                ('organization', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='organizations.organization')),
+                ('zone', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='devices.zone')),
+            ],
+            options={
+                'db_table': 'demand_interval',
+                'indexes': [models.Index(fields=['organization', 'interval_start'], name='demand_inte_organiz_e785ed_idx')],
+                'constraints': [models.UniqueConstraint(fields=('zone', 'interval_start'), name='uix_demand_zone_interval')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DemandPeak',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='Primer día del mes de facturación.')),
+                ('interval_start', models.DateTimeField(help_text='Intervalo de 15 minutos en que ocurrió el máximo.')),
+                ('demand_kw', models.FloatField(help_text='Demanda promedio del intervalo (kW).')),
+                ('devices', models.JSONField(default=dict, help_text='Dispositivos que más aportaron: {device_id: kWh}.')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('organization', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='organizations.organization')),
+                ('zone', models.ForeignKey(blank=True, db_constraint=False, help_text='Zona; vacío = toda la organización.', null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='devices.zone')),
+            ],
+            options={
+                'db_table': 'demand_peak',
+                'indexes': [models.Index(fields=['organization', 'month'], name='demand_peak_organiz_936acd_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0010_demand_intervals'),
+        ('organizations', '0006_background_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StandbyWaste',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window_start', models.DateTimeField(help_text='Inicio del periodo analizado.')),
+                ('window_end', models.DateTimeField(help_text='Fin del periodo analizado.')),
+                ('idle_hours', models.PositiveIntegerField(help_text='Horas sin uso con datos en el periodo.')),
+                ('baseline_kw', models.FloatField(help_text='Consumo base (mediana) en horas sin uso (kW).')),
+                ('standby_kw', models.FloatField(help_text='Consumo en reposo declarado por el producto (kW).')),
+                ('wasted_kwh', models.FloatField(help_text='Energía sobre el reposo declarado en el periodo (kWh).')),
+                ('wasted_cost', models.FloatField(blank=True, help_text='Costo de esa energía según la tarifa vigente.', null=True)),
+                ('currency', models.CharField(blank=True, max_length=3)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('device', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='standby_waste', to='devices.device')),
+                ('organization', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='organizations.organization')),
+                ('zone', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='devices.zone')),
+            ],
+            options={
+                'db_table': 'standby_waste',
+                'ordering': ['-wasted_kwh'],
+                'indexes': [models.Index(fields=['organization', 'wasted_kwh'], name='standby_was_organiz_0d6622_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0011_standby_waste'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceUtilization',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(help_text='Día (UTC, igual que los rollups diarios).')),
+                ('hours', models.FloatField(help_text='Horas del día consideradas (24, o las transcurridas hoy).')),
+                ('energy_kwh', models.FloatField(help_text='Energía del día (kWh).')),
+                ('mean_utilization', models.FloatField(help_text='energy_kwh / (max_power_w x hours).')),
+                ('peak_utilization', models.FloatField(help_text='kWh de la hora de mayor consumo / max_power_w.')),
+                ('device', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='devices.device')),
+            ],
+            options={
+                'db_table': 'device_utilization',
+                'indexes': [models.Index(fields=['day'], name='device_util_day_d6cd18_idx')],
+                'constraints': [models.UniqueConstraint(fields=('device', 'day'), name='uix_utilization_device_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0012_device_utilization'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuarantinedReading',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('measured_at', models.DateTimeField()),
+                ('reason', models.CharField(choices=[('NEGATIVE', 'Valor negativo'), ('NON_FINITE', 'Valor no finito'), ('ABOVE_CAPACITY', 'Sobre la capacidad del dispositivo'), ('CONFLICT', 'Conflicto con la lectura anterior')], max_length=16)),
+                ('values', models.JSONField(help_text='Métricas recibidas, en unidad canónica (no finitos como texto).')),
+                ('limit_kwh', models.FloatField(blank=True, help_text='Máximo físicamente posible para el intervalo.', null=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('device', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='devices.device')),
+            ],
+            options={
+                'db_table': 'quarantined_reading',
+                'ordering': ['-received_at'],
+                'indexes': [models.Index(fields=['device', 'measured_at'], name='quarantined_device__7ed3e4_idx'), models.Index(fields=['received_at'], name='quarantined_receive_3cdb4f_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0013_quarantined_readings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateTimeField(help_text='Primera hora pronosticada (UTC).')),
+                ('hourly_kwh', models.BinaryField(help_text='kWh esperados por hora desde start (float32).')),
+                ('mae', models.FloatField(help_text='Error absoluto medio del modelo en la historia (kWh/hora).')),
+                ('generated_at', models.DateTimeField(auto_now=True)),
+                ('device', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='devices.device')),
+            ],
+            options={
+                'db_table': 'device_forecast',
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0014_device_forecasts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceAnomalyState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('state', models.BinaryField(help_text='media, varianza y conteo por hora de la semana (float32).')),
+                ('anomalous', models.BooleanField(default=False, help_text='Hay una alerta de consumo anómalo abierta.')),
+                ('score', models.FloatField(default=0, help_text='Puntaje de la última lectura.')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('device', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='devices.device')),
+            ],
+            options={
+                'db_table': 'device_anomaly_state',
+            },
+        ),
+    ]
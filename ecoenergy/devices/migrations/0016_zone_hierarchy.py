@@ -0,0 +1,55 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:51
+
+import django.db.models.deletion
+from django.db import migrations, models, router
+from django.db.models.functions import Cast, Concat
+
+
+def backfill_paths(apps, schema_editor):
+    # Las zonas existentes quedan como raíces: path = "<id>/", depth = 0
+    Zone = apps.get_model('devices', 'Zone')
+    db = schema_editor.connection.alias
+    if not router.allow_migrate_model(db, Zone):
+        return
+    Zone.objects.using(db).update(
+        path=Concat(Cast('id', models.CharField()), models.Value('/'), output_field=models.CharField())
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0015_device_anomaly_state'),
+        ('organizations', '0006_background_jobs'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='zone',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='zone',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, help_text='Nivel en la jerarquía (0 = raíz).'),
+        ),
+        migrations.AddField(
+            model_name='zone',
+            name='parent',
+            field=models.ForeignKey(blank=True, help_text='Zona contenedora (vacío = zona raíz).', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='children', to='devices.zone'),
+        ),
+        migrations.AddField(
+            model_name='zone',
+            name='path',
+            field=models.CharField(default='', editable=False, help_text="Ruta materializada de ids, ej. '12/45/'. La mantiene save().", max_length=255),
+        ),
+        migrations.AlterUniqueTogether(
+            name='zone',
+            unique_together={('organization', 'parent', 'name')},
+        ),
+        migrations.AddIndex(
+            model_name='zone',
+            index=models.Index(fields=['organization', 'path'], name='zone_org_path_idx'),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop, hints={'model_name': 'zone'}),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0016_zone_hierarchy'),
+        ('organizations', '0006_background_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrganizationBenchmark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(choices=[('DEVICE_KWH', 'kWh/día por dispositivo'), ('ZONE_KWH', 'kWh/día por zona')], max_length=12)),
+                ('value', models.FloatField(help_text='Valor de la organización (promedio de sus equipos o zonas).')),
+                ('percentile', models.FloatField(help_text='% de la flota con valor menor o igual (0-100).')),
+                ('fleet_p50', models.FloatField(help_text='Mediana de la flota.')),
+                ('fleet_p90', models.FloatField(help_text='Percentil 90 de la flota.')),
+                ('peers', models.PositiveIntegerField(help_text='Dispositivos o zonas de la flota comparados.')),
+                ('period_start', models.DateTimeField()),
+                ('period_end', models.DateTimeField()),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(blank=True, help_text='Categoría comparada; vacío = todos los dispositivos.', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='devices.category')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='benchmarks', to='organizations.organization')),
+            ],
+            options={
+                'db_table': 'organization_benchmark',
+                'ordering': ['organization_id', 'metric', 'category_id'],
+                'unique_together': {('organization', 'category', 'metric')},
+            },
+        ),
+    ]
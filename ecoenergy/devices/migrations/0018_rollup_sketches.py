@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0017_organization_benchmarks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='measurementrollup',
+            name='sketch',
+            field=models.BinaryField(blank=True, help_text='Solo DAY: sketch de cuantiles de los kWh horarios del día (devices/sketches.py).', null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0018_rollup_sketches'),
+        ('organizations', '0006_background_jobs'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='zone',
+            constraint=models.UniqueConstraint(condition=models.Q(('parent__isnull', True)), fields=('organization', 'name'), name='uix_zone_org_root_name'),
+        ),
+    ]
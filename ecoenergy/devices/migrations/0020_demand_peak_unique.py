@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:14
+
+from django.db import migrations, models, router
+
+
+def drop_duplicate_peaks(apps, schema_editor):
+    # Lotes concurrentes pudieron dejar varias filas por (organización, zona, mes):
+    # se conserva la de mayor demanda
+    DemandPeak = apps.get_model('devices', 'DemandPeak')
+    db = schema_editor.connection.alias
+    if not router.allow_migrate_model(db, DemandPeak):
+        return
+    rows = (
+        DemandPeak.objects.using(db)
+        .order_by('organization_id', 'zone_id', 'month', '-demand_kw', '-id')
+        .values_list('id', 'organization_id', 'zone_id', 'month')
+    )
+    seen, duplicates = set(), []
+    for pk, *key in rows:
+        key = tuple(key)
+        if key in seen:
+            duplicates.append(pk)
+        seen.add(key)
+    DemandPeak.objects.using(db).filter(pk__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0019_zone_root_unique'),
+        ('organizations', '0006_background_jobs'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_peaks, migrations.RunPython.noop, hints={'model_name': 'demandpeak'}),
+        migrations.AddConstraint(
+            model_name='demandpeak',
+            constraint=models.UniqueConstraint(fields=('organization', 'zone', 'month'), name='uix_demand_peak_zone_month'),
+        ),
+        migrations.AddConstraint(
+            model_name='demandpeak',
+            constraint=models.UniqueConstraint(condition=models.Q(('zone__isnull', True)), fields=('organization', 'month'), name='uix_demand_peak_org_month'),
+        ),
+    ]
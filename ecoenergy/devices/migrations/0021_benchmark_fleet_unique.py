@@ -0,0 +1,42 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:02
+
+from django.db import migrations, models, router
+
+
+def drop_duplicate_benchmarks(apps, schema_editor):
+    # Recálculos concurrentes pudieron dejar varias filas de flota (category NULL)
+    # por (organización, métrica): se conserva la más reciente
+    OrganizationBenchmark = apps.get_model('devices', 'OrganizationBenchmark')
+    db = schema_editor.connection.alias
+    if not router.allow_migrate_model(db, OrganizationBenchmark):
+        return
+    rows = (
+        OrganizationBenchmark.objects.using(db)
+        .filter(category__isnull=True)
+        .order_by('organization_id', 'metric', '-computed_at', '-id')
+        .values_list('id', 'organization_id', 'metric')
+    )
+    seen, duplicates = set(), []
+    for pk, *key in rows:
+        key = tuple(key)
+        if key in seen:
+            duplicates.append(pk)
+        seen.add(key)
+    OrganizationBenchmark.objects.using(db).filter(pk__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0020_demand_peak_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            drop_duplicate_benchmarks, migrations.RunPython.noop, hints={'model_name': 'organizationbenchmark'},
+        ),
+        migrations.AddConstraint(
+            model_name='organizationbenchmark',
+            constraint=models.UniqueConstraint(condition=models.Q(('category__isnull', True)), fields=('organization', 'metric'), name='uix_benchmark_org_metric_fleet'),
+        ),
+    ]
@@ -25,9 +25,11 @@
 #
 # ──────────────────────────────────────────────────────────────────────────────
 
-from django.db import models
+from django.db import models, router
 from organizations.models import Organization
 from django.db.models import Q, F
+from django.db.models.functions import Concat, Substr
+from django.utils import timezone
 
 
 
@@ -125,6 +127,13 @@ class Product(BaseModel):
     max_current_a = models.FloatField(null=True, blank=True)
     standby_power_w = models.FloatField(null=True, blank=True)
 
+    # Cada cuánto se espera una lectura de los dispositivos de este producto.
+    # Lo usa el detector de dispositivos sin reportar (devices/offline.py).
+    reporting_interval_s = models.PositiveIntegerField(
+        default=900,
+        help_text="Intervalo esperado entre lecturas (segundos)."
+    )
+
     class Meta:
         db_table = "product"
 
@@ -280,32 +289,133 @@ class ProductAlertRule(BaseModel):
 # ──────────────────────────────────────────────────────────────────────────────
 class Zone(BaseModel):
     """
-    Zona física dentro de una Organization (cliente).
+    Zona física dentro de una Organization (cliente), anidable:
+    edificio > piso > sala.
+
+    La jerarquía se guarda como "ruta materializada": path = ids de los
+    ancestros y de la propia zona, ej. "12/45/81/". El subárbol de una zona
+    (ella y todos sus descendientes) es entonces un RANGO de texto
+    [path, path con "/" final cambiado a "0") que usa el índice, sin consultas
+    recursivas: ver Zone.subtree_bounds() y devices/zones.py.
     """
+    PATH_SEPARATOR = "/"
+    MAX_DEPTH = 8
+
     organization = models.ForeignKey(
         Organization,
         on_delete=models.PROTECT,       # PROTECT: para no dejar zonas "huérfanas"
+        db_constraint=False,            # Organization vive en "default"; la zona, en su shard
         related_name="zones",
         help_text="Organización (cliente) propietaria de la zona."
     )
     name = models.CharField(max_length=120)
+    parent = models.ForeignKey(
+        "self",
+        on_delete=models.PROTECT,       # PROTECT: no borrar una zona con subzonas
+        null=True, blank=True,
+        related_name="children",
+        help_text="Zona contenedora (vacío = zona raíz)."
+    )
+    path = models.CharField(
+        max_length=255,
+        editable=False,
+        default="",
+        help_text="Ruta materializada de ids, ej. '12/45/'. La mantiene save()."
+    )
+    depth = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+        help_text="Nivel en la jerarquía (0 = raíz)."
+    )
 
     class Meta:
         db_table = "zone"
 
-        # unique_together: asegura que dentro de una misma organización
-        # no se repita el nombre de la zona (pero sí puede repetirse en otra org).
-        unique_together = [("organization", "name")]
+        # unique_together: dentro de una misma organización y bajo la misma
+        # zona padre no se repite el nombre ("Piso 1" puede existir en dos edificios).
+        unique_together = [("organization", "parent", "name")]
+        constraints = [
+            # parent NULL no se compara como igual en el índice anterior: las
+            # zonas raíz necesitan su propia restricción
+            models.UniqueConstraint(
+                fields=["organization", "name"],
+                condition=Q(parent__isnull=True),
+                name="uix_zone_org_root_name",
+            ),
+        ]
 
         # ordering múltiple: 1º por organización (id), 2º por nombre de zona
         ordering = ["organization_id", "name"]
 
+        indexes = [
+            # Subárbol = rango sobre path dentro de la organización
+            models.Index(fields=["organization", "path"], name="zone_org_path_idx"),
+        ]
+
         verbose_name = "Zone"
         verbose_name_plural = "Zones"
 
     def __str__(self):
         return f"{self.name} @ {self.organization.name}"
 
+    @classmethod
+    def subtree_bounds(cls, path):
+        """Rango [desde, hasta) de paths del subárbol: '12/45/' -> ('12/45/', '12/450')."""
+        return path, path[:-1] + chr(ord(cls.PATH_SEPARATOR) + 1)
+
+    @property
+    def ancestor_ids(self):
+        """Ids desde la raíz hasta el padre (sin la propia zona)."""
+        return [int(part) for part in self.path.split(self.PATH_SEPARATOR)[:-2]]
+
+    def subtree(self):
+        """Queryset de la zona y todos sus descendientes (una consulta de rango)."""
+        low, high = self.subtree_bounds(self.path)
+        return Zone.objects.using(self._state.db).filter(
+            organization_id=self.organization_id, path__gte=low, path__lt=high
+        )
+
+    def save(self, *args, **kwargs):
+        """
+        Guarda y mantiene path/depth. Si la zona cambia de padre, reescribe los
+        paths de todo su subárbol con un solo UPDATE.
+        """
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "parent" not in update_fields:
+            return super().save(*args, **kwargs)
+
+        parent_path = ""
+        if self.parent_id is not None:
+            # Path vigente del padre desde la BD (una instancia en memoria puede estar desactualizada)
+            parent = (
+                Zone.objects.using(kwargs.get("using") or self._state.db or router.db_for_write(Zone, instance=self))
+                .filter(pk=self.parent_id).values("organization_id", "path", "depth").get()
+            )
+            if parent["organization_id"] != self.organization_id:
+                raise ValueError("La zona padre debe ser de la misma organización.")
+            if self.pk is not None and f"/{self.pk}/" in f"/{parent['path']}":
+                raise ValueError("Una zona no puede quedar dentro de sí misma ni de sus subzonas.")
+            if parent["depth"] + 1 >= self.MAX_DEPTH:
+                raise ValueError(f"La jerarquía de zonas admite hasta {self.MAX_DEPTH} niveles.")
+            parent_path = parent["path"]
+
+        old_path, old_depth = self.path, self.depth
+        super().save(*args, **kwargs)
+
+        new_path = f"{parent_path}{self.pk}{self.PATH_SEPARATOR}"
+        if new_path == old_path:
+            return
+        new_depth = new_path.count(self.PATH_SEPARATOR) - 1
+        zones = Zone.objects.using(self._state.db)
+        if old_path:
+            low, high = self.subtree_bounds(old_path)
+            zones.filter(organization_id=self.organization_id, path__gte=low, path__lt=high).exclude(pk=self.pk).update(
+                path=Concat(models.Value(new_path), Substr("path", len(old_path) + 1), output_field=models.CharField()),
+                depth=F("depth") + (new_depth - old_depth),
+            )
+        zones.filter(pk=self.pk).update(path=new_path, depth=new_depth)
+        self.path, self.depth = new_path, new_depth
+
 
 class Device(BaseModel):
     """
@@ -315,6 +425,7 @@ class Device(BaseModel):
     organization = models.ForeignKey(
         Organization,
         on_delete=models.PROTECT,       # PROTECT: no borrar org si hay devices
+        db_constraint=False,            # cruza shards (ver ecoenergy/sharding.py)
         related_name="devices",
         help_text="Organización (cliente) dueña del dispositivo."
     )
@@ -327,6 +438,7 @@ class Device(BaseModel):
     product = models.ForeignKey(
         Product,
         on_delete=models.PROTECT,       # PROTECT: el device depende del product (catálogo)
+        db_constraint=False,            # el catálogo es global, el device está en su shard
         related_name="devices",
         help_text="Producto del que deriva este dispositivo concreto."
     )
@@ -340,6 +452,25 @@ class Device(BaseModel):
     )
     serial_number = models.CharField(max_length=120, blank=True, help_text="N° de serie (opcional).")
 
+    # Última lectura (desnormalizada): la mantiene la ingesta en bloque
+    # (devices/ingestion.py) para no calcular Max(measured_at) por dispositivo.
+    last_measured_at = models.DateTimeField(
+        null=True, blank=True, editable=False,
+        help_text="Momento de la última medición recibida."
+    )
+    last_energy_kwh = models.FloatField(
+        null=True, blank=True, editable=False,
+        help_text="Energía de la última medición recibida (kWh)."
+    )
+    last_alert = models.ForeignKey(
+        "AlertRule",
+        on_delete=models.SET_NULL,      # si borran la regla, el device queda sin alerta vigente
+        db_constraint=False,            # AlertRule es catálogo global
+        null=True, blank=True, editable=False,
+        related_name="+",               # sin relación inversa: es solo un dato de estado
+        help_text="Regla gatillada por la última medición (si aplica)."
+    )
+
     class Meta:
         db_table = "device"
 
@@ -348,6 +479,8 @@ class Device(BaseModel):
             models.Index(fields=["organization", "name"]),
             models.Index(fields=["zone"]),
             models.Index(fields=["product"]),
+            # Búsqueda de dispositivos sin reportar: rango sobre last_measured_at
+            models.Index(fields=["status", "last_measured_at"], name="device_status_last_seen_idx"),
         ]
 
         # Unicidad compuesta: evita repetir "name" de dispositivo dentro de la misma org.
@@ -367,22 +500,33 @@ class Measurement(BaseModel):
     - Opcionalmente, una Measurement puede quedar asociada a una AlertRule
       que fue gatillada por sus valores.
     """
+    # Series temporales: pueden vivir en otra BD (ver ecoenergy/routers.py), así que
+    # sus FK no llevan constraint ni cascada. Los devices se borran lógicamente
+    # (status), por lo que el historial se conserva.
     device = models.ForeignKey(
         Device,
-        on_delete=models.CASCADE,       # CASCADE: si se borra el device, se borran sus mediciones
+        on_delete=models.DO_NOTHING,    # sin cascada entre bases de datos
+        db_constraint=False,
         related_name="measurements",
         help_text="Dispositivo al que pertenece la medición."
     )
     measured_at = models.DateTimeField(
-        auto_now_add=True,              # fecha/hora cuando se creó el registro
+        default=timezone.now,           # la ingesta puede traer la hora real del medidor
         help_text="Momento en que se registró la medición."
     )
     # Si capturas energía acumulada, kWh tiene sentido. Si capturas potencia instantánea, usar power_w.
     energy_kwh = models.FloatField(help_text="Energía medida (kWh).")
 
+    # Métricas eléctricas opcionales en columnas nulas (una fila por lectura,
+    # no una fila por métrica). Siempre en unidad canónica (ver devices/units.py).
+    power_w = models.FloatField(null=True, blank=True, help_text="Potencia instantánea (W).")
+    current_a = models.FloatField(null=True, blank=True, help_text="Corriente (A).")
+    voltage_v = models.FloatField(null=True, blank=True, help_text="Voltaje (V).")
+
     triggered_alert = models.ForeignKey(
         AlertRule,
-        on_delete=models.SET_NULL,      # SET_NULL: si borran la regla, la medición queda sin alerta
+        on_delete=models.DO_NOTHING,    # reglas se desactivan (status), no se borran
+        db_constraint=False,
         null=True, blank=True,
         related_name="triggered_measurements",
         help_text="Regla de alerta que coincidió con esta medición (si aplica)."
@@ -411,18 +555,20 @@ class AlertEvent(BaseModel):
     """
     device = models.ForeignKey(
         Device,
-        on_delete=models.CASCADE,       # si el device se borra, sus eventos se borran
+        on_delete=models.DO_NOTHING,    # serie temporal: sin cascada entre bases de datos
+        db_constraint=False,
         related_name="alert_events",
         help_text="Dispositivo donde ocurrió la alerta."
     )
     alert_rule = models.ForeignKey(
         AlertRule,
-        on_delete=models.PROTECT,       # no permitimos borrar reglas con eventos históricos
+        on_delete=models.DO_NOTHING,    # reglas con historial se desactivan, no se borran
+        db_constraint=False,
         related_name="alert_events",
         help_text="Regla de alerta que se disparó."
     )
     occurred_at = models.DateTimeField(
-        auto_now_add=True,
+        default=timezone.now,           # la ingesta usa la hora de la lectura que gatilló la alerta
         help_text="Momento en que se generó el evento de alerta."
     )
     message = models.CharField(
@@ -430,12 +576,18 @@ class AlertEvent(BaseModel):
         blank=True,
         help_text="Mensaje adicional (opcional)."
     )
+    resolved_at = models.DateTimeField(
+        null=True, blank=True,          # null = alerta abierta (vigente)
+        help_text="Momento en que la alerta dejó de estar vigente."
+    )
 
     class Meta:
         db_table = "alert_event"
         indexes = [
             models.Index(fields=["device", "occurred_at"]),
             models.Index(fields=["alert_rule"]),
+            # Alertas abiertas de una regla: resolved_at IS NULL
+            models.Index(fields=["alert_rule", "resolved_at"]),
         ]
         ordering = ["-occurred_at"]
 
@@ -444,3 +596,423 @@ class AlertEvent(BaseModel):
 
     def __str__(self):
         return f"[{self.alert_rule.severity}] {self.alert_rule.name} @ {self.device}"
+
+
+class QuarantinedReading(models.Model):
+    """
+    Lectura recibida pero físicamente imposible (ver devices/validation.py):
+    negativa, no finita, sobre la capacidad del dispositivo o en conflicto con
+    la lectura anterior. Queda aquí para revisión y nunca llega a Measurement,
+    así no afecta rollups, demanda ni alertas.
+    """
+    class Reason(models.TextChoices):
+        NEGATIVE       = "NEGATIVE",       "Valor negativo"
+        NON_FINITE     = "NON_FINITE",     "Valor no finito"
+        ABOVE_CAPACITY = "ABOVE_CAPACITY", "Sobre la capacidad del dispositivo"
+        CONFLICT       = "CONFLICT",       "Conflicto con la lectura anterior"
+
+    device = models.ForeignKey(
+        Device,
+        on_delete=models.DO_NOTHING,    # serie temporal: sin cascada entre bases de datos
+        db_constraint=False,
+        related_name="+",
+    )
+    measured_at = models.DateTimeField()
+    reason = models.CharField(max_length=16, choices=Reason.choices)
+    values = models.JSONField(help_text="Métricas recibidas, en unidad canónica (no finitos como texto).")
+    limit_kwh = models.FloatField(null=True, blank=True, help_text="Máximo físicamente posible para el intervalo.")
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "quarantined_reading"
+        indexes = [
+            models.Index(fields=["device", "measured_at"]),
+            models.Index(fields=["received_at"]),
+        ]
+        ordering = ["-received_at"]
+
+    def __str__(self):
+        return f"{self.device_id} @ {self.measured_at:%Y-%m-%d %H:%M}: {self.reason}"
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Datos derivados (agregados de series temporales)
+# ──────────────────────────────────────────────────────────────────────────────
+class MeasurementRollup(models.Model):
+    """
+    Agregado de Measurement por dispositivo y bucket de tiempo (hora o día).
+    - Se recalcula desde la tabla cruda (ver devices/rollups.py), por eso no
+      hereda BaseModel: no tiene estado lógico ni borrado lógico propio.
+    - Permite consultar rangos largos (meses/años) leyendo pocas filas.
+    - Los buckets diarios guardan además un sketch de cuantiles combinable:
+      p50/p95 de cualquier rango, zona u organización salen de estas filas.
+    """
+    class Resolution(models.TextChoices):
+        HOUR = "HOUR", "Hourly"
+        DAY  = "DAY",  "Daily"
+
+    device = models.ForeignKey(
+        Device,
+        on_delete=models.DO_NOTHING,    # serie temporal: sin cascada entre bases de datos
+        db_constraint=False,
+        related_name="rollups",
+        help_text="Dispositivo agregado."
+    )
+    resolution = models.CharField(max_length=4, choices=Resolution.choices)
+    bucket_start = models.DateTimeField(help_text="Inicio del bucket (hora o día, UTC).")
+    energy_kwh = models.FloatField(help_text="Suma de energía en el bucket (kWh).")
+    min_kwh = models.FloatField(help_text="Lectura mínima del bucket.")
+    max_kwh = models.FloatField(help_text="Lectura máxima del bucket.")
+    readings = models.PositiveIntegerField(help_text="Cantidad de mediciones agregadas.")
+    sketch = models.BinaryField(
+        null=True, blank=True,
+        help_text="Solo DAY: sketch de cuantiles de los kWh horarios del día (devices/sketches.py).",
+    )
+
+    class Meta:
+        db_table = "measurement_rollup"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["device", "resolution", "bucket_start"],
+                name="uix_rollup_device_bucket",
+            ),
+        ]
+        indexes = [
+            # Consultas típicas: un rango de buckets para una resolución dada
+            models.Index(fields=["resolution", "bucket_start"]),
+        ]
+        ordering = ["device_id", "bucket_start"]
+
+        verbose_name = "Measurement Rollup"
+        verbose_name_plural = "Measurement Rollups"
+
+    def __str__(self):
+        return f"{self.device_id} {self.resolution} {self.bucket_start:%Y-%m-%d %H:%M} = {self.energy_kwh} kWh"
+
+
+class DemandInterval(models.Model):
+    """
+    Energía de una zona en un intervalo de demanda de 15 minutos.
+    - La mantiene la ingesta en línea (devices/demand.py): cada lote suma su
+      energía al intervalo, sin volver a leer Measurement.
+    - La demanda (kW) del intervalo es energy_kwh x 4; la de la organización
+      es la suma de sus zonas en el mismo intervalo.
+    """
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+    )
+    zone = models.ForeignKey(
+        Zone,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+    )
+    interval_start = models.DateTimeField(help_text="Inicio del intervalo de 15 minutos (UTC).")
+    energy_kwh = models.FloatField(help_text="Energía de la zona en el intervalo (kWh).")
+
+    class Meta:
+        db_table = "demand_interval"
+        constraints = [
+            models.UniqueConstraint(fields=["zone", "interval_start"], name="uix_demand_zone_interval"),
+        ]
+        indexes = [
+            models.Index(fields=["organization", "interval_start"]),
+        ]
+
+    def __str__(self):
+        return f"{self.zone_id} {self.interval_start:%Y-%m-%d %H:%M} = {self.energy_kwh} kWh"
+
+
+class DemandPeak(models.Model):
+    """
+    Demanda máxima de 15 minutos del mes (hora local) por organización
+    (zone = NULL) o por zona, con su intervalo y los dispositivos que más
+    aportaron en él ({device_id: kWh}). Se actualiza al ingresar lecturas.
+    """
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+    )
+    zone = models.ForeignKey(
+        Zone,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True, blank=True,
+        related_name="+",
+        help_text="Zona; vacío = toda la organización."
+    )
+    month = models.DateField(help_text="Primer día del mes de facturación.")
+    interval_start = models.DateTimeField(help_text="Intervalo de 15 minutos en que ocurrió el máximo.")
+    demand_kw = models.FloatField(help_text="Demanda promedio del intervalo (kW).")
+    devices = models.JSONField(default=dict, help_text="Dispositivos que más aportaron: {device_id: kWh}.")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "demand_peak"
+        constraints = [
+            models.UniqueConstraint(fields=["organization", "zone", "month"], name="uix_demand_peak_zone_month"),
+            # zone NULL no choca en el índice anterior: el máximo de la organización va aparte
+            models.UniqueConstraint(
+                fields=["organization", "month"],
+                condition=Q(zone__isnull=True),
+                name="uix_demand_peak_org_month",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["organization", "month"]),
+        ]
+
+    def __str__(self):
+        return f"{self.organization_id}/{self.zone_id or '*'} {self.month:%Y-%m} = {self.demand_kw} kW"
+
+
+class DeviceUtilization(models.Model):
+    """
+    Utilización diaria de capacidad de un dispositivo (devices/utilization.py):
+    energía del día frente a max_power_w x horas, y la hora de mayor consumo
+    frente a max_power_w. Se recalcula junto con los rollups del mismo día.
+    """
+    device = models.ForeignKey(
+        Device,
+        on_delete=models.DO_NOTHING,    # serie derivada: sin cascada entre bases de datos
+        db_constraint=False,
+        related_name="+",
+    )
+    day = models.DateField(help_text="Día (UTC, igual que los rollups diarios).")
+    hours = models.FloatField(help_text="Horas del día consideradas (24, o las transcurridas hoy).")
+    energy_kwh = models.FloatField(help_text="Energía del día (kWh).")
+    mean_utilization = models.FloatField(help_text="energy_kwh / (max_power_w x hours).")
+    peak_utilization = models.FloatField(help_text="kWh de la hora de mayor consumo / max_power_w.")
+
+    class Meta:
+        db_table = "device_utilization"
+        constraints = [
+            models.UniqueConstraint(fields=["device", "day"], name="uix_utilization_device_day"),
+        ]
+        indexes = [
+            models.Index(fields=["day"]),
+        ]
+
+    def __str__(self):
+        return f"{self.device_id} {self.day}: {self.mean_utilization:.0%} (pico {self.peak_utilization:.0%})"
+
+
+class DeviceForecast(models.Model):
+    """
+    Pronóstico horario de los próximos 7 días de un dispositivo (devices/forecasting.py).
+    Compacto: una fila por dispositivo con las 168 horas como float32 en binario
+    (672 bytes), en vez de 168 filas. Se reemplaza en cada corrida nocturna.
+    """
+    device = models.OneToOneField(
+        Device,
+        on_delete=models.DO_NOTHING,    # serie derivada: sin cascada entre bases de datos
+        db_constraint=False,
+        related_name="+",
+    )
+    start = models.DateTimeField(help_text="Primera hora pronosticada (UTC).")
+    hourly_kwh = models.BinaryField(help_text="kWh esperados por hora desde start (float32).")
+    mae = models.FloatField(help_text="Error absoluto medio del modelo en la historia (kWh/hora).")
+    generated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "device_forecast"
+
+    def __str__(self):
+        return f"{self.device_id} desde {self.start:%Y-%m-%d %H:%M}"
+
+
+class DeviceAnomalyState(models.Model):
+    """
+    Estado del detector de consumo anómalo de un dispositivo (devices/anomaly.py):
+    media, varianza (EWMA) y cantidad de lecturas por hora de la semana, como
+    una matriz 3 x 168 float32 en binario (~2 KB), más si hay una alerta abierta.
+    """
+    device = models.OneToOneField(
+        Device,
+        on_delete=models.DO_NOTHING,    # estado derivado: sin cascada entre bases de datos
+        db_constraint=False,
+        related_name="+",
+    )
+    state = models.BinaryField(help_text="media, varianza y conteo por hora de la semana (float32).")
+    anomalous = models.BooleanField(default=False, help_text="Hay una alerta de consumo anómalo abierta.")
+    score = models.FloatField(default=0, help_text="Puntaje de la última lectura.")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "device_anomaly_state"
+
+    def __str__(self):
+        return f"{self.device_id}: {self.score:.1f}{' (anómalo)' if self.anomalous else ''}"
+
+
+class StandbyWaste(models.Model):
+    """
+    Resultado materializado del análisis de consumo en reposo (devices/standby.py):
+    una fila por dispositivo con su consumo base en horas sin uso (noche y fin
+    de semana) comparado con Product.standby_power_w. Se reemplaza completo en
+    cada corrida, así la página de oportunidades de ahorro solo lee esta tabla.
+    """
+    device = models.OneToOneField(
+        Device,
+        on_delete=models.CASCADE,
+        related_name="standby_waste",
+    )
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+    )
+    zone = models.ForeignKey(
+        Zone,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    window_start = models.DateTimeField(help_text="Inicio del periodo analizado.")
+    window_end = models.DateTimeField(help_text="Fin del periodo analizado.")
+    idle_hours = models.PositiveIntegerField(help_text="Horas sin uso con datos en el periodo.")
+    baseline_kw = models.FloatField(help_text="Consumo base (mediana) en horas sin uso (kW).")
+    standby_kw = models.FloatField(help_text="Consumo en reposo declarado por el producto (kW).")
+    wasted_kwh = models.FloatField(help_text="Energía sobre el reposo declarado en el periodo (kWh).")
+    wasted_cost = models.FloatField(null=True, blank=True, help_text="Costo de esa energía según la tarifa vigente.")
+    currency = models.CharField(max_length=3, blank=True)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "standby_waste"
+        indexes = [
+            models.Index(fields=["organization", "wasted_kwh"]),
+        ]
+        ordering = ["-wasted_kwh"]
+
+    def __str__(self):
+        return f"{self.device_id}: {self.wasted_kwh:.1f} kWh sobre reposo"
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Tarifas por organización (facturación por costo, ver devices/billing.py)
+# ──────────────────────────────────────────────────────────────────────────────
+class Tariff(BaseModel):
+    """
+    Tarifa eléctrica de una Organization, vigente desde `valid_from`.
+    - energy_rate: precio por kWh fuera de las bandas horarias (TariffBand).
+    - demand_charge_per_kw: cargo por la demanda máxima (kW) del periodo.
+    - fixed_fee: cargo fijo por periodo de facturación (mes).
+    Vive en "default" junto a Organization (no es dato por tenant de alto volumen).
+    """
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.PROTECT,
+        related_name="tariffs",
+        help_text="Organización a la que se factura con esta tarifa."
+    )
+    name = models.CharField(max_length=120)
+    currency = models.CharField(max_length=3, default="CLP", help_text="Código ISO de la moneda.")
+    energy_rate = models.FloatField(help_text="Precio por kWh fuera de las bandas horarias.")
+    demand_charge_per_kw = models.FloatField(default=0, help_text="Cargo por kW de demanda máxima del periodo.")
+    fixed_fee = models.FloatField(default=0, help_text="Cargo fijo por periodo de facturación.")
+    valid_from = models.DateField(help_text="Primer día en que rige la tarifa.")
+
+    class Meta:
+        db_table = "tariff"
+        unique_together = [("organization", "valid_from")]
+        ordering = ["organization_id", "-valid_from"]
+
+        verbose_name = "Tariff"
+        verbose_name_plural = "Tariffs"
+
+    def __str__(self):
+        return f"{self.name} ({self.valid_from:%Y-%m-%d})"
+
+
+class TariffBand(BaseModel):
+    """
+    Banda horaria (time-of-use) de una Tariff: precio por kWh para las horas
+    [start_hour, end_hour) de los días indicados. Si dos bandas se solapan,
+    gana la de mayor `id` (la última creada).
+    """
+    tariff = models.ForeignKey(
+        Tariff,
+        on_delete=models.CASCADE,       # la banda no tiene sentido sin su tarifa
+        related_name="bands",
+    )
+    name = models.CharField(max_length=60, help_text='Ej.: "Punta", "Valle".')
+    weekdays = models.CharField(
+        max_length=7, default="0123456",
+        help_text="Días en que aplica: 0=lunes ... 6=domingo (ej.: 01234 = lunes a viernes)."
+    )
+    start_hour = models.PositiveSmallIntegerField(help_text="Hora local de inicio (0-23).")
+    end_hour = models.PositiveSmallIntegerField(help_text="Hora local de término, exclusiva (1-24).")
+    rate = models.FloatField(help_text="Precio por kWh dentro de la banda.")
+
+    class Meta:
+        db_table = "tariff_band"
+        constraints = [
+            models.CheckConstraint(
+                check=Q(start_hour__lt=F("end_hour")) & Q(end_hour__lte=24),
+                name="tariff_band_hours_valid",
+            ),
+        ]
+        ordering = ["tariff_id", "id"]
+
+    def __str__(self):
+        return f"{self.name} {self.start_hour:02d}-{self.end_hour:02d}h"
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Benchmark de organizaciones contra la flota (ver devices/benchmark.py)
+# ──────────────────────────────────────────────────────────────────────────────
+class OrganizationBenchmark(models.Model):
+    """
+    Percentil de una Organization dentro de la flota completa para una métrica
+    de consumo, por categoría de producto (category=None: todos los equipos).
+    Lo recalcula periódicamente `manage.py benchmark_organizations` desde los
+    rollups diarios; el dashboard solo lee estas filas.
+    Vive en "default" junto a Organization y Category.
+    """
+    class Metric(models.TextChoices):
+        DEVICE_KWH = "DEVICE_KWH", "kWh/día por dispositivo"
+        ZONE_KWH = "ZONE_KWH", "kWh/día por zona"
+
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.CASCADE,       # dato derivado: se va con la organización
+        related_name="benchmarks",
+    )
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        null=True, blank=True,
+        related_name="+",
+        help_text="Categoría comparada; vacío = todos los dispositivos.",
+    )
+    metric = models.CharField(max_length=12, choices=Metric.choices)
+    value = models.FloatField(help_text="Valor de la organización (promedio de sus equipos o zonas).")
+    percentile = models.FloatField(help_text="% de la flota con valor menor o igual (0-100).")
+    fleet_p50 = models.FloatField(help_text="Mediana de la flota.")
+    fleet_p90 = models.FloatField(help_text="Percentil 90 de la flota.")
+    peers = models.PositiveIntegerField(help_text="Dispositivos o zonas de la flota comparados.")
+    period_start = models.DateTimeField()
+    period_end = models.DateTimeField()
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "organization_benchmark"
+        unique_together = [("organization", "category", "metric")]
+        constraints = [
+            # category NULL no choca en el índice anterior: las filas de toda la flota van aparte
+            models.UniqueConstraint(
+                fields=["organization", "metric"],
+                condition=Q(category__isnull=True),
+                name="uix_benchmark_org_metric_fleet",
+            ),
+        ]
+        ordering = ["organization_id", "metric", "category_id"]
+
+    def __str__(self):
+        return f"{self.organization_id} {self.metric} {self.category_id or '*'}: p{self.percentile:.0f}"
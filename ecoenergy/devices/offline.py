@@ -0,0 +1,129 @@
+# devices/offline.py
+#
+# ──────────────────────────────────────────────────────────────────────────────
+# Propósito del módulo
+# ──────────────────────────────────────────────────────────────────────────────
+# Detector de dispositivos sin reportar ("device offline").
+#
+# Un dispositivo ACTIVE está offline si su última lectura (Device.last_measured_at,
+# desnormalizada por la ingesta) es más antigua que OFFLINE_GRACE_FACTOR veces el
+# intervalo esperado de su producto (Product.reporting_interval_s). Uno que
+# NUNCA reportó (last_measured_at NULL, p. ej. un medidor recién instalado que
+# no levantó) cuenta desde su alta (created_at) con el mismo margen.
+#
+# - Por cada intervalo distinto se hace una consulta de rango sobre el índice
+#   (status, last_measured_at): nunca se agrega la tabla measurement.
+# - Abre un AlertEvent por cada dispositivo que pasa a offline y cierra
+#   (resolved_at) los que volvieron a reportar, por el mismo camino bulk que la
+#   ingesta (devices/alerts.py).
+#
+# Se ejecuta periódicamente con:  python manage.py detect_offline_devices
+# ──────────────────────────────────────────────────────────────────────────────
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import router, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .alerts import close_alert_events, publish_alert_events, record_alert_events
+from .models import AlertEvent, AlertRule, Device, Product
+
+OFFLINE_RULE_NAME = "Device Offline"
+OFFLINE_GRACE_FACTOR = 2
+
+# Tamaño de los bloques de ids en cláusulas IN (límite de variables en SQLite)
+IN_CHUNK_SIZE = 900
+
+
+def chunked(ids, size=IN_CHUNK_SIZE):
+    ids = list(ids)
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+
+def get_offline_rule():
+    """Regla de catálogo usada para los eventos de dispositivo offline."""
+    rule, _ = AlertRule.objects.get_or_create(
+        name=OFFLINE_RULE_NAME,
+        severity=AlertRule.Severity.HIGH,
+        defaults={"unit": "s"},
+    )
+    return rule
+
+
+def find_stale_device_ids(now):
+    """
+    Ids de dispositivos ACTIVE cuya última lectura (o su alta, si nunca
+    reportaron) excede su intervalo esperado.
+    """
+    stale = set()
+    # Productos agrupados por intervalo; sin join device->product (el catálogo
+    # puede estar en otra BD que el shard del device, ver ecoenergy/sharding.py)
+    by_interval = defaultdict(list)
+    for product_id, interval in Product.objects.values_list("id", "reporting_interval_s"):
+        by_interval[interval].append(product_id)
+    for interval, product_ids in by_interval.items():
+        cutoff = now - timedelta(seconds=interval * OFFLINE_GRACE_FACTOR)
+        stale.update(
+            Device.objects.filter(
+                Q(last_measured_at__lt=cutoff) | Q(last_measured_at__isnull=True, created_at__lt=cutoff),
+                status="ACTIVE",
+                product_id__in=product_ids,
+            ).values_list("id", flat=True)
+        )
+    return stale
+
+
+def sweep_offline_devices(now=None):
+    """
+    Abre/cierra alertas de dispositivo offline.
+    Retorna (alertas_abiertas, alertas_cerradas).
+    """
+    now = now or timezone.now()
+    rule = get_offline_rule()
+
+    stale = find_stale_device_ids(now)
+    open_ids = set(
+        AlertEvent.objects.filter(alert_rule=rule, resolved_at__isnull=True)
+        .values_list("device_id", flat=True)
+    )
+    to_open = stale - open_ids
+    to_close = open_ids - stale
+
+    opened, closed = [], []
+    timeseries_db = router.db_for_write(AlertEvent)
+    with transaction.atomic(using=timeseries_db):
+        for ids in chunked(to_open):
+            devices = Device.objects.filter(id__in=ids).only(
+                "id", "name", "organization_id", "last_measured_at", "created_at",
+            )
+            for device in devices:
+                since = device.last_measured_at or device.created_at
+                opened.append(AlertEvent(
+                    device=device,
+                    alert_rule=rule,
+                    occurred_at=now,
+                    message=(
+                        f"Sin lecturas desde {since:%Y-%m-%d %H:%M} UTC"
+                        if device.last_measured_at else f"Sin lecturas desde su alta ({since:%Y-%m-%d %H:%M} UTC)"
+                    ),
+                ))
+        record_alert_events(opened)
+
+        for ids in chunked(to_close):
+            closed.extend(
+                AlertEvent.objects.filter(alert_rule=rule, resolved_at__isnull=True, device_id__in=ids)
+                .prefetch_related("device", "alert_rule")     # sin join: device/regla pueden estar en otra BD
+            )
+            close_alert_events(rule, ids, now)
+        for event in closed:
+            event.resolved_at = now
+
+        transaction.on_commit(lambda: (
+            publish_alert_events(opened),
+            publish_alert_events(closed, event_type="alert_resolved"),
+        ), using=timeseries_db)
+
+    return len(opened), len(closed)
@@ -0,0 +1,151 @@
+# devices/rollups.py
+#
+# ──────────────────────────────────────────────────────────────────────────────
+# Propósito del módulo
+# ──────────────────────────────────────────────────────────────────────────────
+# Mantiene la tabla MeasurementRollup a partir de Measurement:
+# - HOUR: suma/min/max/cantidad por dispositivo y hora (desde la tabla cruda)
+# - DAY : mismo agregado por día (desde los rollups horarios, no desde crudo),
+#         más un sketch de cuantiles de los kWh horarios del día
+#         (devices/sketches.py), combinable entre días, zonas y organizaciones
+#
+# El recálculo es idempotente: para el rango pedido se borran los buckets
+# existentes y se vuelven a insertar con bulk_create, todo en una transacción.
+# Los días recalculados también actualizan la utilización de capacidad
+# (devices/utilization.py) en la misma transacción.
+# Se ejecuta periódicamente con:  python manage.py refresh_rollups
+# ──────────────────────────────────────────────────────────────────────────────
+
+from datetime import timedelta
+
+import numpy as np
+from django.db import router, transaction
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncDay, TruncHour
+
+from .models import Measurement, MeasurementRollup
+from .sketches import QuantileSketch
+from .utilization import refresh_utilization
+
+ROLLUP_BATCH_SIZE = 2000
+
+
+def floor_hour(dt):
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+
+def floor_day(dt):
+    return dt.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _replace_buckets(resolution, start, end, rows, device_ids=None):
+    """Borra los buckets [start, end) de una resolución y los reinserta."""
+    stale = MeasurementRollup.objects.filter(
+        resolution=resolution, bucket_start__gte=start, bucket_start__lt=end
+    )
+    if device_ids is not None:
+        stale = stale.filter(device_id__in=device_ids)
+    stale.delete()
+
+    created = 0
+    batch = []
+    for row in rows:
+        batch.append(MeasurementRollup(resolution=resolution, **row))
+        if len(batch) >= ROLLUP_BATCH_SIZE:
+            MeasurementRollup.objects.bulk_create(batch)
+            created += len(batch)
+            batch = []
+    if batch:
+        MeasurementRollup.objects.bulk_create(batch)
+        created += len(batch)
+    return created
+
+
+def _hourly_rows(start, end, device_ids=None):
+    qs = Measurement.objects.filter(measured_at__gte=start, measured_at__lt=end)
+    if device_ids is not None:
+        qs = qs.filter(device_id__in=device_ids)
+    rows = (
+        qs.annotate(bucket=TruncHour("measured_at"))
+        .values("device_id", "bucket")
+        .annotate(
+            total=Sum("energy_kwh"), low=Min("energy_kwh"),
+            high=Max("energy_kwh"), n=Count("id"),
+        )
+        .order_by()
+        .iterator(chunk_size=ROLLUP_BATCH_SIZE)
+    )
+    for r in rows:
+        yield {
+            "device_id": r["device_id"], "bucket_start": r["bucket"],
+            "energy_kwh": r["total"], "min_kwh": r["low"],
+            "max_kwh": r["high"], "readings": r["n"],
+        }
+
+
+def _daily_sketches(hourly):
+    """
+    Sketch serializado de los kWh horarios de cada dispositivo y día UTC (el
+    mismo bucket que TruncDay con TIME_ZONE = UTC).
+    Retorna {(device_id, día como segundos epoch): bytes}.
+    """
+    rows = list(hourly.order_by().values_list("device_id", "bucket_start", "energy_kwh"))
+    n = len(rows)
+    device = np.fromiter((r[0] for r in rows), dtype=np.int64, count=n)
+    day = np.fromiter((int(r[1].timestamp()) // 86400 for r in rows), dtype=np.int64, count=n)
+    energy = np.fromiter((r[2] for r in rows), dtype=np.float64, count=n)
+    if not n:
+        return {}
+
+    # (dispositivo, día) empaquetados en un entero: un solo agrupamiento
+    first, span = int(day.min()), int(day.max() - day.min()) + 1
+    groups = QuantileSketch.from_groups(device * span + (day - first), energy)
+    return {(key // span, (first + key % span) * 86400): sketch.to_bytes() for key, sketch in groups.items()}
+
+
+def _daily_rows(start, end, device_ids=None):
+    qs = MeasurementRollup.objects.filter(
+        resolution=MeasurementRollup.Resolution.HOUR,
+        bucket_start__gte=start, bucket_start__lt=end,
+    )
+    if device_ids is not None:
+        qs = qs.filter(device_id__in=device_ids)
+    sketches = _daily_sketches(qs)
+    rows = (
+        qs.annotate(bucket=TruncDay("bucket_start"))
+        .values("device_id", "bucket")
+        .annotate(
+            total=Sum("energy_kwh"), low=Min("min_kwh"),
+            high=Max("max_kwh"), n=Sum("readings"),
+        )
+        .order_by()
+        .iterator(chunk_size=ROLLUP_BATCH_SIZE)
+    )
+    for r in rows:
+        yield {
+            "device_id": r["device_id"], "bucket_start": r["bucket"],
+            "energy_kwh": r["total"], "min_kwh": r["low"],
+            "max_kwh": r["high"], "readings": r["n"],
+            "sketch": sketches.get((r["device_id"], int(r["bucket"].timestamp()))),
+        }
+
+
+def refresh_rollups(start, end, device_ids=None):
+    """
+    Recalcula los rollups horarios y diarios que se solapan con [start, end).
+    Retorna (buckets_horarios, buckets_diarios) insertados.
+    """
+    hour_start, hour_end = floor_hour(start), floor_hour(end) + timedelta(hours=1)
+    day_start, day_end = floor_day(start), floor_day(end) + timedelta(days=1)
+
+    with transaction.atomic(using=router.db_for_write(MeasurementRollup)):
+        hourly = _replace_buckets(
+            MeasurementRollup.Resolution.HOUR, hour_start, hour_end,
+            _hourly_rows(hour_start, hour_end, device_ids), device_ids,
+        )
+        daily = _replace_buckets(
+            MeasurementRollup.Resolution.DAY, day_start, day_end,
+            _daily_rows(day_start, day_end, device_ids), device_ids,
+        )
+        refresh_utilization(day_start, day_end, device_ids)
+    return hourly, daily
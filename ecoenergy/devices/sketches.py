@@ -0,0 +1,155 @@
+# devices/sketches.py
+#
+# ──────────────────────────────────────────────────────────────────────────────
+# Propósito del módulo
+# ──────────────────────────────────────────────────────────────────────────────
+# Sketch de cuantiles aproximados y combinables (histograma de buckets
+# logarítmicos, al estilo DDSketch):
+#
+# - Cada valor positivo cae en el bucket k = ceil(log(v) / log(gamma)), con
+#   gamma = (1 + a) / (1 - a). Todo valor del bucket está a menos de un error
+#   RELATIVO `a` (RELATIVE_ACCURACY) de su representante, así p50/p95 salen con
+#   ese error sin guardar los valores.
+# - Construir es un np.bincount de las claves y COMBINAR dos sketches es sumar
+#   sus conteos: se pueden armar por shard, por día o por dispositivo y
+#   juntarse después sin volver a los datos crudos.
+# - Ceros (y valores bajo MIN_POSITIVE) van a un contador aparte.
+#
+# to_bytes() serializa a pocos cientos de bytes: offset, ceros y los conteos
+# en el entero sin signo más chico que los contiene.
+# ──────────────────────────────────────────────────────────────────────────────
+
+import math
+import struct
+
+import numpy as np
+
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+LOG_GAMMA = math.log(GAMMA)
+
+# Valores menores se cuentan como cero (kWh)
+MIN_POSITIVE = 1e-9
+
+# Cabecera: offset (int32), ceros (uint64), ancho de los conteos en bytes (uint8)
+_HEADER = struct.Struct("<iQB")
+_COUNT_DTYPES = {1: np.uint8, 2: np.uint16, 4: np.uint32, 8: np.uint64}
+
+
+def bucket_keys(values):
+    return np.ceil(np.log(values) / LOG_GAMMA).astype(np.int64)
+
+
+def bucket_values(keys):
+    """Representante de cada bucket: error relativo <= RELATIVE_ACCURACY."""
+    return 2 * GAMMA ** np.asarray(keys, dtype=np.float64) / (GAMMA + 1)
+
+
+class QuantileSketch:
+    """Conteos por bucket logarítmico desde `offset`, más la cantidad de ceros."""
+
+    __slots__ = ("offset", "counts", "zeros")
+
+    def __init__(self, offset=0, counts=None, zeros=0):
+        self.offset = int(offset)
+        self.counts = np.zeros(0, dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+        self.zeros = int(zeros)
+
+    @classmethod
+    def from_values(cls, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        positive = values[values > MIN_POSITIVE]
+        zeros = len(values) - len(positive)
+        if not len(positive):
+            return cls(zeros=zeros)
+        keys = bucket_keys(positive)
+        low = int(keys.min())
+        return cls(low, np.bincount(keys - low), zeros)
+
+    @classmethod
+    def from_groups(cls, groups, values):
+        """
+        {grupo: sketch} de los valores de cada grupo (groups: enteros), con las
+        claves de bucket calculadas una sola vez para todos los valores.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        finite = np.isfinite(values)
+        groups, values = np.asarray(groups, dtype=np.int64)[finite], values[finite]
+        if not len(values):
+            return {}
+        positive = values > MIN_POSITIVE
+        keys = np.zeros(len(values), dtype=np.int64)
+        keys[positive] = bucket_keys(values[positive])
+
+        # Ordenado por grupo y clave: cada grupo es un tramo contiguo y su
+        # primera clave positiva es el offset
+        order = np.lexsort((keys, groups))
+        groups, keys, positive = groups[order], keys[order], positive[order]
+        starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+        ends = np.r_[starts[1:], len(groups)]
+
+        sketches = {}
+        for group, a, b in zip(groups[starts].tolist(), starts.tolist(), ends.tolist()):
+            k = keys[a:b][positive[a:b]]
+            zeros = (b - a) - len(k)
+            sketches[group] = cls(k[0], np.bincount(k - k[0]), zeros) if len(k) else cls(zeros=zeros)
+        return sketches
+
+    @classmethod
+    def merge_all(cls, sketches):
+        """Un sketch con todos los valores de `sketches` (suma de conteos)."""
+        sketches = [s for s in sketches if s is not None]
+        filled = [s for s in sketches if len(s.counts)]
+        zeros = sum(s.zeros for s in sketches)
+        if not filled:
+            return cls(zeros=zeros)
+        low = min(s.offset for s in filled)
+        high = max(s.offset + len(s.counts) for s in filled)
+        counts = np.zeros(high - low, dtype=np.int64)
+        for s in filled:
+            start = s.offset - low
+            counts[start:start + len(s.counts)] += s.counts
+        return cls(low, counts, zeros)
+
+    def merge(self, other):
+        return QuantileSketch.merge_all([self, other])
+
+    @property
+    def count(self):
+        return self.zeros + int(self.counts.sum())
+
+    def quantile(self, q):
+        """Valor aproximado del cuantil q (0..1, escalar o array); NaN si está vacío."""
+        q = np.asarray(q, dtype=np.float64)
+        n = self.count
+        if not n:
+            return np.full(q.shape, np.nan) if q.ndim else float("nan")
+        # Posición (0..n-1) del cuantil y bucket que la contiene (ceros primero)
+        cumulative = np.cumsum(np.r_[self.zeros, self.counts])
+        position = np.searchsorted(cumulative, np.clip(q, 0, 1) * (n - 1), side="right")
+        result = np.where(position == 0, 0.0, bucket_values(self.offset + position - 1))
+        return result if q.ndim else float(result)
+
+    def rank(self, value):
+        """Fracción (0..1) de los valores que son <= value."""
+        n = self.count
+        if not n:
+            return float("nan")
+        if value <= MIN_POSITIVE:
+            return self.zeros / n
+        index = int(bucket_keys(np.float64(value))) - self.offset
+        below = int(self.counts[:max(index + 1, 0)].sum())
+        return (self.zeros + below) / n
+
+    def to_bytes(self):
+        top = int(self.counts.max()) if len(self.counts) else 0
+        width = next(w for w, dtype in _COUNT_DTYPES.items() if top <= np.iinfo(dtype).max)
+        return _HEADER.pack(self.offset, self.zeros, width) + self.counts.astype(_COUNT_DTYPES[width]).tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        data = bytes(data)
+        offset, zeros, width = _HEADER.unpack_from(data)
+        counts = np.frombuffer(data, dtype=_COUNT_DTYPES[width], offset=_HEADER.size)
+        return cls(offset, counts, zeros)
@@ -0,0 +1,122 @@
+# devices/standby.py
+#
+# ──────────────────────────────────────────────────────────────────────────────
+# Propósito del módulo
+# ──────────────────────────────────────────────────────────────────────────────
+# Análisis de consumo en reposo ("standby") de toda la flota:
+#
+# 1) Se cargan los rollups horarios de las últimas STANDBY_WINDOW_DAYS como
+#    arrays NumPy y se quedan solo las horas sin uso: noche (IDLE_NIGHT_HOURS)
+#    y fines de semana, en hora local.
+# 2) El consumo base de cada dispositivo es la MEDIANA de esas horas (robusta
+#    a un equipo que quedó encendido una noche): un lexsort por (dispositivo,
+#    kWh) y un indexado por grupo, sin loops por dispositivo.
+# 3) Lo que excede Product.standby_power_w, multiplicado por las horas sin uso,
+#    es energía desperdiciada; se valoriza con el precio promedio de esas
+#    horas en la tarifa de la organización (devices/billing.py).
+#
+# El resultado se materializa en StandbyWaste (reemplazo completo por shard),
+# así la página de oportunidades de ahorro solo ordena y agrupa esa tabla.
+# Se ejecuta con:  python manage.py analyze_standby
+# ──────────────────────────────────────────────────────────────────────────────
+
+from datetime import timedelta
+
+import numpy as np
+from django.db import router, transaction
+from django.utils import timezone
+
+from .billing import rate_tables, tariff_for
+from .models import Device, Product, StandbyWaste
+from .timeseries import load_hourly_arrays, local_calendar
+
+STANDBY_WINDOW_DAYS = 28
+
+# Horas locales [0, 6) de lunes a viernes, y sábado/domingo completos
+IDLE_NIGHT_HOURS = 6
+WEEKEND_DAYS = (5, 6)
+
+STANDBY_BATCH_SIZE = 1000
+
+
+def idle_mask(hour, weekday):
+    return (hour < IDLE_NIGHT_HOURS) | np.isin(weekday, WEEKEND_DAYS)
+
+
+def group_median(groups, values, n_groups):
+    """Mediana de `values` por grupo (0..n_groups-1); NaN en grupos vacíos."""
+    order = np.lexsort((values, groups))
+    ordered = values[order]
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.cumsum(counts) - counts
+    medians = np.full(n_groups, np.nan)
+    has = counts > 0
+    low = starts[has] + (counts[has] - 1) // 2
+    high = starts[has] + counts[has] // 2
+    medians[has] = (ordered[low] + ordered[high]) / 2
+    return medians, counts
+
+
+def _idle_rate(organization_id, at, cache):
+    """(precio medio por kWh en horas sin uso, moneda) de la tarifa vigente, o (None, "")."""
+    if organization_id not in cache:
+        tariff = tariff_for(organization_id, at)
+        if tariff is None:
+            cache[organization_id] = (None, "")
+        else:
+            rates, _, _ = rate_tables(tariff)
+            hours, days = np.meshgrid(np.arange(24), np.arange(7))
+            cache[organization_id] = (float(rates[idle_mask(hours, days)].mean()), tariff.currency)
+    return cache[organization_id]
+
+
+def analyze_standby(now=None):
+    """
+    Recalcula StandbyWaste para los dispositivos activos del shard actual cuyo
+    producto declara standby_power_w. Retorna la cantidad de filas escritas.
+    """
+    end = (now or timezone.now()).replace(minute=0, second=0, microsecond=0)
+    start = end - timedelta(days=STANDBY_WINDOW_DAYS)
+
+    # Producto (catálogo global) por id, sin join desde el device (otro shard)
+    standby_w = dict(
+        Product.objects.filter(standby_power_w__isnull=False).values_list("id", "standby_power_w")
+    )
+    devices = list(
+        Device.objects.filter(status="ACTIVE", product_id__in=list(standby_w))
+        .values_list("id", "organization_id", "zone_id", "product_id")
+    )
+    device_ids = np.array([d[0] for d in devices], dtype=np.int64)
+
+    device, epoch, energy = load_hourly_arrays(device_ids.tolist(), start, end)
+    hour, weekday, _ = local_calendar(epoch)
+    idle = idle_mask(hour, weekday)
+    device, energy = device[idle], energy[idle]
+
+    # Posición de cada fila en `devices` (búsqueda binaria sobre los ids ordenados)
+    order = np.argsort(device_ids)
+    position = order[np.searchsorted(device_ids, device, sorter=order)] if len(device) else device
+    baseline_kw, idle_hours = group_median(position, energy, len(devices))
+
+    standby_kw = np.array([standby_w[d[3]] / 1000 for d in devices], dtype=np.float64)
+    wasted_kwh = np.clip(baseline_kw - standby_kw, 0, None) * idle_hours
+
+    rates = {}
+    rows = []
+    for i, (pk, organization_id, zone_id, _) in enumerate(devices):
+        if not idle_hours[i]:
+            continue
+        rate, currency = _idle_rate(organization_id, end, rates)
+        rows.append(StandbyWaste(
+            device_id=pk, organization_id=organization_id, zone_id=zone_id,
+            window_start=start, window_end=end, idle_hours=int(idle_hours[i]),
+            baseline_kw=round(float(baseline_kw[i]), 4), standby_kw=float(standby_kw[i]),
+            wasted_kwh=round(float(wasted_kwh[i]), 3),
+            wasted_cost=round(float(wasted_kwh[i]) * rate, 2) if rate is not None else None,
+            currency=currency,
+        ))
+
+    with transaction.atomic(using=router.db_for_write(StandbyWaste)):
+        StandbyWaste.objects.all().delete()
+        StandbyWaste.objects.bulk_create(rows, batch_size=STANDBY_BATCH_SIZE)
+    return len(rows)
@@ -1,3 +1,1731 @@
-from django.test import TestCase
+# devices/tests.py
+#
+# ──────────────────────────────────────────────────────────────────────────────
+# Propósito del módulo
+# ──────────────────────────────────────────────────────────────────────────────
+# Pruebas de la app devices. FleetTestCase arma una flota mínima:
+# - Dos organizaciones (A con una zona raíz y una subzona, B con una zona).
+# - Un producto de 1000 W y un dispositivo por zona.
+# - Usuarios Encargado, Cliente Admin de A y Cliente Electrónico de A.
+#
+# La ingesta corre en el hilo de la prueba (INGESTION_WRITER_ENABLED=False): el
+# hilo escritor usaría otra conexión y no vería la transacción de la prueba.
+# SQLiteFilesTestCase suma bases SQLite reales (réplica, shard) para las
+# pruebas de extremo a extremo del enrutamiento.
+#
+# Orden de las pruebas: ingesta, alertas, bases de datos (réplicas, series
+# temporales, shards), consultas y exportación, análisis de energía (factura,
+# demanda, reposo, utilización, pronóstico, benchmark) y gestión de la flota
+# (importación, acciones masivas, zonas).
+# ──────────────────────────────────────────────────────────────────────────────
 
-# Create your tests here.
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import date, datetime, timedelta
+from datetime import timezone as dt_timezone
+from unittest import mock
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import IntegrityError, connections, router, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ecoenergy.routers import PIN_COOKIE, ReplicaPinningMiddleware, read_replica
+from ecoenergy.sharding import MergedResults, ShardMiddleware, current_shard, fan_out, use_organization, use_shard
+from organizations.models import Organization, Usuario
+
+from .anomaly import ANOMALY_RULE_NAME, ANOMALY_WARMUP, MEAN, MIN_STD_RATIO, AnomalyStore
+from .benchmark import DEVICE_KWH, ZONE_KWH, benchmark_organizations
+from .billing import invoice, parse_period, price_period
+from .bulk import (
+    RESULT_NOT_FOUND, RESULT_OK, RESULT_OTHER_ORGANIZATION, RESULT_UNCHANGED, apply_bulk_action, parse_device_ids,
+)
+from .demand import peak_for, rebuild_demand
+from .events import FLEET, SUBSCRIBER_QUEUE_SIZE, EventBroker, broker
+from .forecasting import (
+    HISTORY_WEEKS, SEASON_HOURS, consumption_vs_forecast, forecast_devices, forecast_series, holt_winters,
+)
+from .heatmap import HEATMAP_MAX_DAYS, WEEKDAYS, build_heatmap, consumption_heatmap, heatmap_period
+from .imports import import_devices, import_products
+from .ingestion import MAX_BATCH_SIZE, ingest_readings, parse_reading, publish_ingested
+from .models import (
+    AlertEvent, AlertRule, Category, DemandInterval, DemandPeak, Device, DeviceAnomalyState, DeviceForecast,
+    DeviceUtilization, Measurement, MeasurementRollup, OrganizationBenchmark, Product, ProductAlertRule,
+    QuarantinedReading, StandbyWaste, Tariff, TariffBand, Zone,
+)
+from .offline import OFFLINE_GRACE_FACTOR, OFFLINE_RULE_NAME, chunked, find_stale_device_ids, sweep_offline_devices
+from .rollups import refresh_rollups
+from .sketches import RELATIVE_ACCURACY, QuantileSketch
+from .standby import analyze_standby, group_median
+from .timeseries import choose_resolution, hourly_quantiles, lttb, minmax
+from .utilization import device_utilization, refresh_utilization, utilization_report
+from .writer import IngestionWriter, write_readings
+from .zones import filter_zone_subtree, path_ids, rollup_subtrees, tree_order, zone_summary
+
+# Lunes a mediodía (UTC): base fija para las lecturas de las pruebas
+T0 = datetime(2026, 3, 2, 12, 0, tzinfo=dt_timezone.utc)
+
+
+@override_settings(INGESTION_WRITER_ENABLED=False)
+class FleetTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.org_a = Organization.objects.create(name="Org A")
+        cls.org_b = Organization.objects.create(name="Org B")
+        cls.category = Category.objects.create(name="Climatización")
+        cls.product = Product.objects.create(name="Split", category=cls.category, sku="SPLIT-1")
+
+        cls.zone_a = Zone.objects.create(organization=cls.org_a, name="Edificio A")
+        cls.zone_a1 = Zone.objects.create(organization=cls.org_a, name="Piso 1", parent=cls.zone_a)
+        cls.zone_b = Zone.objects.create(organization=cls.org_b, name="Edificio B")
+
+        cls.device_a = cls.make_device(cls.zone_a, "AC-A")
+        cls.device_a1 = cls.make_device(cls.zone_a1, "AC-A1")
+        cls.device_b = cls.make_device(cls.zone_b, "AC-B")
+
+        cls.encargado = cls.make_user("encargado", "Encargado EcoEnergy")
+        cls.admin_a = cls.make_user("admin_a", "Cliente Admin", cls.org_a)
+        cls.viewer_a = cls.make_user("viewer_a", "Cliente Electrónico", cls.org_a)
+
+    @classmethod
+    def make_device(cls, zone, name, max_power_w=1000):
+        return Device.objects.create(
+            organization=zone.organization, zone=zone, product=cls.product, name=name, max_power_w=max_power_w,
+        )
+
+    @classmethod
+    def make_user(cls, username, group, organization=None):
+        user = User.objects.create_user(username, password="x")
+        user.groups.add(Group.objects.get_or_create(name=group)[0])
+        if organization is not None:
+            Usuario.objects.bulk_create([Usuario(user=user, organization=organization, name="Usuario", phone="911111111")])
+        return user
+
+    def setUp(self):
+        cache.clear()
+
+    def ingest(self, *readings, devices=None):
+        """ingest_readings() de tuplas (dispositivo, instante, kWh[, métricas])."""
+        return ingest_readings([
+            {"device_id": device.pk, "measured_at": at.isoformat(), "energy_kwh": kwh, **(extra[0] if extra else {})}
+            for device, at, kwh, *extra in readings
+        ], devices=devices)
+
+    def measure(self, device, measured_at, energy_kwh, **metrics):
+        return Measurement.objects.create(device=device, measured_at=measured_at, energy_kwh=energy_kwh, **metrics)
+
+    def client_for(self, user):
+        self.client.force_login(user)
+        return self.client
+
+
+@override_settings(INGESTION_WRITER_ENABLED=False)
+class SQLiteFilesTestCase(TransactionTestCase):
+    """
+    Pruebas con bases SQLite reales además del primario: cada alias de
+    `attached` es un archivo temporal con el esquema copiado del primario de
+    pruebas (API de backup, como sync_sqlite_replica) y se suma a `databases`
+    al iniciar la clase (el runner valida los alias antes de que existan).
+    TransactionTestCase porque los hilos de fan_out() y las otras bases no ven
+    la transacción abierta de un TestCase.
+    """
+
+    attached = ()
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        for alias in cls.attached:
+            connections.settings[alias] = {
+                "ENGINE": "django.db.backends.sqlite3", "NAME": os.path.join(cls.tmpdir.name, f"{alias}.sqlite3"),
+            }
+        connections.configure_settings(connections.settings)     # completa los valores por defecto
+        for alias in cls.attached:
+            cls.copy_primary(alias)
+        cls.databases = {"default", *cls.attached}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        for alias in cls.attached:
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+        cls.tmpdir.cleanup()
+
+    @staticmethod
+    def copy_primary(alias):
+        """Copia el primario completo (esquema y filas) sobre `alias`."""
+        for connection in (connections["default"], connections[alias]):
+            connection.ensure_connection()
+        connections["default"].connection.backup(connections[alias].connection)
+
+    def setUp(self):
+        cache.clear()
+        self.org_a = Organization.objects.create(name="Org A")
+        self.org_b = Organization.objects.create(name="Org B")
+        self.product = Product.objects.create(name="Split", category=Category.objects.create(name="Climatización"), sku="SPLIT-1")
+
+    def make_device(self, organization, zone_name, name):
+        with use_organization(organization.pk):
+            zone, _ = Zone.objects.get_or_create(organization=organization, name=zone_name)
+            return Device.objects.create(
+                organization=organization, zone=zone, product=self.product, name=name, max_power_w=1000,
+            )
+
+    def login(self, username, group, organization=None):
+        user = User.objects.create_user(username, password="x")
+        user.groups.add(Group.objects.get_or_create(name=group)[0])
+        if organization:
+            Usuario.objects.bulk_create([Usuario(user=user, organization=organization, name="Usuario", phone="911111111")])
+        self.client.force_login(user)
+        return self.client
+
+
+def read_csv(response):
+    body = b"".join(response.streaming_content)
+    if response["Content-Type"] == "application/gzip":
+        body = gzip.decompress(body)
+    return list(csv.reader(io.StringIO(body.decode("utf-8"))))
+
+
+class IngestionWriterTests(FleetTestCase):
+    """Ingesta por el hilo escritor único y la API de ingesta."""
+
+    def post_readings(self, user, readings):
+        return self.client_for(user).post(
+            reverse("api_ingesta"), data=json.dumps({"readings": readings}), content_type="application/json",
+        )
+
+    def test_group_is_written_with_one_savepoint_per_batch(self):
+        good, bad = Future(), Future()
+        too_big = [{"device_id": self.device_a.pk, "energy_kwh": 0.1}] * (MAX_BATCH_SIZE + 1)
+        IngestionWriter()._write_jobs([
+            ([{"device_id": self.device_a.pk, "energy_kwh": 0.1, "measured_at": T0.isoformat()}], None, good),
+            (too_big, None, bad),
+        ])
+
+        self.assertEqual(good.result(timeout=0)["accepted"], 1)
+        self.assertIsInstance(bad.exception(timeout=0), ValueError)
+        self.assertEqual(Measurement.objects.count(), 1)
+
+    def test_write_readings_gives_up_waiting_on_a_stuck_writer(self):
+        with override_settings(INGESTION_WRITER_ENABLED=True), \
+                mock.patch("devices.writer.writer.submit", return_value=Future()), \
+                mock.patch("devices.writer.WRITER_RESULT_TIMEOUT_S", 0.01):
+            with self.assertRaises(FutureTimeoutError):
+                write_readings([{"device_id": self.device_a.pk, "energy_kwh": 0.1}])
+
+    def test_api_rejects_devices_of_other_organizations(self):
+        response = self.post_readings(self.admin_a, [
+            {"device_id": self.device_a.pk, "energy_kwh": 0.1, "measured_at": T0.isoformat()},
+            {"device_id": self.device_b.pk, "energy_kwh": 0.1, "measured_at": T0.isoformat()},
+        ])
+        body = response.json()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body["accepted"], 1)
+        self.assertEqual(body["rejected"], [{"index": 1, "reason": "Dispositivo inexistente, inactivo o fuera de alcance"}])
+
+    def test_api_errors(self):
+        response = self.client_for(self.admin_a).post(reverse("api_ingesta"), data="{}", content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+        with mock.patch("devices.views.write_readings", side_effect=FutureTimeoutError):
+            response = self.post_readings(self.admin_a, [{"device_id": self.device_a.pk, "energy_kwh": 0.1}])
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(response.json()["success"])
+
+
+class LastReadingTests(FleetTestCase):
+    """Última lectura y última alerta desnormalizadas en Device."""
+
+    def test_latest_reading_of_the_batch_is_stored_on_the_device(self):
+        result = self.ingest(
+            (self.device_a, T0 + timedelta(minutes=15), 0.2),
+            (self.device_a, T0, 0.1),
+        )
+        self.device_a.refresh_from_db()
+
+        self.assertEqual(result["accepted"], 2)
+        self.assertEqual(self.device_a.last_measured_at, T0 + timedelta(minutes=15))
+        self.assertEqual(self.device_a.last_energy_kwh, 0.2)
+
+    def test_late_readings_do_not_move_it_back(self):
+        self.ingest((self.device_a, T0, 0.2))
+        self.ingest((self.device_a, T0 - timedelta(hours=1), 0.1))
+        self.device_a.refresh_from_db()
+
+        self.assertEqual(Measurement.objects.filter(device=self.device_a).count(), 2)
+        self.assertEqual((self.device_a.last_measured_at, self.device_a.last_energy_kwh), (T0, 0.2))
+
+    def test_last_alert_follows_the_latest_reading(self):
+        rule = AlertRule.objects.create(name="Consumo alto", default_max_threshold=0.15)
+        ProductAlertRule.objects.create(product=self.product, alert_rule=rule)
+
+        self.ingest((self.device_a, T0, 0.2))
+        self.device_a.refresh_from_db()
+        self.assertEqual(self.device_a.last_alert, rule)
+        self.assertEqual(AlertEvent.objects.filter(device=self.device_a).count(), 1)
+
+        self.ingest((self.device_a, T0 + timedelta(minutes=15), 0.1))
+        self.device_a.refresh_from_db()
+        self.assertIsNone(self.device_a.last_alert)
+
+
+class MultiMetricTests(FleetTestCase):
+    """Energía, potencia, corriente y voltaje en unidades canónicas, y reglas por unidad."""
+
+    def test_readings_with_units_are_stored_in_canonical_columns(self):
+        reading = parse_reading({
+            "device_id": self.device_a.pk, "energy": 150, "power": 0.6, "current": 2600, "voltage_v": 230,
+            "units": {"energy": "Wh", "power": "kW", "current": "mA"},
+        })
+        self.assertAlmostEqual(reading["energy_kwh"], 0.15)
+        self.assertAlmostEqual(reading["power_w"], 600)
+        self.assertAlmostEqual(reading["current_a"], 2.6)
+        self.assertEqual(reading["voltage_v"], 230)
+
+    def test_invalid_units_are_rejected(self):
+        with self.assertRaisesMessage(ValueError, "Unidad 'kV' no válida para power"):
+            parse_reading({"device_id": self.device_a.pk, "energy_kwh": 0.1, "power": 1, "units": {"power": "kV"}})
+        with self.assertRaisesMessage(ValueError, "energy_kwh (o energy con su unidad) es obligatorio"):
+            parse_reading({"device_id": self.device_a.pk, "power_w": 500})
+
+        result = self.ingest((self.device_a, T0, 0.1, {"units": "kWh"}))
+        self.assertEqual(result["accepted"], 0)
+        self.assertEqual(result["rejected"][0]["reason"], "units debe ser un objeto {métrica: unidad}")
+
+    def test_optional_metrics_are_persisted(self):
+        self.ingest(
+            (self.device_a, T0, 0.1, {"power": 0.4, "units": {"power": "kW"}, "voltage_v": 229.5}),
+            (self.device_a, T0 + timedelta(minutes=15), 0.1),
+        )
+        first, second = Measurement.objects.filter(device=self.device_a).order_by("measured_at")
+        self.assertEqual((first.power_w, first.current_a, first.voltage_v), (400, None, 229.5))
+        self.assertEqual((second.power_w, second.voltage_v), (None, None))
+
+    def test_rules_compare_in_their_own_unit(self):
+        rule = AlertRule.objects.create(name="Potencia alta", unit="kW", default_max_threshold=0.5)
+        ProductAlertRule.objects.create(product=self.product, alert_rule=rule)
+
+        result = self.ingest(
+            (self.device_a, T0, 0.1, {"power_w": 450}),
+            (self.device_a1, T0, 0.1, {"power_w": 700}),
+            (self.device_b, T0, 0.1),       # sin potencia: la regla no aplica
+        )
+        self.assertEqual(result["alerts"], 1)
+        event = AlertEvent.objects.get(alert_rule=rule)
+        self.assertEqual(event.device_id, self.device_a1.pk)
+        self.assertEqual(event.message, "0.7 kW fuera de umbral")
+
+    def test_product_thresholds_use_their_unit_override(self):
+        rule = AlertRule.objects.create(name="Potencia alta", unit="kW", default_max_threshold=0.5)
+        ProductAlertRule.objects.create(
+            product=self.product, alert_rule=rule, min_threshold=0, max_threshold=800, unit_override="W",
+        )
+        pump = Product.objects.create(name="Bomba", category=self.category, sku="BOMBA-1")
+        Device.objects.filter(pk=self.device_b.pk).update(product=pump)
+        # Otra métrica: el umbral propio de la bomba es de corriente
+        ProductAlertRule.objects.create(product=pump, alert_rule=rule, min_threshold=0, max_threshold=3, unit_override="A")
+
+        result = self.ingest(
+            (self.device_a, T0, 0.1, {"power_w": 700}),         # > 0.5 kW, pero < 800 W
+            (self.device_a1, T0, 0.1, {"power_w": 900}),
+            (self.device_b, T0, 0.1, {"power_w": 900, "current_a": 4}),
+        )
+        self.assertEqual(result["alerts"], 2)
+        self.assertEqual(
+            dict(AlertEvent.objects.filter(alert_rule=rule).values_list("device_id", "message")),
+            {self.device_a1.pk: "900 W fuera de umbral", self.device_b.pk: "4 A fuera de umbral"},
+        )
+
+    def test_unknown_unit_override_never_triggers(self):
+        rule = AlertRule.objects.create(name="Potencia alta", unit="kW", default_max_threshold=0.5)
+        ProductAlertRule.objects.create(
+            product=self.product, alert_rule=rule, min_threshold=0, max_threshold=1, unit_override="caballos",
+        )
+        self.assertEqual(self.ingest((self.device_a, T0, 0.1, {"power_w": 5000}))["alerts"], 0)
+
+
+class PlausibilityTests(FleetTestCase):
+    """Filtro de plausibilidad de la ingesta: aceptadas, rechazadas y en cuarentena."""
+
+    def test_batch_is_split_into_accepted_rejected_and_quarantined(self):
+        result = self.ingest(
+            (self.device_a, T0, 0.1),
+            (self.device_a, T0, 0.1),                                   # duplicada
+            (self.device_a, T0, 0.2),                                   # conflicto
+            (self.device_a, T0 + timedelta(minutes=15), -0.1),
+            (self.device_a, T0 + timedelta(minutes=30), float("nan")),
+            (self.device_a, T0 + timedelta(minutes=45), 0.5),           # 1000 W x 15 min = 0.25 kWh
+            (self.device_a, T0 + timedelta(minutes=60), 0.1),
+        )
+
+        self.assertEqual((result["accepted"], result["quarantined"]), (2, 4))
+        self.assertEqual(
+            [r["reason"] for r in sorted(result["rejected"], key=lambda r: r["index"])],
+            [
+                "Lectura duplicada: ya fue registrada",
+                "En cuarentena: conflicto con la lectura anterior",
+                "En cuarentena: valor negativo",
+                "En cuarentena: valor no finito",
+                "En cuarentena: sobre la capacidad del dispositivo",
+            ],
+        )
+        self.assertEqual(Measurement.objects.filter(device=self.device_a).count(), 2)
+
+        quarantined = {q.reason: q for q in QuarantinedReading.objects.filter(device=self.device_a)}
+        self.assertAlmostEqual(quarantined[QuarantinedReading.Reason.ABOVE_CAPACITY].limit_kwh, 0.2625)
+        self.assertEqual(quarantined[QuarantinedReading.Reason.NON_FINITE].values["energy_kwh"], "nan")
+        self.assertIsNone(quarantined[QuarantinedReading.Reason.NEGATIVE].limit_kwh)
+
+    def test_resent_readings_are_duplicates_not_conflicts(self):
+        self.ingest((self.device_a, T0, 0.1), (self.device_a, T0 + timedelta(minutes=15), 0.1))
+
+        result = self.ingest((self.device_a, T0, 0.1), (self.device_a, T0 + timedelta(minutes=15), 0.1))
+        self.assertEqual((result["accepted"], result["quarantined"]), (0, 0))
+        self.assertEqual({r["reason"] for r in result["rejected"]}, {"Lectura duplicada: ya fue registrada"})
+
+    def test_capacity_limit_uses_the_time_since_the_previous_reading(self):
+        self.ingest((self.device_a, T0, 0.1))
+        result = self.ingest((self.device_a, T0 + timedelta(hours=2), 2.0))      # 2 h a 1000 W
+        self.assertEqual(result["accepted"], 1)
+
+    def test_unknown_capacity_is_not_checked(self):
+        unknown = self.make_device(self.zone_a, "AC-X", max_power_w=0)
+        result = self.ingest((unknown, T0, 50.0))
+        self.assertEqual((result["accepted"], result["quarantined"]), (1, 0))
+
+
+class LiveEventTests(FleetTestCase):
+    """Pub/sub en vivo (SSE) de mediciones y alertas."""
+
+    async def test_ingested_readings_reach_organization_and_fleet_subscribers(self):
+        own, other, fleet = broker.subscribe(self.org_a.pk), broker.subscribe(self.org_b.pk), broker.subscribe(FLEET)
+        try:
+            publish_ingested([Measurement(device=self.device_a, measured_at=T0, energy_kwh=1.5)], [])
+            await asyncio.sleep(0)
+
+            self.assertEqual((own.queue.qsize(), other.queue.qsize(), fleet.queue.qsize()), (1, 0, 1))
+            event = await own.get()
+            self.assertEqual(event["type"], "measurements")
+            self.assertEqual(event["data"][0]["device"], "AC-A")
+            self.assertEqual(event["data"][0]["organization_id"], self.org_a.pk)
+        finally:
+            for sub in (own, other, fleet):
+                broker.unsubscribe(sub)
+        self.assertFalse(broker.has_subscribers(self.org_a.pk))
+
+    async def test_slow_subscribers_drop_events_instead_of_growing(self):
+        local = EventBroker()
+        sub = local.subscribe(self.org_a.pk)
+        for i in range(SUBSCRIBER_QUEUE_SIZE + 3):
+            local.publish(self.org_a.pk, "alert", {"n": i})
+        await asyncio.sleep(0)
+
+        self.assertEqual(sub.queue.qsize(), SUBSCRIBER_QUEUE_SIZE)
+        self.assertEqual(sub.dropped, 3)
+
+    async def test_stream_requires_an_organization(self):
+        await self.async_client.aforce_login(self.viewer_a)
+        response = await self.async_client.get(reverse("stream_eventos"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        await response.streaming_content.aclose()
+
+        orphan = await User.objects.acreate(username="sin_org")
+        await self.async_client.aforce_login(orphan)
+        response = await self.async_client.get(reverse("stream_eventos"))
+        self.assertEqual(response.status_code, 403)
+
+
+class OfflineDetectorTests(FleetTestCase):
+    """Barrido de dispositivos sin reportar."""
+
+    def setUp(self):
+        super().setUp()
+        # Altas del día siguiente: los que nunca reportaron siguen dentro del
+        # margen, salvo en las pruebas que adelantan su created_at
+        Device.objects.update(created_at=T0 + timedelta(days=1))
+
+    def test_sweep_opens_then_closes_the_offline_alert(self):
+        self.ingest((self.device_a, T0, 0.1))
+        grace = timedelta(seconds=self.product.reporting_interval_s * OFFLINE_GRACE_FACTOR)
+
+        self.assertEqual(sweep_offline_devices(now=T0 + grace - timedelta(minutes=1)), (0, 0))
+        self.assertEqual(sweep_offline_devices(now=T0 + grace + timedelta(minutes=1)), (1, 0))
+        event = AlertEvent.objects.get(alert_rule__name=OFFLINE_RULE_NAME)
+        self.assertEqual(event.device_id, self.device_a.pk)
+        self.assertIsNone(event.resolved_at)
+
+        # Un segundo barrido no duplica la alerta abierta
+        self.assertEqual(sweep_offline_devices(now=T0 + grace + timedelta(minutes=5)), (0, 0))
+
+        back = T0 + grace + timedelta(minutes=15)
+        self.ingest((self.device_a, back, 0.1))
+        self.assertEqual(sweep_offline_devices(now=back + timedelta(minutes=1)), (0, 1))
+        event.refresh_from_db()
+        self.assertEqual(event.resolved_at, back + timedelta(minutes=1))
+
+    def test_only_active_devices_are_candidates(self):
+        self.ingest((self.device_a, T0, 0.1), (self.device_b, T0, 0.1))
+        Device.objects.filter(pk=self.device_b.pk).update(status="INACTIVE")
+        Device.objects.filter(pk=self.device_a1.pk).update(created_at=T0)
+        self.ingest((self.device_a1, T0 + timedelta(days=1), 0.1))
+
+        stale = find_stale_device_ids(T0 + timedelta(days=1))
+        self.assertEqual(stale, {self.device_a.pk})
+
+    def test_devices_that_never_reported_count_from_their_creation(self):
+        grace = timedelta(seconds=self.product.reporting_interval_s * OFFLINE_GRACE_FACTOR)
+        Device.objects.filter(pk=self.device_a1.pk).update(created_at=T0)
+
+        self.assertEqual(find_stale_device_ids(T0 + grace - timedelta(minutes=1)), set())
+        self.assertEqual(sweep_offline_devices(now=T0 + grace + timedelta(minutes=1)), (1, 0))
+        event = AlertEvent.objects.get(alert_rule__name=OFFLINE_RULE_NAME)
+        self.assertEqual(event.device_id, self.device_a1.pk)
+        self.assertEqual(event.message, "Sin lecturas desde su alta (2026-03-02 12:00 UTC)")
+
+    def test_interval_comes_from_the_product(self):
+        self.ingest((self.device_a, T0, 0.1))
+        Product.objects.filter(pk=self.product.pk).update(reporting_interval_s=3600)
+
+        self.assertEqual(find_stale_device_ids(T0 + timedelta(hours=1)), set())
+        self.assertEqual(find_stale_device_ids(T0 + timedelta(hours=3)), {self.device_a.pk})
+
+    def test_chunked_splits_id_lists(self):
+        self.assertEqual(list(chunked(range(5), size=2)), [[0, 1], [2, 3], [4]])
+
+
+class AnomalyTests(FleetTestCase):
+    """Puntaje de consumo anómalo por hora de la semana y su alerta."""
+
+    def week(self, n, kwh):
+        """Dos lecturas a 15 minutos en la misma hora de la semana n: la segunda es la que se puntúa."""
+        at = T0 + timedelta(weeks=n)
+        return (self.device_a, at - timedelta(minutes=15), 0.1), (self.device_a, at, kwh)
+
+    def warm_up(self):
+        self.ingest(*(reading for n in range(ANOMALY_WARMUP) for reading in self.week(n, 0.1)))
+
+    def test_scores_start_after_the_warmup(self):
+        store = AnomalyStore([self.device_a.pk])
+        scores = [store.update(0, 12, 0.4, threshold=4)[0] for _ in range(ANOMALY_WARMUP)]
+        self.assertEqual(scores, [0.0] * ANOMALY_WARMUP)
+
+        score, expected = store.update(0, 12, 0.9, threshold=4)
+        self.assertAlmostEqual(expected, 0.4)
+        # Desviación nula: se usa el piso relativo (5 % de la media)
+        self.assertAlmostEqual(score, 0.5 / (MIN_STD_RATIO * 0.4))
+        # El pico entra a la media recortado a `threshold` desviaciones (peso 1/n aún)
+        self.assertAlmostEqual(store.state[0, MEAN, 12], 0.4 + 4 * MIN_STD_RATIO * 0.4 / (ANOMALY_WARMUP + 1))
+
+    def test_alert_opens_on_a_spike_and_closes_when_back_to_normal(self):
+        self.warm_up()
+        state = DeviceAnomalyState.objects.get(device=self.device_a)
+        self.assertFalse(state.anomalous)
+
+        result = self.ingest(*self.week(ANOMALY_WARMUP, 0.2))
+        self.assertEqual(result["anomalies"], 1)
+        event = AlertEvent.objects.get(alert_rule__name=ANOMALY_RULE_NAME)
+        self.assertIsNone(event.resolved_at)
+        self.assertIn("0.80 kW vs. 0.40 kW", event.message)
+
+        self.ingest(*self.week(ANOMALY_WARMUP + 1, 0.1))
+        event.refresh_from_db()
+        self.assertEqual(event.resolved_at, T0 + timedelta(weeks=ANOMALY_WARMUP + 1))
+        self.assertFalse(DeviceAnomalyState.objects.get(device=self.device_a).anomalous)
+
+    @override_settings(ANOMALY_SCORE_THRESHOLD=100)
+    def test_threshold_comes_from_settings(self):
+        self.warm_up()
+        self.assertEqual(self.ingest(*self.week(ANOMALY_WARMUP, 0.2))["anomalies"], 0)
+
+
+@override_settings(DATABASE_REPLICAS=["replica1"])
+class ReplicaRoutingTests(SimpleTestCase):
+    """ReplicaRouter y @read_replica con alias simulados (sin conexión)."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def routed_view(self, request):
+        """Vista @read_replica que responde a qué alias se leería un Device y una sesión."""
+        @read_replica
+        def view(request):
+            return HttpResponse(f"{router.db_for_read(Device)} {router.db_for_read(Session)}")
+        return view(request).content.decode()
+
+    def test_only_safe_requests_of_marked_views_read_from_the_replica(self):
+        self.assertEqual(router.db_for_read(Device), "default")
+        self.assertEqual(self.routed_view(self.factory.get("/")), "replica1 default")
+        self.assertEqual(self.routed_view(self.factory.post("/")), "default default")
+
+    def test_writes_always_go_to_the_primary(self):
+        @read_replica
+        def view(request):
+            return HttpResponse(router.db_for_write(Device))
+        self.assertEqual(view(self.factory.get("/")).content, b"default")
+
+    def test_writers_are_pinned_to_the_primary_by_a_signed_cookie(self):
+        middleware = ReplicaPinningMiddleware(lambda request: HttpResponse(self.routed_view(request)))
+
+        response = middleware(self.factory.post("/"))
+        cookie = response.cookies[PIN_COOKIE]
+        self.assertEqual(cookie["max-age"], 5)
+        self.assertTrue(cookie["httponly"])
+
+        pinned = self.factory.get("/")
+        pinned.COOKIES[PIN_COOKIE] = cookie.value
+        self.assertEqual(middleware(pinned).content, b"default default")
+
+        forged = self.factory.get("/")
+        forged.COOKIES[PIN_COOKIE] = str(time.time() + 3600)
+        self.assertEqual(middleware(forged).content, b"replica1 default")
+
+    @override_settings(REPLICA_PIN_SECONDS=-1)
+    def test_expired_pin_reads_from_the_replica_again(self):
+        middleware = ReplicaPinningMiddleware(lambda request: HttpResponse(self.routed_view(request)))
+        expired = self.factory.get("/")
+        expired.COOKIES[PIN_COOKIE] = middleware(self.factory.post("/")).cookies[PIN_COOKIE].value
+        self.assertEqual(middleware(expired).content, b"replica1 default")
+
+    def test_replicas_are_never_migrated(self):
+        self.assertIs(router.allow_migrate("replica1", "devices", model_name="device"), False)
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaDatabaseTests(SQLiteFilesTestCase):
+    """Primario y réplica en dos archivos SQLite: la réplica queda atrasada a propósito."""
+
+    attached = ("replica",)
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.login("admin_a", "Cliente Admin", self.org_a)
+        self.make_device(self.org_a, "Edificio A", "AC-1")
+        self.copy_primary("replica")
+        # Escrita después de replicar: solo existe en el primario
+        self.make_device(self.org_a, "Edificio A", "AC-2")
+
+    def listed(self):
+        return [d.name for d in self.client.get(reverse("lista_dispositivos")).context["page_obj"]]
+
+    def test_marked_views_read_from_the_replica(self):
+        self.assertEqual(self.listed(), ["AC-1"])
+        self.assertEqual(list(Device.objects.values_list("name", flat=True).order_by("name")), ["AC-1", "AC-2"])
+        self.assertFalse(Device.objects.using("replica").filter(name="AC-2").exists())
+
+    def test_a_write_pins_the_next_requests_to_the_primary(self):
+        response = self.client.post(reverse("lista_dispositivos"), {"items_per_page": 25})
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(self.listed(), ["AC-1", "AC-2"])
+
+        self.client.cookies[PIN_COOKIE] = str(time.time() + 3600)       # sin firma: no fija
+        self.assertEqual(self.listed(), ["AC-1"])
+
+
+@override_settings(TIMESERIES_DATABASE="timeseries", TIMESERIES_REPLICAS=["timeseries_replica1"], DATABASE_REPLICAS=[])
+class TimeSeriesRoutingTests(SimpleTestCase):
+    """Modelos de series temporales en su propio alias."""
+
+    def setUp(self):
+        # Solo se consulta el alias; no se abre ninguna conexión
+        patcher = mock.patch.dict(settings.DATABASES, {"timeseries": {}})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_time_series_models_use_their_own_alias(self):
+        for model in (Measurement, AlertEvent, DemandPeak, MeasurementRollup):
+            self.assertEqual(router.db_for_write(model), "timeseries")
+            self.assertEqual(router.db_for_read(model), "timeseries")
+        self.assertEqual(router.db_for_write(Device), "default")
+        self.assertEqual(router.db_for_read(Device), "default")
+
+    def test_time_series_reads_follow_the_replica_rules(self):
+        @read_replica
+        def view(request):
+            return HttpResponse(f"{router.db_for_read(Measurement)} {router.db_for_write(Measurement)}")
+        self.assertEqual(view(RequestFactory().get("/")).content, b"timeseries_replica1 timeseries")
+        self.assertEqual(view(RequestFactory().post("/")).content, b"timeseries timeseries")
+
+    def test_each_alias_only_migrates_its_own_tables(self):
+        self.assertIs(router.allow_migrate("timeseries", "devices", model_name="measurement"), True)
+        self.assertIs(router.allow_migrate("default", "devices", model_name="measurement"), False)
+        self.assertIs(router.allow_migrate("timeseries", "devices", model_name="device"), False)
+        self.assertIs(router.allow_migrate("default", "devices", model_name="device"), True)
+        self.assertIs(router.allow_migrate("timeseries_replica1", "devices", model_name="measurement"), False)
+
+    @override_settings(TIMESERIES_DATABASE="missing")
+    def test_unknown_alias_falls_back_to_default(self):
+        self.assertEqual(router.db_for_write(Measurement), "default")
+
+
+def inline_fan_out(fn, shards=None):
+    """fan_out() sin hilos: cada "shard" corre en el hilo de la prueba (todos sobre "default")."""
+    results = []
+    for alias in shards or ("default", "shard1"):
+        with use_shard(alias):
+            results.append(fn())
+    return results
+
+
+class ShardingTests(FleetTestCase):
+    """Enrutamiento por shard de organización y mezcla de resultados (en el hilo de la prueba)."""
+
+    def sharded(self):
+        return self.settings(DATABASE_SHARDS=["shard1"], SHARD_MAP={self.org_b.pk: "shard1"})
+
+    def test_tenant_models_follow_the_organization_shard(self):
+        with self.sharded():
+            self.assertEqual(router.db_for_write(Device, instance=Device(organization_id=self.org_b.pk)), "shard1")
+            self.assertEqual(router.db_for_write(Device, instance=Device(organization_id=self.org_a.pk)), "default")
+            with use_organization(self.org_b.pk):
+                self.assertEqual(router.db_for_read(Measurement), "shard1")
+                self.assertEqual(router.db_for_read(Product), "default")     # catálogo global
+            self.assertEqual(router.db_for_read(Device), "default")
+
+    def test_shards_only_migrate_tenant_tables(self):
+        with self.sharded():
+            self.assertIs(router.allow_migrate("shard1", "devices", model_name="device"), True)
+            self.assertIs(router.allow_migrate("shard1", "devices", model_name="product"), False)
+            self.assertIs(router.allow_migrate("shard1", "organizations", model_name="organization"), False)
+
+    def test_middleware_uses_the_users_organization(self):
+        seen = []
+        middleware = ShardMiddleware(lambda request: seen.append(current_shard()) or HttpResponse())
+        request = RequestFactory().get("/")
+        request.user = self.viewer_a
+        with self.sharded():
+            middleware(request)
+            Usuario.objects.filter(user=self.viewer_a).update(organization=self.org_b)
+            request.user = User.objects.get(pk=self.viewer_a.pk)
+            middleware(request)
+        self.assertEqual(seen, ["default", "shard1"])
+        self.assertIsNone(current_shard())
+
+    def test_fan_out_runs_once_per_shard_in_order(self):
+        with self.sharded():
+            self.assertEqual(fan_out(current_shard), ["default", "shard1"])
+        self.assertEqual(fan_out(current_shard), ["default"])
+
+    def test_merged_results_sort_and_slice_across_shards(self):
+        organizations = {"default": self.org_a, "shard1": self.org_b}
+        self.make_device(self.zone_a, "AC-A2")
+        self.make_device(self.zone_b, "AC-B2")
+
+        def build():
+            return Device.objects.using("default").filter(organization=organizations[current_shard()])
+
+        with mock.patch("ecoenergy.sharding.fan_out", inline_fan_out):
+            merged = MergedResults(build, "-name")
+            self.assertEqual(merged.count(), 5)
+            self.assertEqual([d.name for d in merged[1:4]], ["AC-B", "AC-A2", "AC-A1"])
+            page = Paginator(merged, 2).page(3)
+            self.assertEqual([d.name for d in page], ["AC-A"])
+
+
+class ShardDatabaseTests(SQLiteFilesTestCase):
+    """Org A en "default" y Org B en un shard SQLite propio, con el fan_out real (hilos)."""
+
+    attached = ("shard1",)
+
+    def setUp(self):
+        super().setUp()
+        sharded = self.settings(DATABASE_SHARDS=["shard1"], SHARD_MAP={self.org_b.pk: "shard1"})
+        sharded.enable()
+        self.addCleanup(sharded.disable)
+        for organization, zone, name in (
+            (self.org_a, "Edificio A", "AC-1"), (self.org_b, "Edificio B", "AC-2"),
+            (self.org_a, "Edificio A", "AC-3"), (self.org_b, "Edificio B", "AC-4"),
+        ):
+            self.make_device(organization, zone, name)
+
+    def names(self, devices):
+        return [d.name for d in devices]
+
+    def test_tenant_rows_are_stored_in_their_shard(self):
+        self.assertEqual(self.names(Device.objects.using("default").order_by("name")), ["AC-1", "AC-3"])
+        self.assertEqual(self.names(Device.objects.using("shard1").order_by("name")), ["AC-2", "AC-4"])
+        self.assertEqual(Zone.objects.using("shard1").count(), 1)
+        self.assertFalse(Product.objects.using("shard1").exists())      # catálogo solo en "default"
+
+    def test_fan_out_queries_each_shard_from_a_worker_thread(self):
+        def names_in_shard():
+            return threading.current_thread().name, sorted(Device.objects.values_list("name", flat=True))
+
+        with mock.patch.object(connections, "close_all", wraps=connections.close_all) as close_all:
+            results = fan_out(names_in_shard)
+
+        self.assertEqual([names for _, names in results], [["AC-1", "AC-3"], ["AC-2", "AC-4"]])
+        self.assertTrue(all(thread.startswith("shard") for thread, _ in results))
+        self.assertEqual(close_all.call_count, 2)       # cada hilo cierra sus conexiones
+
+    def test_merged_results_page_across_real_shards(self):
+        merged = MergedResults(lambda: Device.objects.all(), "-name")
+        self.assertEqual(merged.count(), 4)
+        self.assertEqual(self.names(merged[1:3]), ["AC-3", "AC-2"])
+        self.assertEqual(self.names(Paginator(merged, 3).page(2)), ["AC-1"])
+
+        client = self.login("encargado", "Encargado EcoEnergy")
+        response = client.get(reverse("lista_dispositivos"), {"sort": "name"})
+        self.assertEqual(self.names(response.context["page_obj"]), ["AC-1", "AC-2", "AC-3", "AC-4"])
+
+
+class ExportTests(FleetTestCase):
+    """Exportación CSV en streaming de mediciones y alertas."""
+
+    def setUp(self):
+        super().setUp()
+        for hour in range(3):
+            self.measure(self.device_a, T0 + timedelta(hours=hour), 1.0 + hour)
+        self.measure(self.device_b, T0, 9.0)
+
+    def test_raw_export_is_scoped_to_the_organization(self):
+        response = self.client_for(self.admin_a).get(reverse("exportar_mediciones"))
+        rows = read_csv(response)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(rows[0][:4], ["device_id", "device", "measured_at", "energy_kwh"])
+        self.assertEqual([r[1] for r in rows[1:]], ["AC-A"] * 3)
+        self.assertEqual([float(r[3]) for r in rows[1:]], [1.0, 2.0, 3.0])
+
+    def test_daily_export_aggregates_in_the_database(self):
+        response = self.client_for(self.encargado).get(reverse("exportar_mediciones"), {"resolution": "daily"})
+        rows = read_csv(response)[1:]
+
+        totals = {r[1]: (float(r[3]), int(r[6])) for r in rows}
+        self.assertEqual(totals, {"AC-A": (6.0, 3), "AC-B": (9.0, 1)})
+
+    def test_gzip_and_period_filters(self):
+        response = self.client_for(self.admin_a).get(reverse("exportar_mediciones"), {
+            "gzip": "1", "start": (T0 + timedelta(hours=1)).isoformat(),
+        })
+        rows = read_csv(response)
+
+        self.assertTrue(response["Content-Disposition"].endswith('.csv.gz"'))
+        self.assertEqual([float(r[3]) for r in rows[1:]], [2.0, 3.0])
+
+    def test_alert_export_names_the_rule(self):
+        rule = AlertRule.objects.create(name="Consumo alto", severity=AlertRule.Severity.HIGH)
+        AlertEvent.objects.create(device=self.device_a, alert_rule=rule, occurred_at=T0, message="10 kWh fuera de umbral")
+        AlertEvent.objects.create(device=self.device_b, alert_rule=rule, occurred_at=T0, message="otra organización")
+
+        rows = read_csv(self.client_for(self.admin_a).get(reverse("exportar_alertas")))
+
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][4:], ["Consumo alto", "HIGH", "10 kWh fuera de umbral"])
+
+    def test_invalid_resolution_is_rejected(self):
+        response = self.client_for(self.admin_a).get(reverse("exportar_mediciones"), {"resolution": "weekly"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_pages_resume_after_the_last_row_without_gaps(self):
+        # Lecturas con el mismo instante: el keyset desempata por id
+        self.measure(self.device_a, T0 + timedelta(hours=1), 5.0)
+        self.measure(self.device_a1, T0, 7.0)
+        self.measure(self.device_a1, T0 + timedelta(days=1), 8.0)
+        client = self.client_for(self.encargado)
+
+        for resolution in ("raw", "hourly", "daily"):
+            full = read_csv(client.get(reverse("exportar_mediciones"), {"resolution": resolution}))
+            with mock.patch("devices.exports.EXPORT_CHUNK_SIZE", 2):
+                paged = read_csv(client.get(reverse("exportar_mediciones"), {"resolution": resolution}))
+            self.assertEqual(paged, full)
+        self.assertEqual(len(full), 5)          # AC-A, AC-A1 (2 días), AC-B
+        self.assertEqual(len(read_csv(client.get(reverse("exportar_mediciones")))), 8)
+
+
+class DownsamplingTests(SimpleTestCase):
+    """Reducción de puntos (LTTB, min/max) y elección de resolución."""
+
+    def test_lttb_keeps_endpoints_and_spikes(self):
+        t = np.arange(10_000, dtype=np.float64)
+        v = np.sin(t / 500)
+        v[4321] = 50.0
+
+        rt, rv = lttb(t, v, 100)
+
+        self.assertEqual(len(rt), 100)
+        self.assertEqual((rt[0], rt[-1]), (0, 9_999))
+        self.assertIn(50.0, rv)
+
+    def test_minmax_keeps_each_bucket_extremes(self):
+        t = np.arange(1_000, dtype=np.float64)
+        v = np.cos(t)
+        v[10], v[900] = -7.0, 7.0
+
+        rt, rv = minmax(t, v, 20)
+
+        self.assertLessEqual(len(rt), 20)
+        self.assertTrue(np.all(np.diff(rt) > 0))
+        self.assertEqual((rv.min(), rv.max()), (-7.0, 7.0))
+
+    def test_resolution_follows_the_range(self):
+        self.assertEqual(choose_resolution(T0, T0 + timedelta(days=1), 1000, single_device=True), "raw")
+        self.assertEqual(choose_resolution(T0, T0 + timedelta(days=1), 1000, single_device=False), "HOUR")
+        self.assertEqual(choose_resolution(T0, T0 + timedelta(days=1000), 1000, single_device=True), "DAY")
+
+
+class SeriesTests(FleetTestCase):
+    """API de series por dispositivo, zona u organización."""
+
+    def series(self, user, **params):
+        params.setdefault("start", T0.isoformat())
+        params.setdefault("end", (T0 + timedelta(hours=6)).isoformat())
+        return self.client_for(user).get(reverse("api_series"), params)
+
+    def test_device_series_reads_raw_measurements(self):
+        for minute, kwh in ((0, 1.0), (15, 2.0), (30, 3.0)):
+            self.measure(self.device_a, T0 + timedelta(minutes=minute), kwh)
+
+        data = self.series(self.admin_a, scope="device", id=self.device_a.pk).json()
+
+        self.assertEqual(data["resolution"], "raw")
+        self.assertEqual(data["v"], [1.0, 2.0, 3.0])
+        self.assertEqual(data["t"][0], int(T0.timestamp() * 1000))
+
+    def test_organization_series_sums_hourly_rollups(self):
+        self.measure(self.device_a, T0 + timedelta(minutes=5), 1.0)
+        self.measure(self.device_a1, T0 + timedelta(minutes=10), 2.0)
+        self.measure(self.device_a, T0 + timedelta(hours=1), 4.0)
+        refresh_rollups(T0, T0 + timedelta(hours=2))
+
+        data = self.series(self.admin_a, scope="organization", id=self.org_a.pk).json()
+
+        self.assertEqual(data["resolution"], "HOUR")
+        self.assertEqual(data["v"], [3.0, 4.0])
+
+    def test_other_tenants_devices_are_not_found(self):
+        self.measure(self.device_b, T0, 1.0)
+        response = self.series(self.admin_a, scope="device", id=self.device_b.pk)
+        self.assertEqual(response.status_code, 404)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.series(self.admin_a, scope="planet", id=1).status_code, 400)
+        self.assertEqual(self.series(self.admin_a, scope="device", id=self.device_a.pk, method="avg").status_code, 400)
+        self.assertEqual(
+            self.series(self.admin_a, scope="device", id=self.device_a.pk, start=T0.isoformat(), end=T0.isoformat()).status_code,
+            400,
+        )
+
+
+# Cuantiles comparados contra np.quantile
+QUANTILES = [0.01, 0.1, 0.5, 0.9, 0.95, 0.99]
+
+
+class QuantileSketchTests(SimpleTestCase):
+    """Sketch de cuantiles: error relativo, combinación y serialización."""
+
+    def assertWithinAccuracy(self, sketch, values):
+        # El sketch responde el cuantil "lower": error relativo acotado frente a él
+        expected = np.quantile(values, QUANTILES, method="lower")
+        np.testing.assert_array_less(np.abs(sketch.quantile(QUANTILES) - expected), RELATIVE_ACCURACY * expected + 1e-12)
+
+    def test_quantiles_stay_within_the_relative_accuracy(self):
+        values = np.random.default_rng(7).lognormal(mean=-1.0, sigma=1.5, size=20_000)
+        self.assertWithinAccuracy(QuantileSketch.from_values(values), values)
+
+    def test_merging_equals_sketching_the_union(self):
+        rng = np.random.default_rng(11)
+        parts = [rng.exponential(scale, size=1_000) for scale in (0.1, 1.0, 50.0)]
+        parts[1][:100] = 0.0
+        union = np.concatenate(parts)
+
+        merged = QuantileSketch.merge_all([QuantileSketch.from_values(p) for p in parts] + [None, QuantileSketch()])
+        whole = QuantileSketch.from_values(union)
+        self.assertEqual((merged.offset, merged.zeros, merged.count), (whole.offset, whole.zeros, 3_000))
+        np.testing.assert_array_equal(merged.counts, whole.counts)
+        np.testing.assert_array_equal(
+            QuantileSketch.from_values(parts[0]).merge(QuantileSketch.from_values(parts[2])).counts,
+            QuantileSketch.from_values(np.concatenate([parts[0], parts[2]])).counts,
+        )
+        self.assertWithinAccuracy(merged, union)
+
+    def test_groups_match_one_sketch_per_group(self):
+        groups = np.array([3, 1, 3, 1, 2, 3, 2])
+        values = np.array([0.5, 2.0, 0.7, 0.0, 0.0, 9.0, np.nan])
+
+        sketches = QuantileSketch.from_groups(groups, values)
+        self.assertEqual(sorted(sketches), [1, 2, 3])
+        for group, sketch in sketches.items():
+            alone = QuantileSketch.from_values(values[groups == group])
+            self.assertEqual((sketch.offset, sketch.zeros), (alone.offset, alone.zeros))
+            np.testing.assert_array_equal(sketch.counts, alone.counts)
+        self.assertEqual((sketches[2].count, sketches[2].quantile(0.5)), (1, 0.0))
+
+    def test_rank_zeros_and_empty_sketches(self):
+        sketch = QuantileSketch.from_values([0.0, 0.0, 1.0, 2.0, 4.0, np.inf])
+        self.assertEqual(sketch.count, 5)
+        self.assertEqual([sketch.rank(v) for v in (0.0, 0.5, 2.0, 100.0)], [0.4, 0.4, 0.8, 1.0])
+        self.assertEqual(sketch.quantile(0.0), 0.0)
+
+        empty = QuantileSketch.from_values([])
+        self.assertTrue(np.isnan(empty.quantile(0.5)))
+        self.assertTrue(np.isnan(empty.quantile([0.5, 0.9])).all())
+        self.assertTrue(np.isnan(empty.rank(1.0)))
+
+    def test_bytes_roundtrip_uses_the_narrowest_count_width(self):
+        small = QuantileSketch.from_values(np.r_[np.full(255, 1.0), [0.0, 3.0]])
+        large = QuantileSketch.from_values(np.r_[np.full(256, 1.0), [3.0]])
+        header = len(QuantileSketch().to_bytes())
+
+        for sketch, width in ((small, 1), (large, 2)):
+            data = sketch.to_bytes()
+            self.assertEqual(len(data), header + width * len(sketch.counts))
+            restored = QuantileSketch.from_bytes(data)
+            self.assertEqual((restored.offset, restored.zeros), (sketch.offset, sketch.zeros))
+            np.testing.assert_array_equal(restored.counts, sketch.counts)
+
+
+class RollupPercentileTests(FleetTestCase):
+    """Percentiles horarios desde los sketches de los rollups diarios."""
+
+    def hourly_day(self):
+        day = datetime(2026, 3, 1, tzinfo=dt_timezone.utc)
+        for hour in range(24):
+            self.measure(self.device_a, day + timedelta(hours=hour), 0.1 * (hour + 1))
+            self.measure(self.device_a1, day + timedelta(hours=hour), 0.5)
+        refresh_rollups(day, day + timedelta(hours=23))
+        return day, np.r_[0.1 * np.arange(1, 25), np.full(24, 0.5)]
+
+    def test_daily_rollups_carry_the_sketch_of_their_hours(self):
+        day, _ = self.hourly_day()
+        rollup = MeasurementRollup.objects.get(device=self.device_a, resolution=MeasurementRollup.Resolution.DAY)
+        sketch = QuantileSketch.from_bytes(rollup.sketch)
+
+        self.assertEqual(rollup.bucket_start, day)
+        self.assertEqual(sketch.count, 24)
+        self.assertAlmostEqual(sketch.quantile(1.0), 2.4, delta=2.4 * RELATIVE_ACCURACY)
+
+    def test_hourly_quantiles_merge_the_daily_sketches(self):
+        day, values = self.hourly_day()
+        quantiles, hours = hourly_quantiles(
+            [self.device_a.pk, self.device_a1.pk], day + timedelta(hours=6), day + timedelta(hours=12), QUANTILES,
+        )
+
+        self.assertEqual(hours, 48)
+        expected = np.quantile(values, QUANTILES, method="lower")
+        np.testing.assert_array_less(np.abs(quantiles - expected), RELATIVE_ACCURACY * expected)
+
+    def test_series_api_adds_the_requested_percentiles(self):
+        day, _ = self.hourly_day()
+        client = self.client_for(self.admin_a)
+        params = {"scope": "zone", "id": self.zone_a.pk, "start": day.isoformat(), "end": (day + timedelta(days=1)).isoformat()}
+
+        data = client.get(reverse("api_series"), {**params, "percentiles": "50,95"}).json()
+        self.assertEqual(set(data["percentiles"]), {"hours", "p50", "p95"})
+        self.assertEqual(data["percentiles"]["hours"], 48)
+        self.assertAlmostEqual(data["percentiles"]["p50"], 0.5, delta=0.5 * RELATIVE_ACCURACY)
+
+        self.assertEqual(client.get(reverse("api_series"), {**params, "percentiles": "0,50"}).status_code, 400)
+        self.assertEqual(client.get(reverse("api_series"), {**params, "percentiles": "p95"}).status_code, 400)
+
+
+class HeatmapTests(FleetTestCase):
+    """Mapa de calor 24 x 7 de consumo promedio."""
+
+    START = datetime(2026, 3, 2, tzinfo=dt_timezone.utc)     # lunes
+    END = START + timedelta(days=14)
+
+    def setUp(self):
+        super().setUp()
+        self.measure(self.device_a, T0, 1.0)                                  # lunes 12h
+        self.measure(self.device_a, T0 + timedelta(days=7), 3.0)              # lunes 12h, semana 2
+        self.measure(self.device_a1, T0 + timedelta(days=1, hours=1), 0.6)    # martes 13h
+        self.measure(self.device_b, T0, 9.0)
+        refresh_rollups(self.START, self.END - timedelta(hours=1))
+
+    def test_cells_average_over_each_weekly_hour_in_the_period(self):
+        data = build_heatmap([self.device_a.pk, self.device_a1.pk], self.START, self.END)
+
+        self.assertEqual((data["hours"], data["weekdays"]), (list(range(24)), list(WEEKDAYS)))
+        matrix = np.array(data["matrix"])
+        self.assertEqual(matrix.shape, (24, 7))
+        # Dos lunes en el periodo: (1 + 3) / 2; un martes con lectura y otro sin ella: 0.6 / 2
+        self.assertEqual((matrix[12][0], matrix[13][1]), (2.0, 0.3))
+        self.assertEqual(np.count_nonzero(matrix), 2)
+        self.assertEqual((data["max"], data["total_kwh"], data["devices"]), (2.0, 4.6, 2))
+
+    def test_period_is_whole_local_days(self):
+        start, end = heatmap_period(start_date=date(2026, 3, 2), end_date=date(2026, 3, 15))
+        self.assertEqual((start, end), (self.START, self.END))
+
+        start, end = heatmap_period(7)
+        self.assertEqual(end - start, timedelta(days=7))
+        self.assertEqual(end.date(), timezone.localdate() + timedelta(days=1))
+
+        with self.assertRaisesMessage(ValueError, "El inicio debe ser anterior al fin."):
+            heatmap_period(start_date=date(2026, 3, 16), end_date=date(2026, 3, 2))
+        with self.assertRaisesMessage(ValueError, f"El periodo no puede superar {HEATMAP_MAX_DAYS} días."):
+            heatmap_period(start_date=date(2025, 1, 1), end_date=date(2026, 3, 2))
+
+    def test_heatmap_is_cached_per_scope_and_period(self):
+        data = consumption_heatmap(self.org_a.pk, "zone", self.zone_a.pk, self.START, self.END)
+        self.assertEqual(data["devices"], 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(consumption_heatmap(self.org_a.pk, "zone", self.zone_a.pk, self.START, self.END), data)
+
+        self.assertEqual(consumption_heatmap(self.org_a.pk, "zone", self.zone_a1.pk, self.START, self.END)["total_kwh"], 0.6)
+        self.assertEqual(consumption_heatmap(self.org_a.pk, "organization", self.org_a.pk, self.START, self.END)["devices"], 2)
+        # Dispositivo de otra organización: sin dispositivos en el alcance
+        self.assertIsNone(consumption_heatmap(self.org_a.pk, "device", self.device_b.pk, self.START, self.END))
+
+    def heatmap(self, user, **params):
+        params.setdefault("start", "2026-03-02")
+        params.setdefault("end", "2026-03-15")
+        return self.client_for(user).get(reverse("api_heatmap"), params)
+
+    def test_api_returns_the_matrix_for_the_users_organization(self):
+        data = self.heatmap(self.admin_a, scope="device", id=self.device_a.pk).json()
+        self.assertTrue(data["success"])
+        self.assertEqual((data["start"], data["end"]), (self.START.isoformat(), self.END.isoformat()))
+        self.assertEqual(data["matrix"][12][0], 2.0)
+
+        self.assertEqual(self.heatmap(self.admin_a, scope="device", id=self.device_b.pk).status_code, 404)
+        self.assertEqual(self.heatmap(self.admin_a, scope="organization", id=self.org_b.pk).status_code, 404)
+        data = self.heatmap(self.encargado, scope="zone", id=self.zone_b.pk, organization=self.org_b.pk).json()
+        self.assertEqual(data["total_kwh"], 9.0)
+
+    def test_api_rejects_invalid_parameters(self):
+        self.assertEqual(self.heatmap(self.admin_a, scope="planet", id=1).status_code, 400)
+        self.assertEqual(self.heatmap(self.encargado, scope="zone", id=self.zone_b.pk).status_code, 400)
+        response = self.heatmap(self.admin_a, scope="device", id=self.device_a.pk, start="2026-03-15", end="2026-03-02")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["message"], "❌ El inicio debe ser anterior al fin.")
+
+
+class BillingTests(FleetTestCase):
+    """Precio de un periodo según tarifa y bandas horarias, y la factura cacheada."""
+
+    def setUp(self):
+        super().setUp()
+        self.tariff = Tariff.objects.create(
+            organization=self.org_a, name="BT-1", energy_rate=100, demand_charge_per_kw=1000, fixed_fee=5000,
+            valid_from=date(2026, 3, 1),
+        )
+        TariffBand.objects.create(tariff=self.tariff, name="Punta", weekdays="01234", start_hour=18, end_hour=22, rate=200)
+        saturday = T0 + timedelta(days=5, hours=7)
+        self.ingest(
+            (self.device_a, T0, 0.2),                               # lunes 12h: base
+            (self.device_a1, T0 + timedelta(hours=7), 0.15),        # lunes 19h: punta
+            (self.device_a, saturday, 0.18),                        # sábado 19h: base
+            (self.device_b, T0, 0.2),                               # otra organización
+        )
+        refresh_rollups(T0, saturday + timedelta(hours=1))
+
+    def test_period_totals(self):
+        result = price_period(self.org_a.pk, "2026-03")
+
+        self.assertEqual(result["energy_kwh"], 0.53)
+        self.assertEqual(result["energy_cost"], 68)
+        # Demanda: máximo de 15 minutos (0.2 kWh en un intervalo = 0.8 kW)
+        self.assertEqual((result["peak_kw"], result["peak_interval"]), (0.8, "15min"))
+        self.assertEqual(result["peak_devices"], [{"device": "AC-A", "energy_kwh": 0.2}])
+        self.assertEqual(result["demand_charge"], 800)
+        self.assertEqual(result["total"], 68 + 800 + 5000)
+
+    def test_breakdowns_add_up_to_the_total(self):
+        result = price_period(self.org_a.pk, "2026-03")
+
+        self.assertEqual(len(result["daily"]), 31)
+        self.assertEqual(result["daily"][1], {"date": "2026-03-02", "energy_kwh": 0.35, "cost": 50})
+        self.assertEqual(result["bands"], [
+            {"name": "Base", "energy_kwh": 0.38, "cost": 38},
+            {"name": "Punta", "energy_kwh": 0.15, "cost": 30},
+        ])
+        zones = {z["zone"]: z for z in result["zones"]}
+        self.assertEqual((zones["Edificio A"]["cost"], zones["Edificio A"]["subtree_cost"]), (38, 68))
+        self.assertEqual([(d["device"], d["cost"]) for d in result["devices"]], [("AC-A", 38), ("AC-A1", 30)])
+
+    def test_without_tariff_or_invalid_period(self):
+        self.assertIsNone(price_period(self.org_b.pk, "2026-03"))
+        self.assertIsNone(price_period(self.org_a.pk, "2026-02"))      # antes de valid_from
+        with self.assertRaisesMessage(ValueError, "Periodo inválido: 2026-13"):
+            parse_period("2026-13")
+
+    def test_tariff_changes_invalidate_the_cached_invoice(self):
+        self.assertEqual(invoice(self.org_a.pk, "2026-03")["energy_cost"], 68)
+        self.tariff.energy_rate = 200
+        self.tariff.save()
+        self.assertEqual(invoice(self.org_a.pk, "2026-03")["energy_cost"], 106)
+
+    def test_invoice_view(self):
+        response = self.client_for(self.admin_a).get(reverse("factura_organizacion"), {"period": "2026-03"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["invoice"]["total"], 5868)
+
+
+class DemandTests(FleetTestCase):
+    """Demanda de 15 minutos y máximos mensuales por zona y organización."""
+
+    def setUp(self):
+        super().setUp()
+        # Tres lotes sobre el mismo intervalo de 15 minutos
+        self.ingest((self.device_a, T0, 0.08))
+        self.ingest((self.device_a, T0 + timedelta(minutes=5), 0.08))
+        self.ingest((self.device_a1, T0 + timedelta(minutes=10), 0.1))
+        self.month = T0.date().replace(day=1)
+
+    def test_batches_accumulate_in_the_same_interval(self):
+        intervals = dict(DemandInterval.objects.values_list("zone_id", "energy_kwh"))
+        self.assertAlmostEqual(intervals[self.zone_a.pk], 0.16)
+        self.assertAlmostEqual(intervals[self.zone_a1.pk], 0.1)
+
+    def test_monthly_peaks_per_zone_and_organization(self):
+        zone_peak = peak_for(self.org_a.pk, self.month, zone_id=self.zone_a.pk)
+        self.assertAlmostEqual(zone_peak.demand_kw, 0.64)
+
+        peak = peak_for(self.org_a.pk, self.month)
+        self.assertAlmostEqual(peak.demand_kw, 1.04)
+        self.assertEqual(peak.interval_start, T0)
+        self.assertEqual(peak.devices, {str(self.device_a.pk): 0.16, str(self.device_a1.pk): 0.1})
+
+        # Un intervalo menor después no baja el máximo
+        self.ingest((self.device_a, T0 + timedelta(hours=1), 0.05))
+        peak.refresh_from_db()
+        self.assertEqual(peak.interval_start, T0)
+
+    def test_one_peak_per_month_and_scope(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            DemandPeak.objects.create(organization=self.org_a, month=self.month, interval_start=T0, demand_kw=5)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            DemandPeak.objects.create(
+                organization=self.org_a, zone=self.zone_a, month=self.month, interval_start=T0, demand_kw=5,
+            )
+
+    def test_rebuild_matches_the_online_calculation(self):
+        online = {(p.zone_id, round(p.demand_kw, 6)) for p in DemandPeak.objects.all()}
+        DemandInterval.objects.all().delete()
+
+        intervals, peaks = rebuild_demand(T0 - timedelta(hours=12), T0 + timedelta(hours=12))
+        self.assertEqual((intervals, peaks), (2, 3))
+        self.assertEqual({(p.zone_id, round(p.demand_kw, 6)) for p in DemandPeak.objects.all()}, online)
+
+    def test_rebuild_adds_up_partial_sums_across_windows_and_device_chunks(self):
+        self.measure(self.device_a, T0 + timedelta(hours=1, minutes=47), 0.02)
+        self.measure(self.device_a, T0 + timedelta(hours=1, minutes=59), 0.03)
+        self.measure(self.device_a1, T0 + timedelta(hours=1, minutes=50), 0.04)
+
+        with mock.patch("devices.demand.REBUILD_WINDOW", timedelta(minutes=30)), \
+                mock.patch("devices.demand.chunked", lambda ids: chunked(ids, size=1)):
+            self.assertEqual(rebuild_demand(T0, T0 + timedelta(hours=2))[0], 4)
+
+        intervals = {
+            (zone_id, start): round(kwh, 6)
+            for zone_id, start, kwh in DemandInterval.objects.values_list("zone_id", "interval_start", "energy_kwh")
+        }
+        late = T0 + timedelta(hours=1, minutes=45)
+        self.assertEqual(intervals, {
+            (self.zone_a.pk, T0): 0.16, (self.zone_a1.pk, T0): 0.1,
+            (self.zone_a.pk, late): 0.05, (self.zone_a1.pk, late): 0.04,
+        })
+        self.assertAlmostEqual(peak_for(self.org_a.pk, self.month).demand_kw, 1.04)
+
+
+class StandbyTests(FleetTestCase):
+    """Consumo en reposo y oportunidades de ahorro."""
+
+    def setUp(self):
+        super().setUp()
+        Product.objects.filter(pk=self.product.pk).update(standby_power_w=5)
+        Tariff.objects.create(organization=self.org_a, name="BT-1", energy_rate=100, valid_from=date(2026, 1, 1))
+        saturday = datetime(2026, 2, 28, 10, 0, tzinfo=dt_timezone.utc)
+        for device, at, kwh in [
+            (self.device_a, saturday, 0.05),
+            (self.device_a, saturday + timedelta(hours=1), 0.05),
+            (self.device_a, saturday + timedelta(hours=2), 0.5),        # una hora encendido: no mueve la mediana
+            (self.device_a, T0 - timedelta(days=3), 0.2),               # viernes 12h: en uso
+            (self.device_a1, saturday, 0.004),                          # bajo su standby
+            (self.device_b, saturday, 0.3),                             # sin tarifa
+        ]:
+            self.measure(device, at, kwh)
+        refresh_rollups(saturday - timedelta(days=1), T0)
+        analyze_standby(now=T0)
+
+    def test_group_median(self):
+        medians, counts = group_median(np.array([0, 0, 0, 1, 1]), np.array([3.0, 1.0, 2.0, 10.0, 20.0]), 3)
+        np.testing.assert_array_equal(medians[:2], [2.0, 15.0])
+        self.assertTrue(np.isnan(medians[2]))
+        np.testing.assert_array_equal(counts, [3, 2, 0])
+
+    def test_waste_above_the_product_standby(self):
+        waste = StandbyWaste.objects.get(device=self.device_a)
+        self.assertEqual(waste.idle_hours, 3)
+        self.assertEqual((waste.baseline_kw, waste.standby_kw), (0.05, 0.005))
+        self.assertEqual(waste.wasted_kwh, 0.135)
+        self.assertEqual(waste.wasted_cost, 13.5)
+
+        self.assertEqual(StandbyWaste.objects.get(device=self.device_a1).wasted_kwh, 0)
+        self.assertIsNone(StandbyWaste.objects.get(device=self.device_b).wasted_cost)
+
+    def test_page_totals_and_rankings(self):
+        response = self.client_for(self.encargado).get(reverse("oportunidades_ahorro"))
+        self.assertAlmostEqual(response.context["total_kwh"], 0.43)
+        self.assertEqual([w.device for w in response.context["dispositivos"]], [self.device_b, self.device_a])
+
+        # Por costo: las filas sin tarifa van al final
+        response = self.client_for(self.encargado).get(reverse("oportunidades_ahorro"), {"sort": "cost"})
+        self.assertEqual([w.device for w in response.context["dispositivos"]], [self.device_a, self.device_b])
+
+    def test_admins_only_see_their_organization(self):
+        response = self.client_for(self.admin_a).get(reverse("oportunidades_ahorro"))
+        self.assertEqual([w.device for w in response.context["dispositivos"]], [self.device_a])
+        self.assertEqual([z["zone__name"] for z in response.context["zonas"]], ["Edificio A"])
+
+
+class UtilizationTests(FleetTestCase):
+    """Utilización de capacidad por dispositivo y su reporte."""
+
+    def setUp(self):
+        super().setUp()
+        for device, at, kwh in [
+            (self.device_a, T0, 0.5),
+            (self.device_a, T0 + timedelta(hours=1), 0.1),
+            (self.device_a, T0 + timedelta(days=1), 0.24),
+            (self.device_a1, T0, 1.2),                      # sobre su capacidad
+        ]:
+            self.measure(device, at, kwh)
+        refresh_rollups(T0, T0 + timedelta(days=1, hours=1))
+        self.start, self.end = T0.date(), T0.date() + timedelta(days=2)
+
+    def utilization(self):
+        return {row[0]: row for row in device_utilization(Device.objects.all(), self.start, self.end)}
+
+    def test_daily_rows_follow_the_rollups(self):
+        day = DeviceUtilization.objects.get(device=self.device_a, day=T0.date())
+        self.assertEqual(day.hours, 24)
+        self.assertAlmostEqual(day.energy_kwh, 0.6)
+        self.assertAlmostEqual(day.mean_utilization, 0.6 / 24)
+        self.assertAlmostEqual(day.peak_utilization, 0.5)
+
+    def test_period_mean_is_weighted_by_hours(self):
+        _, name, _, zone, mean, peak = self.utilization()[self.device_a.pk]
+        self.assertEqual((name, zone), ("AC-A", "Edificio A"))
+        self.assertAlmostEqual(mean, (0.6 + 0.24) / 48)
+        self.assertAlmostEqual(peak, 0.5)
+
+    def test_unknown_capacity_keeps_the_stored_values(self):
+        before = self.utilization()[self.device_a.pk]
+        Device.objects.filter(pk=self.device_a.pk).update(max_power_w=0)
+
+        self.assertEqual(self.utilization()[self.device_a.pk], before)
+        # Recalcular no escribe filas para capacidad desconocida (ni divide por 0)
+        refresh_utilization(
+            datetime(2026, 3, 2, tzinfo=dt_timezone.utc), datetime(2026, 3, 4, tzinfo=dt_timezone.utc),
+            device_ids=[self.device_a.pk],
+        )
+        self.assertFalse(DeviceUtilization.objects.filter(device=self.device_a).exists())
+
+    def test_report_flags_oversized_and_overloaded_devices(self):
+        report = utilization_report(self.utilization().values(), {self.product.pk: "Split"})
+
+        self.assertEqual(
+            [(d["device"], d["oversized"], d["overloaded"]) for d in report["devices"]],
+            [("AC-A1", False, True), ("AC-A", False, False)],
+        )
+        self.assertEqual([(g["name"], g["devices"], g["overloaded"]) for g in report["products"]], [("Split", 2, 1)])
+        self.assertEqual([g["name"] for g in report["zones"]], ["Edificio A", "Piso 1"])
+        self.assertEqual(report["products"][0]["histogram"]["<10%"], 2)
+
+
+def daily_profile(hours):
+    """kWh por hora con un perfil de 24 horas: 0.15 en las horas 8 a 19 de cada bloque y 0.05 en el resto."""
+    return np.where((np.arange(hours) % 24 >= 8) & (np.arange(hours) % 24 < 20), 0.15, 0.05)
+
+
+class ForecastTests(FleetTestCase):
+    """Pronóstico Holt-Winters y consumo frente al pronóstico."""
+
+    def hourly_rollups(self, device, start, values):
+        MeasurementRollup.objects.bulk_create([
+            MeasurementRollup(
+                device=device, resolution=MeasurementRollup.Resolution.HOUR, bucket_start=start + timedelta(hours=i),
+                energy_kwh=kwh, min_kwh=kwh, max_kwh=kwh, readings=1,
+            )
+            for i, kwh in enumerate(values)
+        ])
+
+    def test_holt_winters_reproduces_a_seasonal_signal(self):
+        history = np.vstack([daily_profile(24 * 3), daily_profile(24 * 3) * 2])
+        forecast, mae = holt_winters(history, season=24, horizon=48)
+
+        self.assertEqual(forecast.shape, (2, 48))
+        np.testing.assert_allclose(forecast[0], daily_profile(48), atol=1e-9)
+        np.testing.assert_allclose(forecast[1], daily_profile(48) * 2, atol=1e-9)
+        np.testing.assert_allclose(mae, 0, atol=1e-9)
+
+    def test_forecast_is_never_negative(self):
+        falling = np.linspace(1, 0, 24 * 3)[None, :]
+        forecast, _ = holt_winters(falling, season=24, horizon=24 * 7)
+        self.assertGreaterEqual(forecast.min(), 0)
+
+    def test_devices_need_a_full_first_week(self):
+        hours = HISTORY_WEEKS * SEASON_HOURS
+        self.hourly_rollups(self.device_a, T0 - timedelta(hours=hours), daily_profile(hours))
+        self.hourly_rollups(self.device_b, T0 - timedelta(days=3), daily_profile(72))
+
+        self.assertEqual(forecast_devices(now=T0), 1)
+        forecast = DeviceForecast.objects.get()
+        self.assertEqual((forecast.device_id, forecast.start), (self.device_a.pk, T0))
+
+        t, values = forecast_series([self.device_a.pk, self.device_b.pk], T0, T0 + timedelta(hours=2))
+        self.assertEqual(t.tolist(), [T0.timestamp() * 1000, (T0.timestamp() + 3600) * 1000])
+        # La historia empieza a la misma hora del día que T0: el perfil sigue donde quedó
+        np.testing.assert_allclose(values, daily_profile(hours + 2)[hours:], atol=1e-3)
+
+    def test_consumption_vs_forecast(self):
+        hours = HISTORY_WEEKS * SEASON_HOURS
+        self.hourly_rollups(self.device_a, T0 - timedelta(hours=hours), daily_profile(hours))
+        forecast_devices(now=T0)
+        self.measure(self.device_a, T0 - timedelta(minutes=30), 0.5)       # antes del pronóstico: no cuenta
+        self.measure(self.device_a, T0 + timedelta(minutes=30), 0.2)
+        self.measure(self.device_a, T0 + timedelta(minutes=90), 0.25)
+
+        result = consumption_vs_forecast([self.device_a.pk], T0 - timedelta(hours=12), T0 + timedelta(hours=2))
+        self.assertEqual(result["since"], T0)
+        self.assertAlmostEqual(result["actual"], 0.45)
+        self.assertAlmostEqual(result["expected"], daily_profile(hours + 2)[hours:].sum(), places=3)
+        self.assertAlmostEqual(result["deviation"], (0.45 - result["expected"]) / result["expected"])
+
+        self.assertIsNone(consumption_vs_forecast([self.device_b.pk], T0, T0 + timedelta(hours=2)))
+
+
+class BenchmarkTests(FleetTestCase):
+    """Percentil de cada organización dentro de la flota."""
+
+    def setUp(self):
+        super().setUp()
+        end = datetime(2026, 3, 2, tzinfo=dt_timezone.utc)      # floor_day(T0)
+        lighting = Product.objects.create(
+            name="Panel LED", category=Category.objects.create(name="Iluminación"), sku="LED-1",
+        )
+        self.lamp = Device.objects.create(
+            organization=self.org_a, zone=self.zone_a, product=lighting, name="LED-A", max_power_w=100,
+        )
+        retired = self.make_device(self.zone_b, "AC-BAJA")
+        retired.status = "INACTIVE"
+        retired.save()
+
+        # kWh/día: AC-A (0.8 + 1.2) / 2 = 1, AC-A1 3, AC-B 4, LED-A 0.5
+        self.daily(self.device_a, end - timedelta(days=1), 0.8)
+        self.daily(self.device_a, end - timedelta(days=2), 1.2)
+        self.daily(self.device_a1, end - timedelta(days=1), 3.0)
+        self.daily(self.device_b, end - timedelta(days=1), 4.0)
+        self.daily(self.lamp, end - timedelta(days=1), 0.5)
+        # Fuera de la ventana o dado de baja: no entran a la flota
+        self.daily(self.device_b, end - timedelta(days=31), 40.0)
+        self.daily(self.device_b, end, 40.0)
+        self.daily(retired, end - timedelta(days=1), 40.0)
+
+    def daily(self, device, day, kwh):
+        MeasurementRollup.objects.create(
+            device=device, resolution=MeasurementRollup.Resolution.DAY, bucket_start=day,
+            energy_kwh=kwh, min_kwh=kwh / 24, max_kwh=kwh / 24, readings=24,
+        )
+
+    def rows(self):
+        return {
+            (b.organization_id, b.metric, b.category_id): b
+            for b in OrganizationBenchmark.objects.all()
+        }
+
+    def test_percentiles_per_metric_and_category(self):
+        self.assertEqual(benchmark_organizations(now=T0), 7)
+        rows = self.rows()
+        clima, lighting = self.category.pk, self.lamp.product.category_id
+
+        self.assertEqual(
+            {key: (b.value, b.percentile, b.peers) for key, b in rows.items()},
+            {
+                (self.org_a.pk, DEVICE_KWH, None): (1.5, 50.0, 4),
+                (self.org_a.pk, DEVICE_KWH, clima): (2.0, 33.3, 3),
+                (self.org_a.pk, DEVICE_KWH, lighting): (0.5, 100.0, 1),
+                (self.org_a.pk, ZONE_KWH, None): (2.25, 33.3, 3),
+                (self.org_b.pk, DEVICE_KWH, None): (4.0, 100.0, 4),
+                (self.org_b.pk, DEVICE_KWH, clima): (4.0, 100.0, 3),
+                (self.org_b.pk, ZONE_KWH, None): (4.0, 100.0, 3),
+            },
+        )
+        fleet = rows[(self.org_a.pk, DEVICE_KWH, clima)]
+        self.assertAlmostEqual(fleet.fleet_p50, 3.0, delta=3.0 * RELATIVE_ACCURACY)
+        # Cuantil "lower" (posición q * (n - 1) hacia abajo): el p90 de [1, 3, 4] es 3
+        self.assertAlmostEqual(fleet.fleet_p90, 3.0, delta=3.0 * RELATIVE_ACCURACY)
+        self.assertEqual(fleet.period_start, datetime(2026, 1, 31, tzinfo=dt_timezone.utc))
+
+    def test_recompute_replaces_the_previous_rows(self):
+        benchmark_organizations(now=T0)
+        MeasurementRollup.objects.filter(device=self.lamp).delete()
+
+        self.assertEqual(benchmark_organizations(now=T0), 6)
+        self.assertEqual(self.rows()[(self.org_a.pk, DEVICE_KWH, None)].value, 2.0)
+
+    def test_fleet_rows_are_unique_without_a_category(self):
+        benchmark_organizations(now=T0)
+        fleet = OrganizationBenchmark.objects.get(organization=self.org_a, metric=DEVICE_KWH, category=None)
+        fleet.pk = None
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            fleet.save()
+
+    def test_dashboard_shows_only_the_own_organization(self):
+        benchmark_organizations(now=T0)
+        response = self.client_for(self.admin_a).get(reverse("dashboard"))
+
+        self.assertEqual({b.organization_id for b in response.context["benchmarks"]}, {self.org_a.pk})
+        self.assertContains(response, "Comparación con la flota")
+        self.assertContains(response, "Iluminación")
+
+
+class ImportTests(FleetTestCase):
+    """Importación CSV de productos y dispositivos."""
+
+    def test_products_are_validated_as_a_set(self):
+        result = import_products(
+            "name,category,sku,reporting_interval_s\n"
+            "Bomba,Climatización,BOMBA-1,600\n"
+            "Bomba 2,Climatización,BOMBA-1,\n"        # repetido en el archivo
+            "Split 2,Climatización,SPLIT-1,\n"        # ya existe
+            "Foco,Iluminación,FOCO-1,\n"               # categoría inexistente
+            "Calefactor,Climatización,calef-1,\n"
+        )
+        self.assertEqual(result.created, 1)
+        self.assertEqual(Product.objects.get(sku="BOMBA-1").reporting_interval_s, 600)
+        self.assertEqual([(line, message) for line, _, message in result.errors], [
+            (3, "SKU repetido en el archivo."),
+            (4, "Este SKU ya existe. Debe ser único."),
+            (5, 'Categoría inexistente o inactiva: "Iluminación"'),
+            (6, "SKU solo puede contener letras mayúsculas, números y guiones."),
+        ])
+
+    def test_missing_columns_reject_the_whole_file(self):
+        with self.assertRaisesMessage(ValueError, "Faltan columnas obligatorias: max_power_w, product"):
+            import_devices("zone,name\nEdificio A,AC-X\n", organization=self.org_a)
+
+    def test_devices_resolve_zones_by_path_and_products_by_sku_or_name(self):
+        Zone.objects.create(organization=self.org_a, name="Piso 1", parent=Zone.objects.create(
+            organization=self.org_a, name="Edificio C",
+        ))
+        result = import_devices(
+            "zone,product,name,max_power_w\n"
+            "Edificio A/Piso 1,SPLIT-1,AC-X1,1200\n"
+            "Edificio A,Split,AC-X2,800\n"
+            "Piso 1,Split,AC-X3,800\n"                # ambigua: hay dos "Piso 1"
+            "Edificio A,Split,AC-A,800\n"             # nombre ya usado
+            "Edificio A,Split,AC-X4,0\n",
+            organization=self.org_a,
+        )
+        self.assertEqual(result.created, 2)
+        created = {d.name: d for d in Device.objects.filter(name__startswith="AC-X")}
+        self.assertEqual(created["AC-X1"].zone, self.zone_a1)
+        self.assertEqual((created["AC-X2"].zone, created["AC-X2"].product), (self.zone_a, self.product))
+        self.assertEqual([message for _, _, message in result.errors], [
+            'La zona "Piso 1" es ambigua (indique la ruta, ej.: "Edificio A/Piso 1").',
+            "Ya existe un dispositivo con este nombre en la organización seleccionada.",
+            "max_power_w debe estar entre 1 y 50000.",
+        ])
+
+    def test_admins_import_only_into_their_organization(self):
+        result = import_devices(
+            "organization,zone,product,name,max_power_w\nOrg B,Edificio B,SPLIT-1,AC-X,900\n",
+            organization=self.org_a,
+        )
+        self.assertEqual(result.created, 0)
+        self.assertEqual(result.errors[0][2], "Solo puede importar dispositivos de su organización.")
+
+        result = import_devices("organization,zone,product,name,max_power_w\nOrg B,Edificio B,SPLIT-1,AC-X,900\n")
+        self.assertEqual(result.created, 1)
+        self.assertEqual(Device.objects.get(name="AC-X").organization, self.org_b)
+
+    def test_rejected_rows_can_be_downloaded_for_correction(self):
+        result = import_devices("zone,product,name,max_power_w\nSótano,SPLIT-1,AC-X,900\n", organization=self.org_a)
+        self.assertEqual(list(result.error_rows()), [
+            ["line", "zone", "product", "name", "max_power_w", "error"],
+            [2, "Sótano", "SPLIT-1", "AC-X", "900", 'La zona "Sótano" no existe en la organización o está inactiva.'],
+        ])
+
+
+class BulkActionTests(FleetTestCase):
+    """Acciones masivas sobre dispositivos."""
+
+    def post_action(self, user, **payload):
+        return self.client_for(user).post(
+            reverse("acciones_dispositivos"), data=json.dumps(payload), content_type="application/json",
+        )
+
+    def test_move_zone_reports_each_id(self):
+        response = self.post_action(
+            self.admin_a, action="move_zone", zone_id=self.zone_a1.pk,
+            ids=[self.device_a.pk, self.device_a1.pk, self.device_b.pk, self.device_a.pk],
+        )
+        body = response.json()
+
+        self.assertEqual(body["updated"], 1)
+        self.assertEqual(body["results"], {
+            str(self.device_a.pk): RESULT_OK,
+            str(self.device_a1.pk): RESULT_UNCHANGED,
+            str(self.device_b.pk): RESULT_NOT_FOUND,         # fuera de su organización
+        })
+        self.device_a.refresh_from_db()
+        self.assertEqual(self.device_a.zone, self.zone_a1)
+
+    def test_devices_never_move_to_another_organization(self):
+        result = apply_bulk_action(Device.objects.all(), "move_zone", [self.device_b.pk], zone=self.zone_a)
+        self.assertEqual(result, {"updated": 0, "results": {self.device_b.pk: RESULT_OTHER_ORGANIZATION}})
+
+        response = self.post_action(self.admin_a, action="move_zone", zone_id=self.zone_b.pk, ids=[self.device_a.pk])
+        self.assertEqual(response.status_code, 404)
+
+    def test_deactivate_and_change_product(self):
+        other = Product.objects.create(name="Ventana", category=self.category, sku="VENT-1")
+        devices = Device.objects.filter(organization=self.org_a)
+
+        result = apply_bulk_action(devices, "change_product", [self.device_a.pk], product=other)
+        self.assertEqual(result["updated"], 1)
+        result = apply_bulk_action(devices, "deactivate", [self.device_a.pk, self.device_a1.pk])
+        self.assertEqual(result["updated"], 2)
+        # Los inactivos quedan fuera de nuevas acciones
+        result = apply_bulk_action(devices, "deactivate", [self.device_a.pk])
+        self.assertEqual(result["results"], {self.device_a.pk: RESULT_NOT_FOUND})
+
+        self.device_a.refresh_from_db()
+        self.assertEqual((self.device_a.status, self.device_a.product), ("INACTIVE", other))
+
+    def test_invalid_requests(self):
+        with self.assertRaisesMessage(ValueError, "ids debe contener solo números"):
+            parse_device_ids([1, "x"])
+        with self.assertRaisesMessage(ValueError, "Máximo 1000 dispositivos por acción"):
+            parse_device_ids(list(range(1001)))
+
+        self.assertEqual(self.post_action(self.admin_a, action="delete", ids=[1]).status_code, 400)
+        self.assertEqual(self.post_action(self.admin_a, action="deactivate", ids=[]).status_code, 400)
+        self.assertEqual(self.post_action(self.viewer_a, action="deactivate", ids=[self.device_a.pk]).status_code, 302)
+
+
+class ZoneHierarchyTests(FleetTestCase):
+    """Ruta materializada de zonas y movimiento de subárboles."""
+
+    def test_path_and_depth_are_maintained_on_save(self):
+        self.assertEqual((self.zone_a.path, self.zone_a.depth), (f"{self.zone_a.pk}/", 0))
+        self.assertEqual((self.zone_a1.path, self.zone_a1.depth), (f"{self.zone_a.pk}/{self.zone_a1.pk}/", 1))
+        self.assertEqual(self.zone_a1.ancestor_ids, [self.zone_a.pk])
+
+    def test_moving_a_zone_rewrites_its_subtree(self):
+        room = Zone.objects.create(organization=self.org_a, name="Sala 101", parent=self.zone_a1)
+        other = Zone.objects.create(organization=self.org_a, name="Edificio C")
+
+        self.zone_a1.parent = other
+        self.zone_a1.save()
+        room.refresh_from_db()
+        self.assertEqual((room.path, room.depth), (f"{other.pk}/{self.zone_a1.pk}/{room.pk}/", 2))
+        self.assertEqual(list(self.zone_a.subtree()), [self.zone_a])
+        self.assertEqual(list(filter_zone_subtree(Device.objects.all(), other.pk)), [self.device_a1])
+
+        # A raíz: el subárbol sube un nivel
+        self.zone_a1.parent = None
+        self.zone_a1.save()
+        room.refresh_from_db()
+        self.assertEqual((room.path, room.depth), (f"{self.zone_a1.pk}/{room.pk}/", 1))
+
+    def test_invalid_parents(self):
+        room = Zone.objects.create(organization=self.org_a, name="Sala 101", parent=self.zone_a1)
+        self.zone_a.parent = room
+        with self.assertRaisesMessage(ValueError, "Una zona no puede quedar dentro de sí misma ni de sus subzonas."):
+            self.zone_a.save()
+        with self.assertRaisesMessage(ValueError, "La zona padre debe ser de la misma organización."):
+            Zone.objects.create(organization=self.org_a, name="Anexo", parent=self.zone_b)
+
+        parent = room
+        with self.assertRaisesMessage(ValueError, f"La jerarquía de zonas admite hasta {Zone.MAX_DEPTH} niveles."):
+            for level in range(Zone.MAX_DEPTH):
+                parent = Zone.objects.create(organization=self.org_a, name=f"Nivel {level}", parent=parent)
+
+    def test_names_are_unique_among_siblings_including_roots(self):
+        Zone.objects.create(organization=self.org_b, name="Edificio A")        # otra organización
+        Zone.objects.create(organization=self.org_a, name="Piso 1", parent=self.zone_a1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Zone.objects.create(organization=self.org_a, name="Edificio A")
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Zone.objects.create(organization=self.org_a, name="Piso 1", parent=self.zone_a)
+
+    def test_subtree_totals_and_tree_order(self):
+        paths = {self.zone_a.pk: self.zone_a.path, self.zone_a1.pk: self.zone_a1.path}
+        totals = rollup_subtrees(paths, {self.zone_a.pk: 1.0, self.zone_a1.pk: 2.5})
+        self.assertEqual(totals, {self.zone_a.pk: 3.5, self.zone_a1.pk: 2.5})
+
+        annex = Zone.objects.create(organization=self.org_a, name="Anexo")
+        rows = Zone.objects.filter(organization=self.org_a).values("id", "name", "path")
+        self.assertEqual([z["name"] for z in tree_order(list(rows))], ["Anexo", "Edificio A", "Piso 1"])
+        self.assertEqual(path_ids(annex.path), [annex.pk])
+
+
+class ZoneSummaryTests(FleetTestCase):
+    """Resumen de zonas precalculado y su listado."""
+
+    def setUp(self):
+        super().setUp()
+        yesterday = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(days=1)
+        self.measure(self.device_a, yesterday, 0.2)
+        self.measure(self.device_a1, yesterday, 0.1)
+        self.measure(self.device_b, yesterday, 0.4)
+        refresh_rollups(yesterday, yesterday + timedelta(hours=1))
+        # Dado de baja (borrado lógico): no cuenta como dispositivo de la zona
+        retired = self.make_device(self.zone_a1, "AC-BAJA")
+        retired.status = "INACTIVE"
+        retired.save()
+
+    def rows(self):
+        return {z["name"]: z for z in zone_summary(self.org_a.pk, 7)}
+
+    def test_counts_and_energy_own_and_subtree(self):
+        rows = self.rows()
+        self.assertEqual(
+            {name: (z["device_count"], z["subtree_devices"], z["energy_kwh"], z["subtree_kwh"]) for name, z in rows.items()},
+            {"Edificio A": (1, 2, 0.2, 0.3), "Piso 1": (1, 1, 0.1, 0.1)},
+        )
+
+    def test_summary_is_cached_until_devices_or_zones_change(self):
+        self.rows()
+        with self.assertNumQueries(0):
+            self.rows()
+
+        apply_bulk_action(Device.objects.all(), "move_zone", [self.device_a.pk], zone=self.zone_a1)
+        self.assertEqual(self.rows()["Piso 1"]["device_count"], 2)
+
+        Zone.objects.create(organization=self.org_a, name="Sala 101", parent=self.zone_a1)
+        self.assertIn("Sala 101", self.rows())
+
+    def test_list_view_sorts_by_subtree_totals(self):
+        Zone.objects.create(organization=self.org_a, name="Anexo")
+        client = self.client_for(self.admin_a)
+
+        response = client.get(reverse("lista_zonas"), {"days": 7})
+        self.assertEqual([z["name"] for z in response.context["page_obj"]], ["Anexo", "Edificio A", "Piso 1"])
+        response = client.get(reverse("lista_zonas"), {"days": 7, "sort": "energy", "direction": "desc"})
+        self.assertEqual([z["name"] for z in response.context["page_obj"]], ["Edificio A", "Piso 1", "Anexo"])
+        response = client.get(reverse("lista_zonas"), {"days": 7, "q": "piso"})
+        self.assertEqual([z["name"] for z in response.context["page_obj"]], ["Piso 1"])
+
+    def test_encargado_must_pick_an_organization(self):
+        client = self.client_for(self.encargado)
+        self.assertRedirects(client.get(reverse("lista_zonas")), reverse("dashboard"), fetch_redirect_response=False)
+        response = client.get(reverse("lista_zonas"), {"organization": self.org_b.pk, "days": 7})
+        self.assertEqual([z["subtree_kwh"] for z in response.context["page_obj"]], [0.4])
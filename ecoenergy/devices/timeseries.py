@@ -0,0 +1,201 @@
+# devices/timeseries.py
+#
+# ──────────────────────────────────────────────────────────────────────────────
+# Propósito del módulo
+# ──────────────────────────────────────────────────────────────────────────────
+# Consulta de series de consumo (dispositivo, zona u organización) para
+# gráficos, con un "presupuesto" de puntos por serie:
+# 1) Se elige la fuente según el rango: crudo (Measurement) para rangos cortos
+#    de un solo dispositivo, rollups horarios o diarios para el resto.
+# 2) Si aún quedan más puntos que el presupuesto, se reduce en NumPy con
+#    LTTB (Largest-Triangle-Three-Buckets) o min/max por bucket.
+#
+# Resultado: un gráfico nunca recibe más de ~1000 puntos por serie, sea el
+# rango de un día o de tres años.
+#
+# hourly_quantiles() responde p50/p95 del consumo horario de cualquier rango
+# combinando los sketches de los rollups diarios, sin leer datos crudos.
+# ──────────────────────────────────────────────────────────────────────────────
+
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+import numpy as np
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Measurement, MeasurementRollup
+from .sketches import QuantileSketch
+
+DEFAULT_POINTS = 1000
+MAX_POINTS = 5000
+
+# Rango máximo en que se sirven lecturas crudas (solo para un dispositivo).
+RAW_MAX_SPAN = timedelta(days=2)
+
+# Se usan rollups horarios mientras no excedan este múltiplo del presupuesto;
+# por sobre eso conviene partir de los diarios.
+HOURLY_OVERSAMPLE = 8
+
+
+def choose_resolution(start, end, points, single_device):
+    """Retorna "raw", "HOUR" o "DAY" según el rango y el presupuesto."""
+    span = end - start
+    if single_device and span <= RAW_MAX_SPAN:
+        return "raw"
+    hours = span.total_seconds() / 3600
+    if hours <= points * HOURLY_OVERSAMPLE:
+        return MeasurementRollup.Resolution.HOUR
+    return MeasurementRollup.Resolution.DAY
+
+
+def load_series(device_ids, start, end, resolution):
+    """
+    Carga la serie (timestamps en ms epoch, valores kWh) como arrays NumPy.
+    Para varios dispositivos, la serie es la suma por bucket.
+    """
+    if resolution == "raw":
+        rows = (
+            Measurement.objects.filter(
+                device_id__in=device_ids, measured_at__gte=start, measured_at__lte=end
+            )
+            .order_by("measured_at")
+            .values_list("measured_at", "energy_kwh")
+        )
+    else:
+        rows = (
+            MeasurementRollup.objects.filter(
+                device_id__in=device_ids, resolution=resolution,
+                bucket_start__gte=start, bucket_start__lte=end,
+            )
+            .values("bucket_start")
+            .annotate(total=Sum("energy_kwh"))
+            .order_by("bucket_start")
+            .values_list("bucket_start", "total")
+        )
+
+    rows = list(rows)
+    t = np.fromiter((dt.timestamp() * 1000 for dt, _ in rows), dtype=np.float64, count=len(rows))
+    v = np.fromiter((value for _, value in rows), dtype=np.float64, count=len(rows))
+    return t, v
+
+
+def load_hourly_arrays(device_ids, start, end):
+    """
+    Rollups horarios [start, end) de varios dispositivos como arrays NumPy
+    paralelos: (device_id int64, bucket_start en segundos epoch int64, kWh float64).
+    Base común de los cálculos vectorizados (costos, standby, utilización...).
+    """
+    rows = (
+        MeasurementRollup.objects.filter(
+            device_id__in=device_ids, resolution=MeasurementRollup.Resolution.HOUR,
+            bucket_start__gte=start, bucket_start__lt=end,
+        )
+        .order_by()
+        .values_list("device_id", "bucket_start", "energy_kwh")
+    )
+    rows = list(rows)
+    n = len(rows)
+    device = np.fromiter((r[0] for r in rows), dtype=np.int64, count=n)
+    epoch = np.fromiter((int(r[1].timestamp()) for r in rows), dtype=np.int64, count=n)
+    energy = np.fromiter((r[2] for r in rows), dtype=np.float64, count=n)
+    return device, epoch, energy
+
+
+def hourly_quantiles(device_ids, start, end, quantiles=(0.5, 0.95)):
+    """
+    Cuantiles del kWh horario de los dispositivos en los días UTC que se
+    solapan con [start, end), combinando los sketches de los rollups diarios
+    (cada hora de cada dispositivo es un valor). Retorna (cuantiles, horas).
+    """
+    first_day = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    sketches = (
+        MeasurementRollup.objects.filter(
+            device_id__in=device_ids, resolution=MeasurementRollup.Resolution.DAY,
+            bucket_start__gte=first_day, bucket_start__lt=end, sketch__isnull=False,
+        )
+        .order_by()
+        .values_list("sketch", flat=True)
+    )
+    merged = QuantileSketch.merge_all(QuantileSketch.from_bytes(data) for data in sketches)
+    return merged.quantile(quantiles), merged.count
+
+
+def local_calendar(epoch):
+    """
+    Hora local, día de la semana (0=lunes) y fecha local de cada timestamp.
+    Convierte solo los timestamps distintos (≤ 24 por día) y expande con el
+    índice inverso, así el costo no depende de la cantidad de dispositivos.
+    """
+    unique, inverse = np.unique(epoch, return_inverse=True)
+    local = [timezone.localtime(datetime.fromtimestamp(int(s), tz=dt_timezone.utc)) for s in unique]
+    hour = np.fromiter((d.hour for d in local), dtype=np.int64, count=len(local))
+    weekday = np.fromiter((d.weekday() for d in local), dtype=np.int64, count=len(local))
+    dates = np.array([d.date() for d in local], dtype="datetime64[D]")
+    return hour[inverse], weekday[inverse], dates[inverse]
+
+
+def lttb(t, v, threshold):
+    """
+    Largest-Triangle-Three-Buckets: conserva la forma visual de la serie
+    eligiendo, en cada bucket, el punto que forma el triángulo de mayor área
+    con el punto elegido anterior y el promedio del bucket siguiente.
+    """
+    n = len(t)
+    if threshold >= n or threshold < 3:
+        return t, v
+
+    # Bordes de los (threshold - 2) buckets interiores; el primer y último punto se conservan.
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            nlo, nhi = edges[i + 1], edges[i + 2]
+            avg_t, avg_v = t[nlo:nhi].mean(), v[nlo:nhi].mean()
+        else:
+            avg_t, avg_v = t[-1], v[-1]
+
+        area = np.abs(
+            (t[a] - avg_t) * (v[lo:hi] - v[a]) - (t[a] - t[lo:hi]) * (avg_v - v[a])
+        )
+        a = lo + int(area.argmax())
+        selected[i + 1] = a
+
+    return t[selected], v[selected]
+
+
+def minmax(t, v, threshold):
+    """
+    Conserva el mínimo y el máximo de cada bucket (threshold / 2 buckets),
+    en orden temporal. Preserva los picos, útil para detectar sobreconsumo.
+    """
+    n = len(t)
+    buckets = threshold // 2
+    if threshold >= n or buckets < 1:
+        return t, v
+
+    bucket = (np.arange(n) * buckets) // n
+    order = np.lexsort((v, bucket))                 # por bucket y, dentro, por valor
+    starts = np.searchsorted(bucket[order], np.arange(buckets))
+    ends = np.append(starts[1:], n) - 1
+    keep = np.unique(np.concatenate([order[starts], order[ends]]))
+    return t[keep], v[keep]
+
+
+DOWNSAMPLERS = {
+    "lttb": lttb,
+    "minmax": minmax,
+}
+
+
+def query_series(device_ids, start, end, points=DEFAULT_POINTS, method="lttb"):
+    """Elige fuente, carga y reduce. Retorna (resolución, t, v)."""
+    points = max(3, min(int(points), MAX_POINTS))
+    resolution = choose_resolution(start, end, points, single_device=len(device_ids) == 1)
+    t, v = load_series(device_ids, start, end, resolution)
+    t, v = DOWNSAMPLERS[method](t, v, points)
+    return resolution, t, v
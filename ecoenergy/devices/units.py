@@ -0,0 +1,46 @@
+# devices/units.py
+#
+# ──────────────────────────────────────────────────────────────────────────────
+# Propósito del módulo
+# ──────────────────────────────────────────────────────────────────────────────
+# Normalización de unidades para las métricas de Measurement.
+# Toda lectura se guarda en su unidad canónica (columna del modelo):
+#   energy_kwh (kWh) · power_w (W) · current_a (A) · voltage_v (V)
+#
+# La misma tabla sirve para las reglas: AlertRule.unit indica qué métrica se
+# compara y con qué factor se lleva el umbral a la unidad canónica
+# (ej.: una regla en "kW" con máximo 5 se compara contra power_w > 5000).
+# ──────────────────────────────────────────────────────────────────────────────
+
+# métrica -> (columna canónica, {unidad: factor a la unidad canónica})
+METRICS = {
+    "energy":  ("energy_kwh", {"Wh": 0.001, "kWh": 1.0, "MWh": 1000.0}),
+    "power":   ("power_w",    {"W": 1.0, "kW": 1000.0, "MW": 1_000_000.0}),
+    "current": ("current_a",  {"mA": 0.001, "A": 1.0, "kA": 1000.0}),
+    "voltage": ("voltage_v",  {"mV": 0.001, "V": 1.0, "kV": 1000.0}),
+}
+
+# Columnas canónicas, en el orden usado por las matrices de evaluación
+METRIC_FIELDS = tuple(field for field, _ in METRICS.values())
+
+# unidad -> (columna canónica, factor)
+UNIT_INDEX = {
+    unit: (field, factor)
+    for field, factors in METRICS.values()
+    for unit, factor in factors.items()
+}
+
+
+def to_canonical(metric, value, unit=None):
+    """
+    Convierte value (en unit) a la unidad canónica de la métrica.
+    Retorna (columna, valor). Lanza ValueError si la métrica o unidad no existen.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Métrica desconocida: {metric}")
+    field, factors = METRICS[metric]
+    if unit is None:
+        return field, float(value)
+    if unit not in factors:
+        raise ValueError(f"Unidad '{unit}' no válida para {metric}")
+    return field, float(value) * factors[unit]
@@ -0,0 +1,156 @@
+# devices/utilization.py
+#
+# ──────────────────────────────────────────────────────────────────────────────
+# Propósito del módulo
+# ──────────────────────────────────────────────────────────────────────────────
+# Utilización de capacidad de los dispositivos respecto de Device.max_power_w:
+# - mean_utilization: energía del día / (max_power_w x horas)
+# - peak_utilization: kWh de la hora de mayor consumo / max_power_w
+#
+# refresh_utilization() recalcula los días [start, end) para toda la flota en
+# una pasada NumPy sobre los rollups horarios: cada fila cae en la celda
+# (dispositivo, día) y se agrega con np.bincount (suma) y np.maximum.at (pico).
+# La llama refresh_rollups() para los mismos días que recalcula, así la tabla
+# se mantiene incrementalmente sin recorrer el historial.
+#
+# utilization_report() resume un periodo por dispositivo y arma las
+# distribuciones por producto y zona: equipos sobredimensionados (pico muy
+# bajo su capacidad) y sobrecargados (pico sobre su capacidad).
+# ──────────────────────────────────────────────────────────────────────────────
+
+from collections import defaultdict
+from datetime import timedelta
+
+import numpy as np
+from django.db.models import F, Max, Sum
+from django.utils import timezone
+
+from .models import Device, DeviceUtilization
+from .timeseries import load_hourly_arrays
+
+UTILIZATION_BATCH_SIZE = 2000
+
+# Pico bajo este valor en todo el periodo: equipo sobredimensionado
+OVERSIZED_PEAK = 0.3
+# Pico sobre este valor: consumo mayor a la capacidad declarada
+OVERLOADED_PEAK = 1.0
+
+HISTOGRAM_BINS = [0, 0.1, 0.25, 0.5, 0.75, 1.0, np.inf]
+HISTOGRAM_LABELS = ["<10%", "10-25%", "25-50%", "50-75%", "75-100%", ">100%"]
+
+
+def refresh_utilization(start, end, device_ids=None):
+    """
+    Recalcula DeviceUtilization de los días (UTC) [start, end); start y end
+    deben ser inicios de día. Retorna la cantidad de filas escritas.
+    """
+    devices = Device.objects.filter(max_power_w__gt=0)
+    if device_ids is not None:
+        devices = devices.filter(id__in=device_ids)
+    devices = list(devices.values_list("id", "max_power_w"))
+    ids = np.array([d[0] for d in devices], dtype=np.int64)
+    capacity_kw = np.array([d[1] / 1000 for d in devices], dtype=np.float64)
+
+    device, epoch, energy = load_hourly_arrays(ids.tolist(), start, end)
+
+    n_days = (end - start).days
+    order = np.argsort(ids)
+    position = order[np.searchsorted(ids, device, sorter=order)] if len(device) else device
+    day = (epoch - int(start.timestamp())) // 86400
+    cell = position * n_days + day
+    size = len(devices) * n_days
+    energy_kwh = np.bincount(cell, weights=energy, minlength=size)
+    readings = np.bincount(cell, minlength=size)
+    peak_kwh = np.zeros(size)
+    np.maximum.at(peak_kwh, cell, energy)
+
+    # Horas de cada día: 24, salvo el día en curso (solo lo transcurrido)
+    day_starts = [start + timedelta(days=i) for i in range(n_days)]
+    now = timezone.now()
+    hours = np.array(
+        [min(24.0, max((now - d).total_seconds() / 3600, 1.0)) for d in day_starts], dtype=np.float64
+    )
+    cell_capacity = np.repeat(capacity_kw, n_days)
+    cell_hours = np.tile(hours, len(devices))
+    mean = energy_kwh / (cell_capacity * cell_hours)
+    peak = peak_kwh / cell_capacity
+
+    rows = [
+        DeviceUtilization(
+            device_id=devices[i // n_days][0], day=day_starts[i % n_days].date(),
+            hours=float(cell_hours[i]), energy_kwh=float(energy_kwh[i]),
+            mean_utilization=float(mean[i]), peak_utilization=float(peak[i]),
+        )
+        for i in np.flatnonzero(readings)
+    ]
+
+    stale = DeviceUtilization.objects.filter(day__gte=start.date(), day__lt=end.date())
+    if device_ids is not None:
+        stale = stale.filter(device_id__in=device_ids)
+    stale.delete()
+    DeviceUtilization.objects.bulk_create(rows, batch_size=UTILIZATION_BATCH_SIZE)
+    return len(rows)
+
+
+def device_utilization(devices, start, end):
+    """
+    Utilización del periodo por dispositivo (shard actual):
+    [(device_id, nombre, product_id, zona, mean, peak)], mean ponderada por horas.
+    Usa la utilización guardada de cada día (con la capacidad de ese día), no
+    la max_power_w actual, que puede haber cambiado o ser 0.
+    """
+    info = {pk: (name, product_id, zone) for pk, name, product_id, zone in devices.values_list("id", "name", "product_id", "zone__name")}
+    rows = (
+        DeviceUtilization.objects.filter(device_id__in=list(info), day__gte=start, day__lt=end, hours__gt=0)
+        .values("device_id")
+        .annotate(
+            weighted=Sum(F("mean_utilization") * F("hours")), hours=Sum("hours"), peak=Max("peak_utilization")
+        )
+        .order_by()
+    )
+    return [(r["device_id"], *info[r["device_id"]], r["weighted"] / r["hours"], r["peak"]) for r in rows]
+
+
+def distribution(values):
+    """Percentiles y histograma de utilización de un grupo de dispositivos."""
+    values = np.asarray(values, dtype=np.float64)
+    p10, p50, p90 = np.percentile(values, [10, 50, 90])
+    counts, _ = np.histogram(values, bins=HISTOGRAM_BINS)
+    return {
+        "devices": len(values),
+        "p10": float(p10), "p50": float(p50), "p90": float(p90),
+        "histogram": dict(zip(HISTOGRAM_LABELS, counts.tolist())),
+    }
+
+
+def utilization_report(per_device, product_names):
+    """
+    Agrupa la salida de device_utilization() (de uno o varios shards) por
+    producto y por zona. Retorna {"devices", "products", "zones"}.
+    """
+    by_product, by_zone = defaultdict(list), defaultdict(list)
+    devices = []
+    for device_id, name, product_id, zone, mean, peak in per_device:
+        by_product[product_names.get(product_id, "")].append((mean, peak))
+        by_zone[zone].append((mean, peak))
+        devices.append({
+            "device_id": device_id, "device": name, "product": product_names.get(product_id, ""),
+            "zone": zone, "mean": mean, "peak": peak,
+            "oversized": peak < OVERSIZED_PEAK, "overloaded": peak > OVERLOADED_PEAK,
+        })
+
+    def groups(grouped):
+        result = []
+        for label, pairs in grouped.items():
+            peaks = np.array([p for _, p in pairs])
+            result.append({
+                "name": label,
+                **distribution([m for m, _ in pairs]),
+                "oversized": int((peaks < OVERSIZED_PEAK).sum()),
+                "overloaded": int((peaks > OVERLOADED_PEAK).sum()),
+            })
+        return sorted(result, key=lambda g: g["name"])
+
+    devices.sort(key=lambda d: -d["peak"])
+    return {"devices": devices, "products": groups(by_product), "zones": groups(by_zone)}
+
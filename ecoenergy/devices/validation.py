@@ -0,0 +1,129 @@
+# devices/validation.py
+#
+# ──────────────────────────────────────────────────────────────────────────────
+# Propósito del módulo
+# ──────────────────────────────────────────────────────────────────────────────
+# Filtro de plausibilidad de la ingesta (devices/ingestion.py), vectorizado
+# sobre el lote completo antes de evaluar alertas o guardar mediciones:
+#
+# - NON_FINITE:     alguna métrica informada es NaN o infinita
+# - NEGATIVE:       alguna métrica informada es negativa
+# - duplicada:      mismo instante y misma energía que la lectura anterior del
+#                   dispositivo, o un instante que ya tiene una Measurement
+#                   guardada (reenvío de un lote): se rechaza sin cuarentena
+# - CONFLICT:       mismo instante que la anterior pero con otra energía
+# - ABOVE_CAPACITY: energía mayor a max_power_w x tiempo transcurrido desde la
+#                   lectura anterior (o reporting_interval_s del producto si no
+#                   hay una anterior usable), con una tolerancia. Con
+#                   max_power_w = 0 (capacidad desconocida) no se revisa
+#
+# "Lectura anterior" es la previa del mismo dispositivo dentro del lote (ya
+# viene ordenado por dispositivo y fecha) o, para la primera, la última
+# guardada (Device.last_measured_at / last_energy_kwh). Todo se resuelve con
+# arrays desplazados una posición, sin loops por lectura. Las mediciones ya
+# guardadas en el rango del lote se leen con UNA consulta.
+# ──────────────────────────────────────────────────────────────────────────────
+
+import math
+from datetime import datetime
+from datetime import timezone as dt_timezone
+
+import numpy as np
+
+from .models import Measurement, Product, QuarantinedReading
+from .units import METRIC_FIELDS
+
+# Margen sobre la capacidad (redondeos del medidor, relojes desfasados)
+CAPACITY_TOLERANCE = 1.05
+
+DEFAULT_REPORTING_INTERVAL_S = 900
+
+DUPLICATE = "DUPLICATE"
+
+ENERGY = METRIC_FIELDS.index("energy_kwh")
+
+
+def stored_instants(device_ids, ts):
+    """
+    Máscara de las lecturas (device_id, timestamp) que ya tienen una Measurement
+    guardada: una consulta por el rango de tiempo del lote.
+    """
+    if not len(ts):
+        return np.zeros(0, dtype=bool)
+    start, end = (datetime.fromtimestamp(t, tz=dt_timezone.utc) for t in (ts.min(), ts.max()))
+    stored = set(
+        (device_id, measured_at.timestamp())
+        for device_id, measured_at in Measurement.objects.filter(
+            device_id__in=set(device_ids.tolist()), measured_at__gte=start, measured_at__lte=end,
+        ).order_by().values_list("device_id", "measured_at")
+    )
+    return np.fromiter(((d, t) in stored for d, t in zip(device_ids.tolist(), ts.tolist())), dtype=bool, count=len(ts))
+
+
+def check_plausibility(readings, values, device_map):
+    """
+    readings: lecturas parseadas, ordenadas por (device_id, measured_at).
+    values: matriz (lecturas x METRIC_FIELDS), NaN donde la métrica no vino.
+    Retorna (motivos, límites, segundos): por lectura None si es plausible,
+    DUPLICATE o un QuarantinedReading.Reason; el máximo de kWh admitido para su
+    intervalo; y la duración de ese intervalo.
+    """
+    n = len(readings)
+    devices = [device_map[r["device_id"]] for r in readings]
+    device_ids = np.fromiter((r["device_id"] for r in readings), dtype=np.int64, count=n)
+    ts = np.fromiter((r["measured_at"].timestamp() for r in readings), dtype=np.float64, count=n)
+    present = np.array([[r[f] is not None for f in METRIC_FIELDS] for r in readings], dtype=bool).reshape(n, -1)
+    energy = values[:, ENERGY]
+
+    # Lectura anterior: la previa en el lote si es del mismo dispositivo, si no la guardada
+    same_device = np.r_[False, device_ids[1:] == device_ids[:-1]]
+    last_ts = np.fromiter(
+        (d.last_measured_at.timestamp() if d.last_measured_at else np.nan for d in devices), dtype=np.float64, count=n
+    )
+    last_energy = np.fromiter(
+        (np.nan if d.last_energy_kwh is None else d.last_energy_kwh for d in devices), dtype=np.float64, count=n
+    )
+    prev_ts = np.where(same_device, np.r_[np.nan, ts[:-1]], last_ts)
+    prev_energy = np.where(same_device, np.r_[np.nan, energy[:-1]], last_energy)
+
+    intervals = dict(
+        Product.objects.filter(id__in={d.product_id for d in devices}).values_list("id", "reporting_interval_s")
+    )
+    fallback = np.fromiter(
+        (intervals.get(d.product_id) or DEFAULT_REPORTING_INTERVAL_S for d in devices), dtype=np.float64, count=n
+    )
+    elapsed = ts - prev_ts
+    elapsed = np.where(np.isfinite(elapsed) & (elapsed > 0), elapsed, fallback)
+    capacity_kw = np.fromiter((d.max_power_w / 1000 for d in devices), dtype=np.float64, count=n)
+    # max_power_w = 0 es capacidad desconocida (igual que en utilization.py): sin límite
+    limits = np.where(capacity_kw > 0, capacity_kw * elapsed / 3600 * CAPACITY_TOLERANCE, np.inf)
+
+    with np.errstate(invalid="ignore"):
+        non_finite = (present & ~np.isfinite(values)).any(axis=1)
+        negative = (present & (values < 0)).any(axis=1)
+        above = energy > limits
+    same_time = ts == prev_ts
+    duplicate = same_time & (energy == prev_energy)
+    conflict = same_time & ~duplicate
+    # Reenvío de un instante ya guardado (aunque no sea la última lectura)
+    duplicate |= stored_instants(device_ids, ts)
+    conflict &= ~duplicate
+
+    # Orden de prioridad del motivo cuando aplica más de uno
+    reasons = np.select(
+        [non_finite, negative, duplicate, conflict, above],
+        [
+            QuarantinedReading.Reason.NON_FINITE, QuarantinedReading.Reason.NEGATIVE, DUPLICATE,
+            QuarantinedReading.Reason.CONFLICT, QuarantinedReading.Reason.ABOVE_CAPACITY,
+        ],
+        default="",
+    )
+    return [str(reason) or None for reason in reasons], limits, elapsed
+
+
+def quarantine_values(reading):
+    """Métricas de la lectura serializables en JSON (NaN/inf como texto)."""
+    return {
+        f: reading[f] if reading[f] is None or math.isfinite(reading[f]) else str(reading[f])
+        for f in METRIC_FIELDS
+    }
@@ -2,17 +2,44 @@
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect
 from organizations.models import Organization, Usuario
-from .models import Product, Device, Zone, Measurement, Category
+from .models import Product, Device, Zone, Measurement, Category, AlertEvent, AlertRule, StandbyWaste, OrganizationBenchmark
 from .forms import ProductForm, DeviceForm, ZoneForm
 from django.views.generic import ListView
 from organizations.decorators import encargado, cliente_admin
+from ecoenergy.routers import read_replica
+from ecoenergy.sharding import MergedResults, current_shard, fan_out, locate_shard, object_shard, sharding_enabled, use_shard
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.db.models import Q
+from django.db.models import Case, Count, F, IntegerField, Q, Sum, Value, When, prefetch_related_objects
 from django.shortcuts import get_object_or_404
 from django.views.decorators.http import require_POST
 from django.contrib import messages
-from django.http import JsonResponse
+from django.db import IntegrityError
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from .exports import parse_bound, parse_export_filters, filter_devices, device_querysets, measurement_rows, alert_event_rows, stream_csv
+from .timeseries import DEFAULT_POINTS, DOWNSAMPLERS, hourly_quantiles, query_series
+from .writer import write_readings
+from .imports import DEVICE_COLUMNS, PRODUCT_COLUMNS, import_devices, import_products
+from .bulk import BULK_ACTIONS, apply_bulk_action, parse_device_ids
+from .offline import chunked
+from .billing import invoice, parse_period
+from .utilization import device_utilization, utilization_report
+from .forecasting import consumption_vs_forecast, forecast_series
+from .rollups import floor_hour
+from .heatmap import HEATMAP_DAYS, HEATMAP_SCOPES, consumption_heatmap, heatmap_period
+from .zones import ZONE_SUMMARY_DAYS, filter_zone_subtree, zone_summary
+from .events import broker
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import asyncio
+import json
+
+SSE_KEEPALIVE_SECONDS = 15
+
+
 @login_required
+@read_replica
 def dashboard(request):
     user = request.user
     context = {}
@@ -33,8 +60,9 @@ def dashboard(request):
         # System admin - show everything
         context['total_organizations'] = Organization.objects.count()
         context['total_users'] = Usuario.objects.count()
-        context['total_zones'] = Zone.objects.count()
-        context['total_devices'] = Device.objects.count()
+        # Zonas y dispositivos están repartidos por shard: se cuenta en cada uno
+        context['total_zones'] = sum(fan_out(lambda: Zone.objects.count()))
+        context['total_devices'] = sum(fan_out(lambda: Device.objects.count()))
         context['total_products'] = Product.objects.count()
         
     elif user.groups.filter(name='Cliente Admin').exists() and user_organization:
@@ -42,13 +70,29 @@ def dashboard(request):
         context['organization_zones'] = Zone.objects.filter(organization=user_organization).count()
         context['organization_devices'] = Device.objects.filter(organization=user_organization).count()
         context['active_devices'] = Device.objects.filter(organization=user_organization, status="ACTIVE").count()
+        # Hoy hasta la última hora cerrada, frente al pronóstico nocturno
+        day_start = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        context['forecast_today'] = consumption_vs_forecast(
+            list(Device.objects.filter(organization=user_organization).values_list('id', flat=True)),
+            day_start, floor_hour(timezone.now()),
+        )
+        # Percentiles precalculados (manage.py benchmark_organizations): solo se leen
+        context['benchmarks'] = OrganizationBenchmark.objects.filter(
+            organization=user_organization
+        ).select_related('category')
         
     elif user.groups.filter(name='Cliente Electrónico').exists() and user_organization:
         # Read-only user - basic info
         context['total_devices'] = Device.objects.filter(organization=user_organization, status="ACTIVE").count()
-        context['recent_measurements'] = Measurement.objects.filter(
-            device__organization=user_organization
-        ).select_related('device')[:5]
+        # Sin join measurement->device (pueden estar en bases distintas): las 5
+        # más recientes de cada bloque de ids (límite de SQLite) y se mezclan
+        device_ids = Device.objects.filter(organization=user_organization).values_list('id', flat=True)
+        recent = sorted(
+            (m for ids in chunked(device_ids) for m in Measurement.objects.filter(device_id__in=ids)[:5]),
+            key=lambda m: m.measured_at, reverse=True,
+        )[:5]
+        prefetch_related_objects(recent, 'device')
+        context['recent_measurements'] = recent
     
     return render(request, 'dashboard.html', context)
 
@@ -72,6 +116,7 @@ def get_user_organization(user):
 
 
 @login_required
+@read_replica
 def lista_productos(request):
     print(f"=== DEBUG PRODUCTOS VIEW ===")
     print(f"User: {request.user.username}")
@@ -154,6 +199,7 @@ def lista_productos(request):
 
 @login_required
 @cliente_admin()
+@read_replica
 def lista_dispositivos(request):
     # ==== GET SEARCH PARAMETERS ====
     q = (request.GET.get("q") or "").strip()
@@ -169,35 +215,54 @@ def lista_dispositivos(request):
     sort_field = request.GET.get('sort', 'name')
     sort_direction = request.GET.get('direction', 'asc')
     
-    # ==== BASE QUERYSET ====
-    qs = Device.objects.select_related("organization", "zone", "product").filter(status='ACTIVE')
+    is_encargado = request.user.groups.filter(name='Encargado EcoEnergy').exists()
     
-    # ==== ORGANIZATION FILTERING BASED ON USER ROLE ====
-    if request.user.groups.filter(name='Encargado EcoEnergy').exists():
-        # Encargado sees ALL organizations - no filter applied
-        pass
-    elif hasattr(request.user, 'usuario'):
-        # Others see only their organization
-        qs = qs.filter(organization=request.user.usuario.organization)
-    else:
-        qs = qs.none()
-    
-    # ==== APPLY SEARCH FILTER ====
+    # ==== CATALOG LOOKUPS ====
+    # Organization, Product y AlertRule viven en "default" y el device en su shard:
+    # se resuelven por id (prefetch / IN) en vez de joins
+    matching_products = []
     if q:
-        qs = qs.filter(
-            Q(name__icontains=q) |
-            Q(serial_number__icontains=q) |
-            Q(product__name__icontains=q) |
-            Q(zone__name__icontains=q)
+        matching_products = list(Product.objects.filter(name__icontains=q).values_list('id', flat=True))
+    product_rank = _product_name_rank() if sort_field == 'product' else None
+    
+    # ==== BASE QUERYSET ====
+    def build():
+        qs = (
+            Device.objects.select_related("zone")
+            .prefetch_related("organization", "product", "last_alert")
+            .filter(status='ACTIVE')
         )
+        
+        # ==== ORGANIZATION FILTERING BASED ON USER ROLE ====
+        if is_encargado:
+            # Encargado sees ALL organizations - no filter applied
+            pass
+        elif hasattr(request.user, 'usuario'):
+            # Others see only their organization
+            qs = qs.filter(organization=request.user.usuario.organization)
+        else:
+            qs = qs.none()
+        
+        # ==== APPLY SEARCH FILTER ====
+        if q:
+            qs = qs.filter(
+                Q(name__icontains=q) |
+                Q(serial_number__icontains=q) |
+                Q(product_id__in=matching_products) |
+                Q(zone__name__icontains=q)
+            )
+        if product_rank is not None:
+            qs = qs.annotate(product_rank=product_rank)
+        return qs
     
     # ==== APPLY SORTING ====
     sort_mapping = {
         'name': 'name',
         'serial_number': 'serial_number',
-        'product': 'product__name',
+        'product': 'product_rank',
         'zone': 'zone__name',
         'max_power': 'max_power_w',
+        'last_seen': 'last_measured_at',
         'created_at': 'created_at'
     }
     
@@ -205,7 +270,11 @@ def lista_dispositivos(request):
     if sort_direction == 'desc':
         actual_sort_field = f'-{actual_sort_field}'
     
-    qs = qs.order_by(actual_sort_field)
+    if is_encargado and sharding_enabled():
+        # Todas las organizaciones: una consulta por shard, mezcladas en orden
+        qs = MergedResults(build, actual_sort_field)
+    else:
+        qs = build().order_by(actual_sort_field)
     
     # ==== PAGINATION ====
     paginator = Paginator(qs, items_per_page)
@@ -226,6 +295,12 @@ def lista_dispositivos(request):
     if hasattr(request.user, 'usuario'):
         current_org = request.user.usuario.organization
     
+    # ==== BULK ACTION TARGETS ====
+    def active_zones():
+        zones = Zone.objects.filter(status='ACTIVE').prefetch_related('organization')
+        return list(zones if is_encargado else zones.filter(organization=current_org))
+    zonas = [z for part in fan_out(active_zones) for z in part] if is_encargado else active_zones()
+    
     return render(request, "dispositivos/lista_dispositivos.html", {
         "page_obj": page_obj,
         "q": q,
@@ -235,10 +310,22 @@ def lista_dispositivos(request):
         "sort_field": sort_field,
         "sort_direction": sort_direction,
         "organization": current_org,
-        "is_encargado": request.user.groups.filter(name='Encargado EcoEnergy').exists(),
+        "is_encargado": is_encargado,
+        "zonas": zonas,
+        "productos": Product.objects.filter(status='ACTIVE').order_by('name'),
     })
 
 
+def _product_name_rank():
+    """Posición de cada producto por nombre: permite ordenar devices sin join al catálogo."""
+    product_ids = list(Product.objects.order_by('name', 'id').values_list('id', flat=True))
+    return Case(
+        *[When(product_id=pk, then=Value(rank)) for rank, pk in enumerate(product_ids)],
+        default=Value(len(product_ids)),
+        output_field=IntegerField(),
+    )
+
+
 @login_required
 @encargado()
 def editar_producto(request, pk):
@@ -366,6 +453,7 @@ def crear_dispositivo(request):
     return render(request, 'dispositivos/crear.html', context)
 @login_required
 @cliente_admin()
+@object_shard(Device)
 def editar_dispositivo(request, pk):
     # Get organization based on user role
     if request.user.groups.filter(name='Encargado EcoEnergy').exists():
@@ -407,10 +495,78 @@ def editar_dispositivo(request, pk):
         "is_encargado": request.user.groups.filter(name='Encargado EcoEnergy').exists(),
     })
 
+# ==== ZONAS ====
+@login_required
+@cliente_admin()
+@read_replica
+def lista_zonas(request):
+    """
+    Zone tree of the organization with active device counts and energy of the
+    last days (own and including subzones). GET: q, sort, direction, days, organization (Encargado only).
+    """
+    organization_id = _scoped_organization_id(request.user, request.GET.get('organization'))
+    if organization_id is None:
+        messages.error(request, "❌ Seleccione una organización.")
+        return redirect('dashboard')
+    organization = get_object_or_404(Organization, pk=organization_id)
+
+    # ==== GET SEARCH PARAMETERS ====
+    q = (request.GET.get("q") or "").strip()
+    days = int(request.GET.get('days')) if request.GET.get('days', '').isdigit() else 30
+    if days not in ZONE_SUMMARY_DAYS:
+        days = 30
+
+    # ==== GET PAGINATION SIZE ====
+    if request.method == 'POST' and 'items_per_page' in request.POST:
+        items_per_page = int(request.POST.get('items_per_page'))
+        request.session['zona_items_per_page'] = items_per_page
+    else:
+        items_per_page = request.session.get('zona_items_per_page', 10)
+
+    # ==== GET SORTING PARAMETERS ====
+    sort_field = request.GET.get('sort', 'name')
+    sort_direction = request.GET.get('direction', 'asc')
+
+    # Conteos y energía precalculados (una consulta agregada + rollups, cacheado)
+    zonas = [z for z in zone_summary(organization.id, days) if z['status'] == 'ACTIVE']
+    if q:
+        zonas = [z for z in zonas if q.lower() in z['name'].lower()]
+
+    # ==== APPLY SORTING ====
+    # "name" conserva el orden de árbol; el resto ordena por totales del subárbol
+    sort_mapping = {'devices': 'subtree_devices', 'energy': 'subtree_kwh'}
+    if sort_field in sort_mapping:
+        zonas.sort(key=lambda z: z[sort_mapping[sort_field]], reverse=sort_direction == 'desc')
+    elif sort_direction == 'desc':
+        zonas.reverse()
+
+    # ==== PAGINATION ====
+    paginator = Paginator(zonas, items_per_page)
+    page_obj = paginator.get_page(request.GET.get("page"))
+
+    # ==== PRESERVE PARAMETERS ====
+    params = request.GET.copy()
+    params.pop("page", None)
+    querystring = params.urlencode()
+
+    return render(request, "zonas/lista_zonas.html", {
+        "page_obj": page_obj,
+        "q": q,
+        "querystring": querystring,
+        "total": len(zonas),
+        "items_per_page": items_per_page,
+        "sort_field": sort_field,
+        "sort_direction": sort_direction,
+        "organization": organization,
+        "days": days,
+        "day_options": ZONE_SUMMARY_DAYS,
+    })
+
+
 @login_required
 @cliente_admin()
 def crear_zona(request):
-    organization = get_user_organization(request)
+    organization = get_user_organization(request.user)
     
     if not organization:
         messages.error(request, "❌ No tienes una organización asignada.")
@@ -445,8 +601,9 @@ def crear_zona(request):
 
 @login_required
 @cliente_admin()
+@object_shard(Zone)
 def editar_zona(request, pk):
-    organization = get_user_organization(request)
+    organization = get_user_organization(request.user)
     zona = get_object_or_404(Zone, pk=pk, organization=organization)
     
     if request.method == 'POST':
@@ -468,15 +625,19 @@ def editar_zona(request, pk):
     else:
         form = ZoneForm(instance=zona, organization=organization)
     
+    device_counts = zona.devices.aggregate(total=Count('id'), active=Count('id', filter=Q(status='ACTIVE')))
     return render(request, "zonas/editar_zona.html", {
         "form": form,
         "zona": zona,
         "title": "Editar Zona",
-        "organization": organization
+        "organization": organization,
+        "total_devices": device_counts['total'],
+        "active_devices": device_counts['active'],
     })
 @login_required
 @cliente_admin()
 @require_POST
+@object_shard(Device)
 def eliminar_dispositivo(request, pk):
     # Get organization based on user role
     if request.user.groups.filter(name='Encargado EcoEnergy').exists():
@@ -509,6 +670,7 @@ def eliminar_dispositivo(request, pk):
 @login_required
 @cliente_admin()
 @require_POST
+@object_shard(Zone)
 def eliminar_zona(request, pk):
     # Get organization based on user role
     if request.user.groups.filter(name='Encargado EcoEnergy').exists():
@@ -531,6 +693,11 @@ def eliminar_zona(request, pk):
                 'success': False,
                 'message': f'❌ No se puede eliminar la zona "{zona.name}" porque tiene dispositivos asignados.'
             })
+        if zona.children.filter(status='ACTIVE').exists():
+            return JsonResponse({
+                'success': False,
+                'message': f'❌ No se puede eliminar la zona "{zona.name}" porque tiene subzonas activas.'
+            })
         
         zona.status = 'INACTIVE'
         zona.save()
@@ -543,4 +710,537 @@ def eliminar_zona(request, pk):
         return JsonResponse({
             'success': False,
             'message': f'❌ Error al eliminar la zona: {str(e)}'
-        })
\ No newline at end of file
+        })
+
+# ==== ACCIONES MASIVAS ====
+@login_required
+@cliente_admin()
+@require_POST
+def acciones_dispositivos(request):
+    """Bulk deactivate / move zone / change product with one scoped UPDATE per shard."""
+    try:
+        payload = json.loads(request.body or b'{}')
+        action = payload.get('action')
+        if action not in BULK_ACTIONS:
+            raise ValueError(f"Acción inválida: {action}")
+        ids = parse_device_ids(payload.get('ids'))
+    except (ValueError, AttributeError) as e:
+        return JsonResponse({'success': False, 'message': f'❌ {e}'}, status=400)
+    
+    is_encargado = request.user.groups.filter(name='Encargado EcoEnergy').exists()
+    zone = product = None
+    shards = None
+    
+    if action == 'move_zone':
+        zone_id = payload.get('zone_id')
+        if not str(zone_id).isdigit():
+            return JsonResponse({'success': False, 'message': '❌ Seleccione una zona.'}, status=400)
+        # La zona define el shard: solo se pueden mover devices de su misma organización
+        zones = Zone.objects.filter(pk=zone_id, status='ACTIVE')
+        if is_encargado and sharding_enabled():
+            shards = [locate_shard(Zone, zone_id) or 'default']
+            with use_shard(shards[0]):
+                zone = zones.first()
+        else:
+            if not is_encargado:
+                zones = zones.filter(organization=get_user_organization(request.user))
+            zone = zones.first()
+        if zone is None:
+            return JsonResponse({'success': False, 'message': '❌ Zona inexistente o fuera de su organización.'}, status=404)
+    elif action == 'change_product':
+        product = Product.objects.filter(pk=payload.get('product_id') or 0, status='ACTIVE').first()
+        if product is None:
+            return JsonResponse({'success': False, 'message': '❌ Producto inexistente o inactivo.'}, status=404)
+    
+    def run():
+        return apply_bulk_action(_user_devices(request), action, ids, zone=zone, product=product)
+    
+    if is_encargado and sharding_enabled():
+        # Los ids pueden estar en cualquier shard: se aplica en cada uno y se combinan
+        parts = fan_out(run, shards)
+        updated = sum(part['updated'] for part in parts)
+        results = {pk: next((p['results'][pk] for p in parts if p['results'][pk] != 'not_found'), 'not_found')
+                   for pk in ids}
+    else:
+        outcome = run()
+        updated, results = outcome['updated'], outcome['results']
+    
+    return JsonResponse({
+        'success': True,
+        'message': f'✅ {updated} de {len(ids)} dispositivos actualizados.',
+        'updated': updated,
+        'results': results,
+    })
+
+# ==== IMPORTACION CSV ====
+IMPORT_ERRORS_SESSION_KEY = 'import_errors'
+IMPORT_MAX_UPLOAD_BYTES = 5 * 1024 * 1024
+
+
+def _import_view(request, kind, title, columns, importer, list_url):
+    """Shared upload flow: validate the file, import it and keep rejected rows for download."""
+    if request.method == 'POST':
+        upload = request.FILES.get('archivo')
+        if upload is None:
+            messages.error(request, "❌ Seleccione un archivo CSV.")
+        elif upload.size > IMPORT_MAX_UPLOAD_BYTES:
+            messages.error(request, "❌ El archivo excede el tamaño máximo de 5 MB.")
+        else:
+            try:
+                result = importer(upload.read())
+            except ValueError as e:
+                messages.error(request, f"❌ {e}")
+            except IntegrityError:
+                messages.error(request, "❌ Otro usuario creó registros con los mismos datos. Intente nuevamente.")
+            else:
+                request.session.pop(IMPORT_ERRORS_SESSION_KEY, None)
+                if not result.errors:
+                    messages.success(request, f"✅ {result.created} {kind} importados exitosamente!")
+                    return redirect(list_url)
+                request.session[IMPORT_ERRORS_SESSION_KEY] = {
+                    'kind': kind,
+                    'content': ''.join(stream_csv(result.error_rows())),
+                }
+                messages.warning(
+                    request,
+                    f"⚠️ {result.created} {kind} importados, {len(result.errors)} filas con errores."
+                )
+                return redirect(request.path)
+
+    pending = request.session.get(IMPORT_ERRORS_SESSION_KEY)
+    return render(request, "importacion/importar.html", {
+        "title": title,
+        "kind": kind,
+        "columns": columns,
+        "list_url": list_url,
+        "has_errors": bool(pending and pending['kind'] == kind),
+    })
+
+
+@login_required
+@encargado()
+def importar_productos(request):
+    return _import_view(request, 'productos', 'Importar Productos', PRODUCT_COLUMNS, import_products, 'lista_productos')
+
+
+@login_required
+@cliente_admin()
+def importar_dispositivos(request):
+    if request.user.groups.filter(name='Encargado EcoEnergy').exists():
+        organization, columns = None, DEVICE_COLUMNS
+    else:
+        organization = get_user_organization(request.user)
+        if organization is None:
+            messages.error(request, "❌ No tienes una organización asignada.")
+            return redirect('lista_dispositivos')
+        columns = [c for c in DEVICE_COLUMNS if c != 'organization']
+    return _import_view(
+        request, 'dispositivos', 'Importar Dispositivos', columns,
+        lambda data: import_devices(data, organization=organization), 'lista_dispositivos',
+    )
+
+
+@login_required
+def descargar_errores_importacion(request):
+    """Download the rows rejected by the last import, with line number and reason."""
+    pending = request.session.get(IMPORT_ERRORS_SESSION_KEY)
+    if not pending:
+        messages.error(request, "❌ No hay errores de importación para descargar.")
+        return redirect('dashboard')
+    response = HttpResponse(pending['content'], content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="errores_{pending["kind"]}.csv"'
+    return response
+
+# ==== EXPORTACIONES (CSV EN STREAMING) ====
+def _user_devices(request):
+    """Devices the user is allowed to read, following the usual role rules."""
+    qs = Device.objects.all()
+    if request.user.groups.filter(name='Encargado EcoEnergy').exists():
+        return qs
+    elif hasattr(request.user, 'usuario'):
+        return qs.filter(organization=request.user.usuario.organization)
+    return qs.none()
+
+
+def _per_shard(request, fn):
+    """fn() en cada shard (en paralelo) para el Encargado; en el shard propio para el resto."""
+    if request.user.groups.filter(name='Encargado EcoEnergy').exists():
+        return fan_out(fn)
+    return [fn()]
+
+
+def _export_sources(request, filters, model, time_field='measured_at'):
+    """
+    ({device_id: name}, [querysets]) of the devices selected by the filters,
+    merged from every shard the user can read.
+    """
+    def shard_sources():
+        names = dict(filter_devices(_user_devices(request), filters).values_list('id', 'name'))
+        return names, device_querysets(model, names, filters, time_field=time_field)
+
+    device_names, querysets = {}, []
+    for names, shard_querysets in _per_shard(request, shard_sources):
+        device_names.update(names)
+        querysets.extend(shard_querysets)
+    return device_names, querysets
+
+
+def _export_response(name, rows, filters):
+    """Wrap a row generator into a (optionally gzipped) streaming CSV download."""
+    stamp = timezone.now().strftime('%Y%m%d_%H%M')
+    filename = f"{name}_{stamp}.csv"
+    content_type = 'text/csv; charset=utf-8'
+    if filters['gzip']:
+        filename += '.gz'
+        content_type = 'application/gzip'
+
+    response = StreamingHttpResponse(stream_csv(rows, compress=filters['gzip']), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@login_required
+@read_replica
+def exportar_mediciones(request):
+    """Stream the user's measurements as CSV (raw, hourly or daily)."""
+    try:
+        filters = parse_export_filters(request.GET)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': f'❌ {e}'}, status=400)
+
+    device_names, querysets = _export_sources(request, filters, Measurement)
+    rows = measurement_rows(querysets, filters['resolution'], device_names)
+    return _export_response(f"mediciones_{filters['resolution']}", rows, filters)
+
+
+@login_required
+@read_replica
+def exportar_alertas(request):
+    """Stream the user's alert events as CSV."""
+    try:
+        filters = parse_export_filters(request.GET)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': f'❌ {e}'}, status=400)
+
+    device_names, querysets = _export_sources(request, filters, AlertEvent, time_field='occurred_at')
+    rules = {pk: (name, severity) for pk, name, severity in AlertRule.objects.values_list('id', 'name', 'severity')}
+    return _export_response('alertas', alert_event_rows(querysets, device_names, rules), filters)
+
+
+# ==== API SERIES DE TIEMPO ====
+@login_required
+@read_replica
+def api_series(request):
+    """
+    JSON consumption series for a device, zone (with its subzones) or organization.
+    GET: scope=device|zone|organization, id, start, end, points, method=lttb|minmax,
+    forecast=1 (adds the stored 7-day forecast overlapping the range, hourly),
+    percentiles=50,95 (hourly kWh percentiles from the daily rollup sketches)
+    """
+    scope = request.GET.get('scope', 'device')
+    scope_id = request.GET.get('id', '')
+    method = request.GET.get('method', 'lttb')
+    scope_fields = {'device': 'pk', 'zone': 'zone_id', 'organization': 'organization_id'}
+
+    if scope not in scope_fields or not scope_id.isdigit():
+        return JsonResponse({'success': False, 'message': '❌ Parámetros scope/id inválidos.'}, status=400)
+    if method not in DOWNSAMPLERS:
+        return JsonResponse({'success': False, 'message': f'❌ Método inválido: {method}'}, status=400)
+
+    try:
+        end = parse_bound(request.GET.get('end'), end=True) or timezone.now()
+        start = parse_bound(request.GET.get('start')) or end - timedelta(days=7)
+        points = int(request.GET.get('points', DEFAULT_POINTS))
+        percentiles = [int(p) for p in request.GET.get('percentiles', '').split(',') if p.strip()]
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': f'❌ {e}'}, status=400)
+    if start >= end:
+        return JsonResponse({'success': False, 'message': '❌ El inicio debe ser anterior al fin.'}, status=400)
+    if not all(0 < p < 100 for p in percentiles):
+        return JsonResponse({'success': False, 'message': '❌ Los percentiles deben estar entre 1 y 99.'}, status=400)
+
+    def scoped_device_ids():
+        devices = _user_devices(request)
+        if scope == 'zone':
+            # La zona incluye sus subzonas: un rango sobre zone.path
+            devices = filter_zone_subtree(devices, scope_id)
+        else:
+            devices = devices.filter(**{scope_fields[scope]: scope_id})
+        return current_shard(), list(devices.values_list('id', flat=True))
+
+    # Dispositivo, zona y organización viven en un solo shard: el que los tenga
+    shard, device_ids = next(
+        ((alias, ids) for alias, ids in _per_shard(request, scoped_device_ids) if ids), (None, [])
+    )
+    if not device_ids:
+        return JsonResponse({'success': False, 'message': '❌ No se encontraron dispositivos.'}, status=404)
+    with use_shard(shard):
+        resolution, t, v = query_series(device_ids, start, end, points=points, method=method)
+        data = {
+            'success': True,
+            'scope': scope,
+            'id': int(scope_id),
+            'resolution': resolution,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            't': t.astype('int64').tolist(),
+            'v': v.round(4).tolist(),
+        }
+        if request.GET.get('forecast') == '1':
+            ft, fv = forecast_series(device_ids, start, end)
+            data['forecast'] = {'t': ft.astype('int64').tolist(), 'v': fv.round(4).tolist()}
+        if percentiles:
+            values, hours = hourly_quantiles(device_ids, start, end, [p / 100 for p in percentiles])
+            data['percentiles'] = {
+                'hours': hours,
+                **{f'p{p}': (round(float(v), 4) if hours else None) for p, v in zip(percentiles, values)},
+            }
+    return JsonResponse(data)
+
+
+
+@login_required
+@read_replica
+def api_heatmap(request):
+    """
+    JSON 24x7 matrix (hour of day x weekday) of average hourly kWh for a device,
+    zone (with its subzones) or organization. Cached per scope and period.
+    GET: scope=device|zone|organization, id, days=7|30|90|365 or start/end
+    (YYYY-MM-DD), organization (Encargado only, implied for scope=organization)
+    """
+    scope = request.GET.get('scope', 'device')
+    scope_id = request.GET.get('id', '')
+    if scope not in HEATMAP_SCOPES or not scope_id.isdigit():
+        return JsonResponse({'success': False, 'message': '❌ Parámetros scope/id inválidos.'}, status=400)
+
+    requested = scope_id if scope == 'organization' else request.GET.get('organization')
+    organization_id = _scoped_organization_id(request.user, requested)
+    if organization_id is None:
+        return JsonResponse({'success': False, 'message': '❌ Seleccione una organización.'}, status=400)
+    if scope == 'organization' and int(scope_id) != organization_id:
+        return JsonResponse({'success': False, 'message': '❌ No se encontraron dispositivos.'}, status=404)
+
+    days = int(request.GET.get('days')) if request.GET.get('days', '').isdigit() else 30
+    if days not in HEATMAP_DAYS:
+        days = 30
+    try:
+        start = parse_bound(request.GET.get('start'))
+        end = parse_bound(request.GET.get('end'))
+        start, end = heatmap_period(days, start and start.date(), end and end.date())
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': f'❌ {e}'}, status=400)
+
+    data = consumption_heatmap(organization_id, scope, int(scope_id), start, end)
+    if data is None:
+        return JsonResponse({'success': False, 'message': '❌ No se encontraron dispositivos.'}, status=404)
+    return JsonResponse({
+        'success': True,
+        'scope': scope,
+        'id': int(scope_id),
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        **data,
+    })
+
+
+# ==== FACTURACION ====
+@login_required
+@cliente_admin()
+@read_replica
+def factura_organizacion(request):
+    """
+    Monthly invoice (cost by tariff) for the user's organization.
+    GET: period=YYYY-MM (default current month), organization (Encargado only).
+    """
+    organization_id = _scoped_organization_id(request.user, request.GET.get('organization'))
+    if organization_id is None:
+        messages.error(request, "❌ Seleccione una organización.")
+        return redirect('dashboard')
+    organization = get_object_or_404(Organization, pk=organization_id)
+
+    try:
+        period, _, _ = parse_period(request.GET.get('period'))
+    except ValueError as e:
+        messages.error(request, f"❌ {e}")
+        return redirect('dashboard')
+
+    result = invoice(organization.id, period)
+    if result is None:
+        messages.warning(request, f'⚠️ "{organization.name}" no tiene una tarifa vigente para {period}.')
+
+    return render(request, 'facturacion/factura.html', {
+        'organization': organization,
+        'period': period,
+        'invoice': result,
+    })
+
+
+# ==== OPORTUNIDADES DE AHORRO ====
+SAVINGS_TOP = 50
+SAVINGS_SORTS = {'kwh': 'wasted_kwh', 'cost': 'wasted_cost'}
+
+
+@login_required
+@cliente_admin()
+@read_replica
+def oportunidades_ahorro(request):
+    """
+    Devices and zones ranked by energy wasted above product standby power.
+    Reads the table materialized by `manage.py analyze_standby`.
+    GET: sort=kwh|cost (ranking by wasted energy or by its cost).
+    """
+    is_encargado = request.user.groups.filter(name='Encargado EcoEnergy').exists()
+    sort = request.GET.get('sort') if request.GET.get('sort') in SAVINGS_SORTS else 'kwh'
+    field = SAVINGS_SORTS[sort]
+
+    def scoped():
+        qs = StandbyWaste.objects.filter(wasted_kwh__gt=0)
+        if is_encargado:
+            return qs
+        elif hasattr(request.user, 'usuario'):
+            return qs.filter(organization_id=request.user.usuario.organization_id)
+        return qs.none()
+
+    def top_devices():
+        return list(
+            scoped().select_related('device', 'zone').prefetch_related('organization')
+            .order_by(F(field).desc(nulls_last=True))[:SAVINGS_TOP]
+        )
+
+    def zone_totals():
+        return list(
+            scoped().values('zone_id', 'zone__name', 'organization_id', 'currency')
+            .annotate(wasted_kwh=Sum('wasted_kwh'), wasted_cost=Sum('wasted_cost'), devices=Count('id'))
+        )
+
+    def total_kwh():
+        return scoped().aggregate(total=Sum('wasted_kwh'))['total'] or 0
+
+    # Tabla chica y ya calculada: una consulta por shard y orden en memoria
+    # (sin tarifa el costo es NULL: esas filas van al final)
+    def rank(value):
+        return (value is None, -(value or 0))
+
+    dispositivos = sorted(
+        (row for part in fan_out(top_devices) for row in part), key=lambda r: rank(getattr(r, field))
+    )[:SAVINGS_TOP]
+    zonas = sorted(
+        (row for part in fan_out(zone_totals) for row in part), key=lambda r: rank(r[field])
+    )[:SAVINGS_TOP]
+
+    return render(request, 'ahorro/oportunidades.html', {
+        'dispositivos': dispositivos,
+        'zonas': zonas,
+        'total_kwh': sum(fan_out(total_kwh)),
+        'computed_at': dispositivos[0].computed_at if dispositivos else None,
+        'is_encargado': is_encargado,
+        'sort': sort,
+    })
+
+
+# ==== UTILIZACION DE CAPACIDAD ====
+UTILIZATION_DAYS = (7, 30, 90)
+
+
+@login_required
+@cliente_admin()
+@read_replica
+def utilizacion_capacidad(request):
+    """
+    Capacity utilization (energy vs max_power_w) per device, with
+    distributions per product and zone. GET: days=7|30|90.
+    """
+    days = int(request.GET.get('days')) if request.GET.get('days', '').isdigit() else 30
+    if days not in UTILIZATION_DAYS:
+        days = 30
+    end = timezone.now().date() + timedelta(days=1)
+    start = end - timedelta(days=days)
+    is_encargado = request.user.groups.filter(name='Encargado EcoEnergy').exists()
+
+    def per_device():
+        devices = _user_devices(request).filter(status='ACTIVE')
+        return device_utilization(devices, start, end)
+
+    rows = [row for part in fan_out(per_device) for row in part] if is_encargado else per_device()
+    report = utilization_report(rows, dict(Product.objects.values_list('id', 'name')))
+
+    return render(request, 'utilizacion/utilizacion.html', {
+        'report': report,
+        'days': days,
+        'day_options': UTILIZATION_DAYS,
+    })
+
+
+# ==== INGESTA Y EVENTOS EN VIVO ====
+@login_required
+@cliente_admin()
+@require_POST
+def api_ingesta(request):
+    """
+    Ingest a batch of readings. Body JSON: {"readings": [{"device_id", "energy_kwh", "measured_at"?}, ...]}
+    Devices outside the user's organization are rejected per reading.
+    """
+    try:
+        payload = json.loads(request.body or b'{}')
+        readings = payload['readings']
+        if not isinstance(readings, list):
+            raise TypeError
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'success': False, 'message': '❌ Se esperaba JSON {"readings": [...]}.'}, status=400)
+
+    try:
+        result = write_readings(readings, devices=_user_devices(request))
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': f'❌ {e}'}, status=400)
+    except FutureTimeoutError:
+        # El lote sigue en la cola del escritor y puede terminar aplicándose
+        return JsonResponse({
+            'success': False,
+            'message': '⚠️ La ingesta demoró demasiado; el lote pudo haberse aplicado. '
+                       'Reenviarlo es seguro: las lecturas ya guardadas se rechazan como duplicadas.',
+        }, status=503)
+
+    return JsonResponse({'success': True, **result})
+
+
+def _scoped_organization_id(user, requested_id):
+    """Organization the user may look at (Encargado can pick any)."""
+    if user.groups.filter(name='Encargado EcoEnergy').exists():
+        return int(requested_id) if requested_id and requested_id.isdigit() else None
+    elif hasattr(user, 'usuario'):
+        return user.usuario.organization_id
+    return None
+
+
+@login_required
+async def stream_eventos(request):
+    """
+    Server-Sent Events stream with new measurements and alert transitions
+    for the user's organization (Encargado: ?organization=, or the whole fleet
+    without it). Needs the ASGI server (ecoenergy/asgi.py).
+    """
+    user = await request.auser()
+    organization_id = await sync_to_async(_scoped_organization_id)(user, request.GET.get('organization'))
+    is_encargado = await user.groups.filter(name='Encargado EcoEnergy').aexists()
+    if organization_id is None and not is_encargado:
+        return JsonResponse({'success': False, 'message': '❌ No tienes una organización asignada.'}, status=403)
+
+    async def events():
+        subscription = broker.subscribe(organization_id)
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comentario SSE: mantiene viva la conexión a través de proxies
+                    yield ': keepalive\n\n'
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+        finally:
+            broker.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,138 @@
+# devices/writer.py
+#
+# ──────────────────────────────────────────────────────────────────────────────
+# Propósito del módulo
+# ──────────────────────────────────────────────────────────────────────────────
+# Escritor único de ingesta para el perfil SQLite de un solo nodo.
+#
+# SQLite admite un solo escritor a la vez: con varias vistas escribiendo en
+# paralelo aparece "database is locked", y cada commit es un fsync. Aquí todas
+# las escrituras de ingesta pasan por UN hilo que agrupa los lotes que llegan
+# mientras se confirmaba el grupo anterior y los confirma en UNA transacción:
+# - cada lote corre en su propio savepoint (ingest_readings usa atomic anidado),
+#   así un lote inválido no tumba a los demás;
+# - el resultado de cada lote se entrega por un Future al hilo que lo envió,
+#   recién después del commit.
+#
+# Se activa con settings.INGESTION_WRITER_ENABLED (por defecto en SQLite).
+# ──────────────────────────────────────────────────────────────────────────────
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import close_old_connections, router, transaction
+
+from ecoenergy.sharding import current_shard, use_shard
+
+from .ingestion import ingest_readings
+from .models import Device, Measurement
+
+# Espera extra por lotes rezagados (0 = solo lo ya encolado) y tope de
+# lecturas por transacción
+WRITER_MAX_WAIT_S = 0
+WRITER_MAX_GROUP_READINGS = 20000
+
+# Tiempo máximo que una vista espera a que su lote quede escrito
+WRITER_RESULT_TIMEOUT_S = 30
+
+
+class IngestionWriter:
+    """Hilo escritor con cola; agrupa lotes de ingesta en una sola transacción."""
+
+    def __init__(self, max_wait=WRITER_MAX_WAIT_S, max_group_readings=WRITER_MAX_GROUP_READINGS):
+        self.max_wait = max_wait
+        self.max_group_readings = max_group_readings
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="ingestion-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, readings, devices=None):
+        """Encola un lote; retorna un Future con el resultado de ingest_readings."""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((readings, devices, current_shard(), future))
+        return future
+
+    def _next_group(self):
+        """
+        Bloquea hasta el primer lote y luego toma todo lo ya encolado (lo que
+        llegó mientras se escribía el grupo anterior). Con max_wait > 0 además
+        espera un poco más por lotes rezagados.
+        """
+        first = self._queue.get()
+        group = [first]
+        count = len(first[0])
+        deadline = time.monotonic() + self.max_wait
+        while count < self.max_group_readings:
+            remaining = deadline - time.monotonic()
+            try:
+                job = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            group.append(job)
+            count += len(job[0])
+        return group
+
+    def _run(self):
+        while True:
+            group = self._next_group()
+            close_old_connections()
+            try:
+                self._write_group(group)
+            finally:
+                close_old_connections()
+
+    def _write_group(self, group):
+        # Una transacción por shard (ecoenergy/sharding.py); casi siempre es uno solo
+        by_shard = {}
+        for readings, devices, shard, future in group:
+            by_shard.setdefault(shard, []).append((readings, devices, future))
+        for shard, jobs in by_shard.items():
+            with use_shard(shard):
+                self._write_jobs(jobs)
+
+    def _write_jobs(self, jobs):
+        outcomes = []
+        try:
+            with transaction.atomic(using=router.db_for_write(Measurement)), \
+                    transaction.atomic(using=router.db_for_write(Device)):
+                for readings, devices, future in jobs:
+                    try:
+                        outcomes.append((future, ingest_readings(readings, devices), None))
+                    except Exception as e:
+                        outcomes.append((future, None, e))
+        except Exception as e:
+            # Falló el commit del grupo completo: nadie quedó escrito
+            for _, _, future in jobs:
+                future.set_exception(e)
+            return
+
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+writer = IngestionWriter()
+
+
+def write_readings(readings, devices=None):
+    """
+    Punto de entrada de las vistas: usa el hilo escritor si está habilitado
+    (SQLite) o escribe directo en el hilo actual (MySQL). Si el escritor no
+    responde en WRITER_RESULT_TIMEOUT_S lanza concurrent.futures.TimeoutError,
+    aunque el lote puede aplicarse después.
+    """
+    if getattr(settings, "INGESTION_WRITER_ENABLED", False):
+        return writer.submit(readings, devices).result(timeout=WRITER_RESULT_TIMEOUT_S)
+    return ingest_readings(readings, devices)
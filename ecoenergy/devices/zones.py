@@ -0,0 +1,151 @@
+# devices/zones.py
+#
+# ──────────────────────────────────────────────────────────────────────────────
+# Propósito del módulo
+# ──────────────────────────────────────────────────────────────────────────────
+# Consultas y agregaciones sobre la jerarquía de zonas (edificio > piso > sala).
+#
+# Cada Zone guarda su ruta materializada (Zone.path = "12/45/81/"), así:
+# - los dispositivos de un subárbol salen de UNA consulta de rango sobre
+#   zone.path (filter_zone_subtree), sin recorrer la jerarquía nivel por nivel;
+# - los totales por zona se "suben" a sus ancestros leyendo los ids del path
+#   (rollup_subtrees), en memoria y sin consultas extra;
+# - el orden de árbol (padre antes que hijos, hermanos por nombre) se arma con
+#   los nombres de los ancestros (tree_order).
+#
+# zone_summary() arma el listado de zonas de una organización: dispositivos
+# activos por zona con UNA consulta agregada (Count), energía de los últimos
+# días desde los rollups diarios (una consulta agrupada por dispositivo) y los
+# totales de cada subárbol. Se cachea por organización y periodo; guardar o
+# mover dispositivos/zonas lo invalida (receivers al final del módulo y
+# devices/bulk.py, devices/imports.py para los UPDATE/INSERT masivos).
+# ──────────────────────────────────────────────────────────────────────────────
+
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from ecoenergy.sharding import use_organization
+from organizations.cache import tenant_cache_key
+
+from .models import Device, MeasurementRollup, Zone
+
+ZONE_SUMMARY_DAYS = (7, 30, 90)
+ZONE_SUMMARY_TIMEOUT = 60 * 10
+
+
+def path_ids(path):
+    """Ids de la ruta, desde la raíz hasta la propia zona: '12/45/' -> [12, 45]."""
+    return [int(part) for part in path.split(Zone.PATH_SEPARATOR) if part]
+
+
+def subtree_q(path, field="path"):
+    """Filtro de rango del subárbol de `path` sobre el campo indicado."""
+    low, high = Zone.subtree_bounds(path)
+    return Q(**{f"{field}__gte": low, f"{field}__lt": high})
+
+
+def filter_zone_subtree(queryset, zone_id, field="zone__path"):
+    """
+    Limita un queryset (por defecto de Device) a la zona y sus descendientes.
+    Si la zona no existe en el shard actual, el resultado queda vacío.
+    """
+    path = Zone.objects.filter(pk=zone_id).values_list("path", flat=True).first()
+    if path is None:
+        return queryset.none()
+    return queryset.filter(subtree_q(path, field))
+
+
+def rollup_subtrees(paths, values):
+    """
+    paths: {zone_id: path}; values: {zone_id: valor propio} (número o array NumPy).
+    Retorna {zone_id: total del subárbol} para cada zona que tiene valor propio
+    o descendientes con valor.
+    """
+    totals = {}
+    for zone_id, value in values.items():
+        for ancestor in path_ids(paths.get(zone_id, "")):
+            if ancestor in paths:
+                totals[ancestor] = totals.get(ancestor, 0) + value
+    return totals
+
+
+def tree_order(zones):
+    """
+    Ordena filas con "id", "name" y "path" en orden de árbol: cada zona seguida
+    de sus subzonas, hermanos por nombre.
+    """
+    names = {z["id"]: z["name"].lower() for z in zones}
+    return sorted(zones, key=lambda z: [(names.get(pk, ""), pk) for pk in path_ids(z["path"])])
+
+
+def _summary_key(organization_id, days):
+    return tenant_cache_key(organization_id, "zone_summary", days)
+
+
+def build_zone_summary(organization_id, days):
+    """
+    Filas por zona (orden de árbol) con dispositivos activos y kWh de los
+    últimos `days` días, propios y del subárbol.
+    """
+    start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days - 1)
+    with use_organization(organization_id):
+        zones = list(
+            Zone.objects.filter(organization_id=organization_id)
+            .annotate(device_count=Count("devices", filter=Q(devices__status="ACTIVE")))
+            .values("id", "name", "path", "depth", "parent_id", "status", "created_at", "device_count")
+            .order_by()
+        )
+        zone_of = dict(
+            Device.objects.filter(organization_id=organization_id, status="ACTIVE").values_list("id", "zone_id")
+        )
+        # Rollups en la base de series temporales: sin join, agrupado por dispositivo
+        energy = (
+            MeasurementRollup.objects.filter(
+                device_id__in=list(zone_of), resolution=MeasurementRollup.Resolution.DAY, bucket_start__gte=start,
+            )
+            .values("device_id")
+            .annotate(total=Sum("energy_kwh"))
+            .order_by()
+        )
+        zone_kwh = {}
+        for row in energy:
+            zone_id = zone_of[row["device_id"]]
+            zone_kwh[zone_id] = zone_kwh.get(zone_id, 0) + row["total"]
+
+    paths = {z["id"]: z["path"] for z in zones}
+    subtree_devices = rollup_subtrees(paths, {z["id"]: z["device_count"] for z in zones})
+    subtree_kwh = rollup_subtrees(paths, zone_kwh)
+    for z in zones:
+        z["energy_kwh"] = round(zone_kwh.get(z["id"], 0.0), 3)
+        z["subtree_devices"] = subtree_devices.get(z["id"], 0)
+        z["subtree_kwh"] = round(subtree_kwh.get(z["id"], 0.0), 3)
+    return tree_order(zones)
+
+
+def zone_summary(organization_id, days=30):
+    """build_zone_summary() cacheado por organización y periodo."""
+    key = _summary_key(organization_id, days)
+    rows = cache.get(key)
+    if rows is None:
+        rows = build_zone_summary(organization_id, days)
+        cache.set(key, rows, ZONE_SUMMARY_TIMEOUT)
+    return rows
+
+
+def invalidate_zone_summary(*organization_ids):
+    """Descarta el listado cacheado de las organizaciones (todos los periodos)."""
+    cache.delete_many([_summary_key(org, days) for org in set(organization_ids) for days in ZONE_SUMMARY_DAYS])
+
+
+@receiver(post_save, sender=Device)
+@receiver(post_delete, sender=Device)
+@receiver(post_save, sender=Zone)
+@receiver(post_delete, sender=Zone)
+def _zones_changed(sender, instance, **kwargs):
+    # Alta, baja o cambio de zona de un dispositivo; zona creada/renombrada/movida
+    invalidate_zone_summary(instance.organization_id)
@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Serve through this entry point (e.g. ``uvicorn ecoenergy.asgi:application``)
+so the live event stream (``/api/eventos/``) runs on the event loop instead
+of holding a worker thread per open connection.
 """
 
 import os
@@ -0,0 +1,225 @@
+# ecoenergy/routers.py
+#
+# ──────────────────────────────────────────────────────────────────────────────
+# Propósito del módulo
+# ──────────────────────────────────────────────────────────────────────────────
+# Enrutamiento entre bases de datos:
+#
+# ShardRouter
+# - Los modelos por tenant (Zone, Device, series temporales) van al shard de
+#   su organización (ver ecoenergy/sharding.py). El shard "default" conserva
+#   el esquema de siempre y deja decidir a los routers siguientes.
+#
+# TimeSeriesRouter
+# - Los modelos de series temporales (TIMESERIES_MODELS) viven en su propio
+#   alias (settings.TIMESERIES_DATABASE) para no competir por caché y locks con
+#   las tablas OLTP (usuarios, organizaciones, dispositivos).
+# - Sus FK hacia Device/AlertRule no tienen constraint en BD (db_constraint=False):
+#   los filtros cruzados se hacen por id (device_id__in=...), nunca con joins.
+# - Sin alias propio no decide nada: las lecturas siguen a ReplicaRouter. Con
+#   alias propio, sus lecturas usan settings.TIMESERIES_REPLICAS con las mismas
+#   reglas (@read_replica y fijación al primario).
+#
+# ReplicaRouter
+# - Solo las vistas marcadas con @read_replica (dashboard, listados,
+#   exportaciones, API de series) leen desde una réplica (settings.DATABASE_REPLICAS).
+# - Todo lo demás, y TODA escritura, va al primario ("default").
+# - "Lee tus propias escrituras": tras un POST/PUT/PATCH/DELETE el usuario queda
+#   fijado al primario por settings.REPLICA_PIN_SECONDS (cookie firmada por hora
+#   de expiración, ver ReplicaPinningMiddleware), para no ver datos con lag.
+# ──────────────────────────────────────────────────────────────────────────────
+
+import random
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+from .sharding import TENANT_MODELS, all_shards, current_shard, is_tenant_model, shard_for_organization
+
+PIN_COOKIE = "db_pin"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS", "TRACE")
+
+_replica_allowed = ContextVar("replica_allowed", default=False)
+_pinned_to_primary = ContextVar("pinned_to_primary", default=False)
+
+# Apps que nunca se leen desde réplica (la sesión se escribe en cada request)
+PRIMARY_ONLY_APPS = {"sessions"}
+
+# Modelos (app_label.model_name) que van a la base de series temporales
+TIMESERIES_MODELS = {
+    "devices.measurement",
+    "devices.alertevent",
+    "devices.quarantinedreading",
+    "devices.measurementrollup",
+    "devices.demandinterval",
+    "devices.demandpeak",
+    "devices.deviceutilization",
+    "devices.deviceforecast",
+    "devices.deviceanomalystate",
+}
+
+
+def timeseries_database():
+    """Alias configurado para series temporales ("default" si no hay uno propio)."""
+    alias = getattr(settings, "TIMESERIES_DATABASE", "default")
+    return alias if alias in settings.DATABASES else "default"
+
+
+def is_timeseries_model(model):
+    return model._meta.label_lower in TIMESERIES_MODELS
+
+
+def dedicated_timeseries_database():
+    """Alias propio de series temporales, o None si viven en "default"."""
+    alias = timeseries_database()
+    return None if alias == "default" else alias
+
+
+def replica_alias(replicas=None):
+    """
+    Alias de réplica a usar en este contexto (de `replicas`, por defecto
+    DATABASE_REPLICAS), o None si se debe leer del primario.
+    """
+    replicas = getattr(settings, "DATABASE_REPLICAS", []) if replicas is None else replicas
+    if not replicas or not _replica_allowed.get() or _pinned_to_primary.get():
+        return None
+    return random.choice(replicas)
+
+
+def read_replica(view_func):
+    """
+    Marca una vista de solo lectura: sus consultas GET pueden ir a una réplica.
+    Los POST a la misma vista (ej.: cambiar items por página) leen del primario.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        token = _replica_allowed.set(request.method in SAFE_METHODS)
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            _replica_allowed.reset(token)
+    return wrapper
+
+
+def _replica_aliases():
+    return {*getattr(settings, "DATABASE_REPLICAS", []), *getattr(settings, "TIMESERIES_REPLICAS", [])}
+
+
+class ShardRouter:
+    """Modelos por tenant al shard de su organización."""
+
+    def _shard(self, model, hints):
+        if not is_tenant_model(model):
+            return None
+        instance = hints.get("instance")
+        if instance is not None and is_tenant_model(type(instance)):
+            # _state.db puede ser "timeseries" o una réplica: solo sirve si es un shard
+            if instance._state.db in getattr(settings, "DATABASE_SHARDS", []):
+                alias = instance._state.db
+            elif getattr(instance, "organization_id", None) is not None:
+                alias = shard_for_organization(instance.organization_id)
+            else:
+                alias = current_shard()
+        else:
+            alias = current_shard()
+        # "default" sigue el enrutamiento normal (series temporales, réplicas)
+        return alias if alias not in (None, "default") else None
+
+    def db_for_read(self, model, **hints):
+        return self._shard(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._shard(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Tenant -> catálogo global (o entre modelos del mismo shard)
+        if is_tenant_model(type(obj1)) or is_tenant_model(type(obj2)):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Los shards solo llevan tablas por tenant
+        if db != "default" and db in all_shards():
+            return model_name is not None and f"{app_label}.{model_name}" in TENANT_MODELS
+        return None
+
+
+class TimeSeriesRouter:
+    """Envía lecturas y escrituras de series temporales a su propio alias."""
+
+    def db_for_read(self, model, **hints):
+        alias = dedicated_timeseries_database()
+        if alias is None or not is_timeseries_model(model):
+            return None
+        return replica_alias(getattr(settings, "TIMESERIES_REPLICAS", [])) or alias
+
+    def db_for_write(self, model, **hints):
+        if is_timeseries_model(model):
+            return dedicated_timeseries_database()
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Measurement -> Device (y similares) cruzan bases a propósito
+        if is_timeseries_model(type(obj1)) or is_timeseries_model(type(obj2)):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        alias = timeseries_database()
+        if alias == "default" or db in _replica_aliases():
+            return None
+        if model_name is not None and f"{app_label}.{model_name}" in TIMESERIES_MODELS:
+            return db == alias
+        # La base de series temporales no lleva tablas OLTP
+        return False if db == alias else None
+
+
+class ReplicaRouter:
+    """Lecturas a réplica (si el contexto lo permite), escrituras al primario."""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_ONLY_APPS:
+            return "default"
+        return replica_alias() or "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primario y réplicas contienen los mismos datos
+        pool = {"default", *getattr(settings, "DATABASE_REPLICAS", [])}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Las réplicas reciben el esquema por replicación, no por migrate
+        if db in _replica_aliases():
+            return False
+        return None
+
+
+class ReplicaPinningMiddleware:
+    """Fija al primario a quien acaba de escribir, durante REPLICA_PIN_SECONDS."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # Firmada: una cookie ausente, alterada o de otra SECRET_KEY no fija nada
+        pinned = float(request.get_signed_cookie(PIN_COOKIE, default=0, salt=PIN_COOKIE)) > time.time()
+        token = _pinned_to_primary.set(pinned)
+        try:
+            response = self.get_response(request)
+        finally:
+            _pinned_to_primary.reset(token)
+
+        if request.method not in SAFE_METHODS:
+            seconds = getattr(settings, "REPLICA_PIN_SECONDS", 5)
+            response.set_signed_cookie(
+                PIN_COOKIE, str(time.time() + seconds), salt=PIN_COOKIE,
+                max_age=seconds, httponly=True, samesite="Lax",
+            )
+        return response
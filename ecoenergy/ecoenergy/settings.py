@@ -2,12 +2,15 @@ import os
 from dotenv import load_dotenv
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 load_dotenv(BASE_DIR / ".env")
 
 # SECURITY WARNING: keep the secret key used in production secret!
 #SECRET_KEY = 'django-insecure-zhb&!^*d%qlnzmw2mxn+7%lp(n4a73i20p7d+f2hk_rdcyd4@t'
+SECRET_KEY = os.getenv("DJANGO_SECRET_KEY")
 
 #======SESIONES======#
 
@@ -47,6 +50,12 @@ handler400 = 'organizations.views.errors'
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
+if not SECRET_KEY:
+    if not DEBUG:
+        raise ImproperlyConfigured("Falta DJANGO_SECRET_KEY: copie example.env a .env y defina una clave propia.")
+    # Solo desarrollo: sin .env el servidor local y `manage.py test` corren con una clave insegura
+    SECRET_KEY = 'django-insecure-zhb&!^*d%qlnzmw2mxn+7%lp(n4a73i20p7d+f2hk_rdcyd4@t'
+
 ALLOWED_HOSTS = ["*"]
 
 ENGINE = os.getenv("DB_ENGINE")
@@ -74,6 +83,148 @@ else:
         }
     }
 
+#======REPLICAS DE LECTURA======#
+# MySQL:  DB_REPLICA_HOSTS=10.0.0.2,10.0.0.3 (mismas credenciales que el primario)
+# SQLite: DB_REPLICA_NAMES=db_replica.sqlite3 (copia local, ver sync_sqlite_replica)
+DATABASE_REPLICAS = []
+if ENGINE == "mysql":
+    _replicas = {f"replica{i}": {**DATABASES["default"], "HOST": host.strip()}
+                 for i, host in enumerate(os.getenv("DB_REPLICA_HOSTS", "").split(","), 1) if host.strip()}
+else:
+    _replicas = {f"replica{i}": {**DATABASES["default"], "NAME": BASE_DIR / name.strip()}
+                 for i, name in enumerate(os.getenv("DB_REPLICA_NAMES", "").split(","), 1) if name.strip()}
+for _alias, _config in _replicas.items():
+    _config["TEST"] = {"MIRROR": "default"}
+    DATABASES[_alias] = _config
+    DATABASE_REPLICAS.append(_alias)
+
+#======SERIES TEMPORALES======#
+# Measurement / AlertEvent / rollups en su propia BD (opcional).
+# MySQL:  DB_TS_NAME + DB_TS_HOST/DB_TS_PORT/DB_TS_USER/DB_TS_PASSWORD (por defecto las del primario)
+# SQLite: DB_TS_NAME=db_timeseries.sqlite3
+# Migrar con: python manage.py migrate --database=timeseries
+TIMESERIES_DATABASE = "default"
+if os.getenv("DB_TS_NAME"):
+    if ENGINE == "mysql":
+        DATABASES["timeseries"] = {
+            **DATABASES["default"],
+            "NAME": os.getenv("DB_TS_NAME"),
+            "HOST": os.getenv("DB_TS_HOST", DATABASES["default"]["HOST"]),
+            "PORT": os.getenv("DB_TS_PORT", DATABASES["default"]["PORT"]),
+            "USER": os.getenv("DB_TS_USER", DATABASES["default"]["USER"]),
+            "PASSWORD": os.getenv("DB_TS_PASSWORD", DATABASES["default"]["PASSWORD"]),
+            # Las migraciones antiguas declaran FK hacia device/alert_rule, que no
+            # existen en esta BD; 0007 las elimina (db_constraint=False).
+            "OPTIONS": {
+                "charset": "utf8mb4",
+                "init_command": "SET sql_mode='STRICT_TRANS_TABLES', foreign_key_checks=0",
+            },
+        }
+    else:
+        DATABASES["timeseries"] = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / os.getenv("DB_TS_NAME"),
+        }
+    TIMESERIES_DATABASE = "timeseries"
+
+# Réplicas de la BD de series temporales (mismas reglas que DATABASE_REPLICAS):
+# MySQL:  DB_TS_REPLICA_HOSTS=10.0.0.4   SQLite: DB_TS_REPLICA_NAMES=db_timeseries_replica.sqlite3
+TIMESERIES_REPLICAS = []
+if TIMESERIES_DATABASE != "default":
+    if ENGINE == "mysql":
+        _replicas = {f"timeseries_replica{i}": {**DATABASES["timeseries"], "HOST": host.strip()}
+                     for i, host in enumerate(os.getenv("DB_TS_REPLICA_HOSTS", "").split(","), 1) if host.strip()}
+    else:
+        _replicas = {f"timeseries_replica{i}": {**DATABASES["timeseries"], "NAME": BASE_DIR / name.strip()}
+                     for i, name in enumerate(os.getenv("DB_TS_REPLICA_NAMES", "").split(","), 1) if name.strip()}
+    for _alias, _config in _replicas.items():
+        _config["TEST"] = {"MIRROR": "timeseries"}
+        DATABASES[_alias] = _config
+        TIMESERIES_REPLICAS.append(_alias)
+
+#======SHARDS POR ORGANIZACION======#
+# Zone / Device / series temporales de cada organización en su propio shard
+# (ver ecoenergy/sharding.py). Catálogo, usuarios y Organization quedan en "default".
+# MySQL:  DB_SHARD_HOSTS=shard1=10.0.0.5,shard2=10.0.0.6 (mismas credenciales y NAME)
+# SQLite: DB_SHARD_NAMES=shard1=db_shard1.sqlite3
+# Mapa:   DB_SHARD_MAP=12:shard1,15:shard1,31:shard2 (organization_id:alias)
+# Migrar con: python manage.py migrate --database=shard1
+DATABASE_SHARDS = []
+_shards = os.getenv("DB_SHARD_HOSTS" if ENGINE == "mysql" else "DB_SHARD_NAMES", "")
+for _entry in filter(None, (e.strip() for e in _shards.split(","))):
+    _alias, _value = (p.strip() for p in _entry.split("=", 1))
+    if ENGINE == "mysql":
+        DATABASES[_alias] = {**DATABASES["default"], "HOST": _value, "OPTIONS": dict(DATABASES["default"]["OPTIONS"])}
+    else:
+        DATABASES[_alias] = {**DATABASES["default"], "NAME": BASE_DIR / _value}
+    DATABASE_SHARDS.append(_alias)
+
+SHARD_MAP = {}
+for _entry in filter(None, (e.strip() for e in os.getenv("DB_SHARD_MAP", "").split(","))):
+    _org, _alias = (p.strip() for p in _entry.split(":", 1))
+    SHARD_MAP[int(_org)] = _alias
+
+# Ids únicos entre shards: cada uno numera con un offset distinto (solo MySQL)
+SHARD_ID_STRIDE = 16
+if ENGINE == "mysql" and DATABASE_SHARDS:
+    for _offset, _alias in enumerate(["default", *DATABASE_SHARDS], 1):
+        DATABASES[_alias]["OPTIONS"]["init_command"] += (
+            f", auto_increment_increment={SHARD_ID_STRIDE}, auto_increment_offset={_offset}"
+        )
+
+#======SQLITE (PERFIL DE UN SOLO NODO)======#
+# WAL permite lectores concurrentes con un escritor; synchronous=NORMAL hace
+# fsync solo en checkpoints; busy_timeout espera el lock en vez de fallar con
+# "database is locked". La ingesta pasa por un único hilo escritor que agrupa
+# lotes en una transacción (devices/writer.py).
+SQLITE_TUNED = os.getenv("DB_SQLITE_TUNED", "1") == "1"
+SQLITE_OPTIONS = {
+    "init_command": (
+        "PRAGMA journal_mode=WAL;"
+        "PRAGMA synchronous=NORMAL;"
+        "PRAGMA mmap_size=268435456;"     # 256 MB
+        "PRAGMA cache_size=-65536;"       # 64 MB (negativo = KiB)
+        "PRAGMA busy_timeout=5000;"
+        "PRAGMA temp_store=MEMORY;"
+    ),
+    "transaction_mode": "IMMEDIATE",      # toma el lock de escritura al iniciar, sin deadlocks de upgrade
+    "timeout": 5,
+}
+if SQLITE_TUNED:
+    for _config in DATABASES.values():
+        if _config["ENGINE"] == "django.db.backends.sqlite3":
+            _config.setdefault("OPTIONS", {}).update(SQLITE_OPTIONS)
+
+INGESTION_WRITER_ENABLED = os.getenv(
+    "INGESTION_WRITER", "1" if ENGINE != "mysql" else "0"
+) == "1"
+
+DATABASE_ROUTERS = [
+    "ecoenergy.routers.ShardRouter",
+    "ecoenergy.routers.TimeSeriesRouter",
+    "ecoenergy.routers.ReplicaRouter",
+]
+
+# Segundos que un usuario lee del primario después de escribir (lee sus propias escrituras)
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", "5"))
+
+#======CACHE======#
+# Por defecto en memoria del proceso. Con varios workers conviene una caché
+# compartida para que las invalidaciones por tenant (organizations/cache.py)
+# lleguen a todos, ej.: CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+#                       CACHE_LOCATION=redis://127.0.0.1:6379/1
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", "ecoenergy"),
+    }
+}
+
+#======ANOMALÍAS======#
+# Puntaje (desviaciones estándar respecto del consumo habitual de esa hora de
+# la semana) desde el cual la ingesta abre una alerta de consumo anómalo
+ANOMALY_SCORE_THRESHOLD = float(os.getenv("ANOMALY_SCORE_THRESHOLD", "4"))
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -94,6 +245,8 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'ecoenergy.routers.ReplicaPinningMiddleware',
+    'ecoenergy.sharding.ShardMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -117,17 +270,6 @@ TEMPLATES = [
 WSGI_APPLICATION = 'ecoenergy.wsgi.application'
 
 
-# Database
-# https://docs.djangoproject.com/en/5.2/ref/settings/#databases
-
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
-}
-
-
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -0,0 +1,203 @@
+# ecoenergy/sharding.py
+#
+# ──────────────────────────────────────────────────────────────────────────────
+# Propósito del módulo
+# ──────────────────────────────────────────────────────────────────────────────
+# Sharding horizontal de los datos de cada cliente (tenant) por organización.
+#
+# - settings.SHARD_MAP: {organization_id: alias}. Las organizaciones que no
+#   están en el mapa viven en "default" (el esquema de siempre).
+# - Modelos por tenant (TENANT_MODELS): Zone, Device y las series temporales.
+#   Van al shard de su organización (ver ShardRouter en ecoenergy/routers.py).
+# - Catálogo global (Category, Product, AlertRule...), usuarios, sesiones y
+#   Organization quedan en "default". Las FK tenant -> global no tienen
+#   constraint en BD (db_constraint=False): se cargan con prefetch_related,
+#   nunca con joins.
+#
+# El shard "actual" es un ContextVar: ShardMiddleware lo fija con la
+# organización del usuario, y use_shard() / use_organization() lo fijan en
+# comandos, hilos o vistas del Encargado. Las vistas que cruzan organizaciones
+# usan fan_out() (una consulta por shard, en paralelo) y MergedResults
+# (mezcla ordenada + paginación).
+#
+# IMPORTANTE: los ids de Zone/Device deben ser únicos entre shards (en MySQL
+# settings.py asigna auto_increment_offset distinto a cada shard), porque las
+# URLs del Encargado solo llevan el pk.
+# ──────────────────────────────────────────────────────────────────────────────
+
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from itertools import islice
+from operator import attrgetter
+
+from django.conf import settings
+from django.db import connections
+
+# Modelos (app_label.model_name) que se reparten por organización
+TENANT_MODELS = {
+    "devices.zone",
+    "devices.device",
+    "devices.measurement",
+    "devices.alertevent",
+    "devices.quarantinedreading",
+    "devices.measurementrollup",
+    "devices.demandinterval",
+    "devices.demandpeak",
+    "devices.deviceutilization",
+    "devices.deviceforecast",
+    "devices.deviceanomalystate",
+    "devices.standbywaste",
+}
+
+_current_shard = ContextVar("current_shard", default=None)
+
+
+def is_tenant_model(model):
+    return model._meta.label_lower in TENANT_MODELS
+
+
+def sharding_enabled():
+    return bool(getattr(settings, "SHARD_MAP", None))
+
+
+def all_shards():
+    """Aliases que contienen datos de tenants ("default" siempre incluido)."""
+    return ["default", *getattr(settings, "DATABASE_SHARDS", [])]
+
+
+def shard_for_organization(organization_id):
+    return getattr(settings, "SHARD_MAP", {}).get(organization_id, "default")
+
+
+def current_shard():
+    return _current_shard.get()
+
+
+@contextmanager
+def use_shard(alias):
+    """Dirige las consultas de modelos por tenant a `alias` dentro del bloque."""
+    token = _current_shard.set(alias)
+    try:
+        yield alias
+    finally:
+        _current_shard.reset(token)
+
+
+def use_organization(organization_id):
+    return use_shard(shard_for_organization(organization_id))
+
+
+def _run_on_shard(alias, fn):
+    with use_shard(alias):
+        try:
+            return fn()
+        finally:
+            connections.close_all()
+
+
+def fan_out(fn, shards=None):
+    """
+    Ejecuta fn() una vez por shard, en paralelo, y retorna la lista de
+    resultados (en el orden de los shards). Sin shards configurados corre
+    fn() una sola vez en el hilo actual.
+    """
+    shards = all_shards() if shards is None else shards
+    if len(shards) == 1:
+        with use_shard(shards[0]):
+            return [fn()]
+    with ThreadPoolExecutor(max_workers=len(shards), thread_name_prefix="shard") as pool:
+        return list(pool.map(lambda alias: _run_on_shard(alias, fn), shards))
+
+
+def locate_shard(model, pk):
+    """Shard que contiene el registro `pk` de un modelo por tenant (o None)."""
+    found = fan_out(lambda: model._base_manager.filter(pk=pk).exists())
+    for alias, exists in zip(all_shards(), found):
+        if exists:
+            return alias
+    return None
+
+
+def object_shard(model, kwarg="pk"):
+    """
+    Para vistas del Encargado sobre un objeto de cualquier organización:
+    ubica el shard del objeto por su pk y ejecuta la vista dentro de él.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not sharding_enabled() or current_shard() is not None:
+                return view_func(request, *args, **kwargs)
+            with use_shard(locate_shard(model, kwargs[kwarg]) or "default"):
+                return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _sort_key(field):
+    """Clave de orden equivalente a la de la BD (NULL primero en orden ascendente)."""
+    getter = attrgetter(field.replace("__", "."))
+
+    def key(obj):
+        value = getter(obj)
+        return (value is not None, value, obj.pk)
+    return key
+
+
+class MergedResults:
+    """
+    Resultado de una consulta repartida en shards, paginable con Paginator.
+
+    build() arma el queryset (ya filtrado) y se evalúa en cada shard ordenado
+    por `order`. count() suma los conteos; un corte [a:b] trae los primeros b
+    de cada shard y los mezcla (heapq.merge) respetando el orden.
+    """
+
+    def __init__(self, build, order):
+        self.build = build
+        self.reverse = order.startswith("-")
+        self.field = order.lstrip("-")
+        self.key = _sort_key(self.field)
+        self._count = None
+
+    def _ordered(self):
+        prefix = "-" if self.reverse else ""
+        return self.build().order_by(f"{prefix}{self.field}", f"{prefix}pk")
+
+    def count(self):
+        if self._count is None:
+            self._count = sum(fan_out(lambda: self._ordered().count()))
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return self[item:item + 1][0]
+        start, stop = item.start or 0, item.stop
+        if stop is None:
+            stop = self.count()
+        parts = fan_out(lambda: list(self._ordered()[:stop]))
+        merged = heapq.merge(*parts, key=self.key, reverse=self.reverse)
+        return list(islice(merged, start, stop))
+
+
+class ShardMiddleware:
+    """Fija el shard de la request según la organización del usuario."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        alias = None
+        if sharding_enabled() and request.user.is_authenticated and hasattr(request.user, "usuario"):
+            alias = shard_for_organization(request.user.usuario.organization_id)
+        token = _current_shard.set(alias)
+        try:
+            return self.get_response(request)
+        finally:
+            _current_shard.reset(token)
@@ -1,8 +1,8 @@
 
 from django.contrib import admin
 from django.urls import path, include
-from devices.views import dashboard, lista_productos, editar_producto, eliminar_producto, crear_producto, lista_dispositivos, editar_dispositivo, crear_dispositivo, eliminar_dispositivo
-from organizations.views import register,profile, usuario_list, errors, editar_perfil, eliminar_usuario
+from devices.views import dashboard, lista_productos, editar_producto, eliminar_producto, crear_producto, lista_dispositivos, editar_dispositivo, crear_dispositivo, eliminar_dispositivo, lista_zonas, crear_zona, editar_zona, eliminar_zona, acciones_dispositivos, importar_productos, importar_dispositivos, descargar_errores_importacion, exportar_mediciones, exportar_alertas, factura_organizacion, oportunidades_ahorro, utilizacion_capacidad, api_series, api_heatmap, api_ingesta, stream_eventos
+from organizations.views import register,profile, usuario_list, errors, editar_perfil, eliminar_usuario, cambiar_estado_organizacion
 from django.contrib.auth.views import LoginView
 from django.views.generic import RedirectView
 
@@ -20,18 +20,46 @@ urlpatterns = [
     path('lista_usuarios/', usuario_list, name='lista_usuarios'),
     path('editar_perfil/<int:user_id>/', editar_perfil, name='editar_perfil'),
     path('accounts/<int:pk>/eliminar/', eliminar_usuario, name='eliminar_usuario'),
+    path('organizaciones/<int:organization_id>/estado/', cambiar_estado_organizacion, name='cambiar_estado_organizacion'),
 
     #======PRODUCTOS======#
     path('productos/', lista_productos, name='lista_productos'),
     path('productos/crear/', crear_producto, name='crear_producto'),
+    path('productos/importar/', importar_productos, name='importar_productos'),
     path('productos/<int:pk>/editar/', editar_producto, name='editar_producto'),
     path('productos/<int:pk>/eliminar/', eliminar_producto, name='eliminar_producto'),
 
     #=====DISPOSITIVOS=====#
     path('dispositivos/', lista_dispositivos, name='lista_dispositivos'),
     path('dispositivos/crear/', crear_dispositivo, name='crear_dispositivo'),
+    path('dispositivos/importar/', importar_dispositivos, name='importar_dispositivos'),
+    path('dispositivos/acciones/', acciones_dispositivos, name='acciones_dispositivos'),
     path('dispositivos/<int:pk>/editar/', editar_dispositivo, name='editar_dispositivo'),
     path('dispositivos/<int:pk>/eliminar/',eliminar_dispositivo, name='eliminar_dispositivo'),
+
+    #=====ZONAS=====#
+    path('zonas/', lista_zonas, name='lista_zonas'),
+    path('zonas/crear/', crear_zona, name='crear_zona'),
+    path('zonas/<int:pk>/editar/', editar_zona, name='editar_zona'),
+    path('zonas/<int:pk>/eliminar/', eliminar_zona, name='eliminar_zona'),
+
+    #=====IMPORTACIONES=====#
+    path('importar/errores/', descargar_errores_importacion, name='descargar_errores_importacion'),
+
+    #=====EXPORTACIONES=====#
+    path('exportar/mediciones/', exportar_mediciones, name='exportar_mediciones'),
+    path('exportar/alertas/', exportar_alertas, name='exportar_alertas'),
+
+    #=====FACTURACION=====#
+    path('facturacion/', factura_organizacion, name='factura_organizacion'),
+    path('ahorro/', oportunidades_ahorro, name='oportunidades_ahorro'),
+    path('utilizacion/', utilizacion_capacidad, name='utilizacion_capacidad'),
+
+    #=====API=====#
+    path('api/series/', api_series, name='api_series'),
+    path('api/heatmap/', api_heatmap, name='api_heatmap'),
+    path('api/ingesta/', api_ingesta, name='api_ingesta'),
+    path('api/eventos/', stream_eventos, name='stream_eventos'),
 ]
 handler404 = 'organizations.views.errors'
 handler403 = 'organizations.views.errors' 
@@ -1,7 +1,33 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 
 # Register your models here.
-from .models import Organization, Usuario
+from .lifecycle import set_organization_active
+from .models import BackgroundJob, Organization, Usuario
 
-admin.site.register(Organization)
-admin.site.register(Usuario)
\ No newline at end of file
+
+@admin.register(Organization)
+class OrganizationAdmin(admin.ModelAdmin):
+    list_display = ("name", "is_active", "deactivated_at")
+    actions = ["deactivate", "reactivate"]
+
+    def _set_active(self, request, queryset, active):
+        jobs = [job for org in queryset if (job := set_organization_active(org, active))]
+        self.message_user(request, f"{len(jobs)} background jobs queued (run_jobs).", messages.SUCCESS)
+
+    @admin.action(description="Deactivate (users, zones and devices in background)")
+    def deactivate(self, request, queryset):
+        self._set_active(request, queryset, False)
+
+    @admin.action(description="Reactivate (users, zones and devices in background)")
+    def reactivate(self, request, queryset):
+        self._set_active(request, queryset, True)
+
+
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "kind", "status", "progress", "created_at", "finished_at")
+    list_filter = ("kind", "status")
+    readonly_fields = ("kind", "payload", "result", "status", "progress", "error", "created_at", "started_at", "finished_at")
+
+
+admin.site.register(Usuario)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class OrganizationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'organizations'
+
+    def ready(self):
+        # Registra los handlers de BackgroundJob (organizations/jobs.py)
+        from . import lifecycle  # noqa: F401
@@ -0,0 +1,61 @@
+# organizations/cache.py
+#
+# ──────────────────────────────────────────────────────────────────────────────
+# Propósito del módulo
+# ──────────────────────────────────────────────────────────────────────────────
+# Claves de caché por organización (tenant) con "versión":
+# - tenant_cache_key(org_id, "nombre", ...) arma la clave incluyendo la versión
+#   vigente de la organización.
+# - invalidate_tenant(org_id) sube la versión: TODAS las entradas anteriores
+#   de ese tenant quedan inalcanzables de una vez (y expiran solas), sin tener
+#   que conocer ni recorrer sus claves.
+# Toda caché que guarde datos de un tenant debe armar su clave con esta función.
+# ──────────────────────────────────────────────────────────────────────────────
+
+import time
+
+from django.core.cache import cache
+
+from .models import Organization
+
+# Organizaciones pausadas (inactivas): la ingesta las consulta en cada lote
+PAUSED_ORGANIZATIONS_KEY = "organizations:paused"
+PAUSED_ORGANIZATIONS_TIMEOUT = 300
+
+
+def _version_key(organization_id):
+    return f"tenant:{organization_id}:version"
+
+
+def _new_version():
+    # Marca de tiempo: aunque la clave de versión se pierda (eviction), la
+    # siguiente nunca coincide con una versión usada antes
+    return time.time_ns()
+
+
+def tenant_version(organization_id):
+    version = cache.get(_version_key(organization_id))
+    if version is None:
+        cache.add(_version_key(organization_id), _new_version(), timeout=None)
+        version = cache.get(_version_key(organization_id))
+    return version
+
+
+def tenant_cache_key(organization_id, name, *parts):
+    suffix = ":".join(str(p) for p in parts)
+    return f"tenant:{organization_id}:v{tenant_version(organization_id)}:{name}:{suffix}"
+
+
+def invalidate_tenant(organization_id):
+    """Descarta todo lo cacheado para la organización."""
+    cache.set(_version_key(organization_id), _new_version(), timeout=None)
+    cache.delete(PAUSED_ORGANIZATIONS_KEY)
+
+
+def paused_organization_ids():
+    """Ids de organizaciones inactivas (cacheado; se invalida al cambiar su estado)."""
+    paused = cache.get(PAUSED_ORGANIZATIONS_KEY)
+    if paused is None:
+        paused = frozenset(Organization.objects.filter(is_active=False).values_list("id", flat=True))
+        cache.set(PAUSED_ORGANIZATIONS_KEY, paused, PAUSED_ORGANIZATIONS_TIMEOUT)
+    return paused
@@ -0,0 +1,86 @@
+# organizations/jobs.py
+#
+# ──────────────────────────────────────────────────────────────────────────────
+# Propósito del módulo
+# ──────────────────────────────────────────────────────────────────────────────
+# Ejecutor mínimo de trabajos en segundo plano, respaldado por la tabla
+# BackgroundJob (sin dependencias externas):
+# - @job("nombre") registra un handler(job) -> dict (se guarda en job.result).
+# - enqueue("nombre", **payload) crea el trabajo PENDING.
+# - run_pending() / `manage.py run_jobs` los ejecutan en orden de creación.
+#
+# El "claim" es un UPDATE condicional (status PENDING -> RUNNING): si hay
+# varios workers, solo uno gana cada trabajo, sin SELECT ... FOR UPDATE.
+# Los handlers deben ser idempotentes: un trabajo FAILED se puede reencolar.
+# ──────────────────────────────────────────────────────────────────────────────
+
+import logging
+import traceback
+
+from django.utils import timezone
+
+from .models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+JOB_HANDLERS = {}
+
+
+def job(kind):
+    """Registra el handler de un tipo de trabajo."""
+    def decorator(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(kind, **payload):
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Tipo de trabajo no registrado: {kind}")
+    return BackgroundJob.objects.create(kind=kind, payload=payload)
+
+
+def report_progress(job_obj, processed):
+    """Suma filas procesadas al trabajo (un UPDATE, visible mientras corre)."""
+    job_obj.progress += processed
+    BackgroundJob.objects.filter(pk=job_obj.pk).update(progress=job_obj.progress)
+
+
+def claim(job_obj):
+    now = timezone.now()
+    claimed = BackgroundJob.objects.filter(pk=job_obj.pk, status=BackgroundJob.Status.PENDING).update(
+        status=BackgroundJob.Status.RUNNING, started_at=now
+    )
+    if claimed:
+        job_obj.status, job_obj.started_at = BackgroundJob.Status.RUNNING, now
+    return bool(claimed)
+
+
+def run_job(job_obj):
+    """Ejecuta un trabajo ya reclamado y guarda su resultado o error."""
+    handler = JOB_HANDLERS.get(job_obj.kind)
+    try:
+        if handler is None:
+            raise ValueError(f"Tipo de trabajo no registrado: {job_obj.kind}")
+        job_obj.result = handler(job_obj) or {}
+        job_obj.status = BackgroundJob.Status.DONE
+    except Exception:
+        logger.exception("Background job %s failed", job_obj.pk)
+        job_obj.error = traceback.format_exc()
+        job_obj.status = BackgroundJob.Status.FAILED
+    job_obj.finished_at = timezone.now()
+    job_obj.save(update_fields=["result", "status", "error", "finished_at", "progress"])
+    return job_obj
+
+
+def run_pending(limit=None):
+    """Ejecuta los trabajos PENDING (en orden). Retorna la cantidad ejecutada."""
+    done = 0
+    while limit is None or done < limit:
+        job_obj = BackgroundJob.objects.filter(status=BackgroundJob.Status.PENDING).order_by("created_at", "pk").first()
+        if job_obj is None:
+            break
+        if claim(job_obj):
+            run_job(job_obj)
+            done += 1
+    return done
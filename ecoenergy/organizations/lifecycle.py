@@ -0,0 +1,132 @@
+# organizations/lifecycle.py
+#
+# ──────────────────────────────────────────────────────────────────────────────
+# Propósito del módulo
+# ──────────────────────────────────────────────────────────────────────────────
+# Desactivación / reactivación de una organización (tenant) completa.
+#
+# set_organization_active() cambia Organization.is_active al instante (la
+# ingesta deja de aceptar lecturas del tenant, ver paused_organization_ids) y
+# encola la cascada como BackgroundJob (organizations/jobs.py):
+# - User.is_active, Device.status y Zone.status se actualizan con UPDATE por
+#   bloques de CASCADE_CHUNK_SIZE ids, cada bloque en su propia transacción
+#   (locks cortos aunque el tenant tenga decenas de miles de dispositivos).
+# - Devices/zonas desactivados por la cascada quedan marcados con
+#   deleted_at = Organization.deactivated_at; la reactivación restaura SOLO
+#   esos (no los que ya estaban dados de baja individualmente). Lo mismo con
+#   los usuarios: se reactivan los ids que desactivó la cascada.
+# - Al terminar se invalida toda la caché del tenant (organizations/cache.py).
+# ──────────────────────────────────────────────────────────────────────────────
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from devices.models import Device, Zone
+from ecoenergy.sharding import use_organization
+
+from .cache import invalidate_tenant
+from .jobs import enqueue, job, report_progress
+from .models import BackgroundJob, Organization
+
+CASCADE_CHUNK_SIZE = 500
+
+DEACTIVATE_JOB = "deactivate_organization"
+REACTIVATE_JOB = "reactivate_organization"
+
+
+def set_organization_active(organization, active):
+    """
+    Activa o desactiva la organización y encola la cascada.
+    Retorna el BackgroundJob creado (o None si ya estaba en ese estado).
+    """
+    if organization.is_active == active:
+        return None
+
+    with transaction.atomic():
+        if active:
+            organization.is_active = True
+            organization.save(update_fields=["is_active"])
+            job_obj = enqueue(
+                REACTIVATE_JOB, organization_id=organization.pk,
+                deactivated_at=organization.deactivated_at.isoformat() if organization.deactivated_at else None,
+            )
+        else:
+            organization.is_active = False
+            organization.deactivated_at = timezone.now()
+            organization.save(update_fields=["is_active", "deactivated_at"])
+            job_obj = enqueue(DEACTIVATE_JOB, organization_id=organization.pk)
+        # Pausa/reanuda la ingesta apenas se confirme el cambio
+        transaction.on_commit(lambda: invalidate_tenant(organization.pk))
+    return job_obj
+
+
+def _chunked_update(queryset, changes, job_obj):
+    """
+    Aplica `changes` en bloques de ids. `queryset` debe dejar de incluir las
+    filas ya actualizadas (filtra por el estado anterior), así el ciclo termina
+    y el trabajo se puede reintentar sin repetir trabajo.
+    """
+    total = 0
+    while True:
+        ids = list(queryset.values_list("pk", flat=True)[:CASCADE_CHUNK_SIZE])
+        if not ids:
+            return total
+        with transaction.atomic(using=queryset.db):
+            updated = queryset.filter(pk__in=ids).update(**changes)
+        total += updated
+        report_progress(job_obj, updated)
+
+
+@job(DEACTIVATE_JOB)
+def deactivate_organization(job_obj):
+    organization = Organization.objects.get(pk=job_obj.payload["organization_id"])
+    if organization.is_active:
+        return {"skipped": "La organización fue reactivada antes de ejecutar el trabajo"}
+    marker = organization.deactivated_at
+
+    user_ids = list(User.objects.filter(usuario__organization=organization, is_active=True).values_list("pk", flat=True))
+    users = _chunked_update(User.objects.filter(pk__in=user_ids, is_active=True), {"is_active": False}, job_obj)
+
+    changes = {"status": "INACTIVE", "deleted_at": marker, "updated_at": timezone.now()}
+    with use_organization(organization.pk):
+        devices = _chunked_update(Device.objects.filter(organization_id=organization.pk, status="ACTIVE"), changes, job_obj)
+        zones = _chunked_update(Zone.objects.filter(organization_id=organization.pk, status="ACTIVE"), changes, job_obj)
+
+    invalidate_tenant(organization.pk)
+    return {"users": users, "devices": devices, "zones": zones, "user_ids": user_ids}
+
+
+@job(REACTIVATE_JOB)
+def reactivate_organization(job_obj):
+    organization = Organization.objects.get(pk=job_obj.payload["organization_id"])
+    if not organization.is_active:
+        return {"skipped": "La organización fue desactivada antes de ejecutar el trabajo"}
+
+    # Usuarios que desactivó la última cascada (no los dados de baja a mano)
+    previous = (
+        BackgroundJob.objects.filter(kind=DEACTIVATE_JOB, status=BackgroundJob.Status.DONE,
+                                     payload__organization_id=organization.pk)
+        .order_by("-finished_at").first()
+    )
+    user_ids = previous.result.get("user_ids", []) if previous else []
+    users = _chunked_update(
+        User.objects.filter(pk__in=user_ids, usuario__organization=organization, is_active=False),
+        {"is_active": True}, job_obj,
+    )
+
+    devices = zones = 0
+    marker = parse_datetime(job_obj.payload["deactivated_at"]) if job_obj.payload.get("deactivated_at") else None
+    if marker is not None:
+        changes = {"status": "ACTIVE", "deleted_at": None, "updated_at": timezone.now()}
+        with use_organization(organization.pk):
+            zones = _chunked_update(
+                Zone.objects.filter(organization_id=organization.pk, status="INACTIVE", deleted_at=marker), changes, job_obj
+            )
+            devices = _chunked_update(
+                Device.objects.filter(organization_id=organization.pk, status="INACTIVE", deleted_at=marker), changes, job_obj
+            )
+
+    invalidate_tenant(organization.pk)
+    return {"users": users, "devices": devices, "zones": zones}
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from organizations.jobs import run_pending
+
+
+class Command(BaseCommand):
+    help = 'Run pending background jobs (organization deactivation cascade, ...)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Run the pending jobs and exit instead of polling.')
+        parser.add_argument('--sleep', type=float, default=5,
+                            help='Seconds between polls when idle (default: 5).')
+
+    def handle(self, *args, **options):
+        while True:
+            done = run_pending()
+            if done:
+                self.stdout.write(self.style.SUCCESS(f'Background jobs executed: {done}'))
+            if options['once']:
+                if not done:
+                    self.stdout.write('No pending background jobs')
+                return
+            time.sleep(options['sleep'])
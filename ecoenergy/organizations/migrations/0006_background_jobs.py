@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0005_organization_is_active_alter_usuario_phone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='organization',
+            name='deactivated_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='When the last deactivation cascade started; marks the devices/zones it deactivated', null=True),
+        ),
+        migrations.CreateModel(
+            name='BackgroundJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(help_text='Registered handler name', max_length=60)),
+                ('payload', models.JSONField(blank=True, default=dict, help_text='Handler arguments')),
+                ('result', models.JSONField(blank=True, default=dict, help_text='Handler output')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='PENDING', max_length=10)),
+                ('progress', models.PositiveIntegerField(default=0, help_text='Rows processed so far')),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Background job',
+                'verbose_name_plural': 'Background jobs',
+                'db_table': 'background_job',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='background__status_7606a1_idx')],
+            },
+        ),
+    ]
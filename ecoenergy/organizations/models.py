@@ -6,6 +6,10 @@ from django.core.exceptions import ValidationError
 class Organization(models.Model):
     name = models.CharField(max_length=100)
     is_active = models.BooleanField(default=True, help_text="Whether the organization is active")
+    deactivated_at = models.DateTimeField(
+        null=True, blank=True, editable=False,
+        help_text="When the last deactivation cascade started; marks the devices/zones it deactivated"
+    )
     
     def __str__(self):
         return self.name
@@ -69,4 +73,35 @@ class Usuario(models.Model):
     
     class Meta:
         verbose_name = "Usuario"
-        verbose_name_plural = "Usuarios"
\ No newline at end of file
+        verbose_name_plural = "Usuarios"
+
+
+class BackgroundJob(models.Model):
+    """Unit of background work executed by `manage.py run_jobs` (see organizations/jobs.py)."""
+
+    class Status(models.TextChoices):
+        PENDING = "PENDING", "Pending"
+        RUNNING = "RUNNING", "Running"
+        DONE = "DONE", "Done"
+        FAILED = "FAILED", "Failed"
+
+    kind = models.CharField(max_length=60, help_text="Registered handler name")
+    payload = models.JSONField(default=dict, blank=True, help_text="Handler arguments")
+    result = models.JSONField(default=dict, blank=True, help_text="Handler output")
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    progress = models.PositiveIntegerField(default=0, help_text="Rows processed so far")
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+    class Meta:
+        db_table = "background_job"
+        ordering = ["created_at"]
+        indexes = [models.Index(fields=["status", "created_at"])]
+        verbose_name = "Background job"
+        verbose_name_plural = "Background jobs"
+
@@ -1,3 +1,157 @@
-from django.test import TestCase
+# organizations/tests.py
+#
+# ──────────────────────────────────────────────────────────────────────────────
+# Propósito del módulo
+# ──────────────────────────────────────────────────────────────────────────────
+# Pruebas de la app organizations: ciclo de vida de una organización (cascada
+# en segundo plano), el ejecutor de BackgroundJob y la caché por tenant.
+# ──────────────────────────────────────────────────────────────────────────────
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from devices.ingestion import ingest_readings
+from devices.models import Category, Device, Product, Zone
+
+from .cache import invalidate_tenant, paused_organization_ids, tenant_cache_key
+from .jobs import claim, enqueue, job, run_pending
+from .lifecycle import DEACTIVATE_JOB, set_organization_active
+from .models import BackgroundJob, Organization, Usuario
+
+
+@job("test_failing_job")
+def failing_job(job_obj):
+    raise RuntimeError("falla a propósito")
+
+
+@override_settings(INGESTION_WRITER_ENABLED=False)
+class OrganizationLifecycleTests(TestCase):
+    """Desactivar y reactivar una organización: pausa de ingesta y cascada en segundo plano."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.org = Organization.objects.create(name="Org A")
+        cls.other = Organization.objects.create(name="Org B")
+        cls.product = Product.objects.create(name="Split", category=Category.objects.create(name="Climatización"), sku="SPLIT-1")
+
+        cls.zone = Zone.objects.create(organization=cls.org, name="Edificio A")
+        cls.device = cls.make_device(cls.zone, "AC-1")
+        cls.retired = cls.make_device(cls.zone, "AC-2", status="INACTIVE")
+        cls.other_device = cls.make_device(Zone.objects.create(organization=cls.other, name="Edificio B"), "AC-3")
+
+        cls.user = cls.make_user("usuario_a", cls.org)
+        cls.former = cls.make_user("ex_usuario_a", cls.org, is_active=False)
+
+    @classmethod
+    def make_device(cls, zone, name, **fields):
+        return Device.objects.create(
+            organization=zone.organization, zone=zone, product=cls.product, name=name, max_power_w=1000, **fields,
+        )
+
+    @classmethod
+    def make_user(cls, username, organization, is_active=True):
+        user = User.objects.create_user(username, password="x", is_active=is_active)
+        Usuario.objects.bulk_create([Usuario(user=user, organization=organization, name="Usuario", phone="911111111")])
+        return user
+
+    def setUp(self):
+        cache.clear()
+
+    def set_active(self, active):
+        with self.captureOnCommitCallbacks(execute=True):
+            job_obj = set_organization_active(self.org, active)
+        run_pending()
+        job_obj.refresh_from_db()
+        return job_obj
+
+    def status(self, *objects):
+        return [type(o).objects.get(pk=o.pk).status for o in objects]
+
+    def test_deactivation_pauses_ingestion_before_the_cascade_runs(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            set_organization_active(self.org, False)
+
+        self.assertIn(self.org.pk, paused_organization_ids())
+        result = ingest_readings([
+            {"device_id": self.device.pk, "energy_kwh": 0.1},
+            {"device_id": self.other_device.pk, "energy_kwh": 0.1},
+        ])
+        self.assertEqual(result["accepted"], 1)
+        self.assertEqual(result["rejected"], [{"index": 0, "reason": "Organización desactivada: ingesta en pausa"}])
+
+    def test_cascade_deactivates_users_devices_and_zones(self):
+        job_obj = self.set_active(False)
+
+        self.assertEqual(job_obj.status, BackgroundJob.Status.DONE)
+        self.assertEqual(
+            {k: job_obj.result[k] for k in ("users", "devices", "zones")}, {"users": 1, "devices": 1, "zones": 1},
+        )
+        self.assertEqual(job_obj.progress, 3)
+        self.assertEqual(self.status(self.device, self.zone, self.other_device), ["INACTIVE", "INACTIVE", "ACTIVE"])
+        self.assertEqual(Device.objects.get(pk=self.device.pk).deleted_at, self.org.deactivated_at)
+        self.assertFalse(User.objects.get(pk=self.user.pk).is_active)
+
+    def test_reactivation_restores_only_what_the_cascade_deactivated(self):
+        self.set_active(False)
+        job_obj = self.set_active(True)
+
+        self.assertEqual(
+            {k: job_obj.result[k] for k in ("users", "devices", "zones")}, {"users": 1, "devices": 1, "zones": 1},
+        )
+        self.assertEqual(self.status(self.device, self.retired, self.zone), ["ACTIVE", "INACTIVE", "ACTIVE"])
+        self.assertTrue(User.objects.get(pk=self.user.pk).is_active)
+        self.assertFalse(User.objects.get(pk=self.former.pk).is_active)
+        self.assertNotIn(self.org.pk, paused_organization_ids())
+
+    def test_stale_job_is_skipped_if_the_state_changed_again(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            set_organization_active(self.org, False)
+        Organization.objects.filter(pk=self.org.pk).update(is_active=True)
+        run_pending()
+
+        job_obj = BackgroundJob.objects.get(kind=DEACTIVATE_JOB)
+        self.assertIn("skipped", job_obj.result)
+        self.assertEqual(self.status(self.device), ["ACTIVE"])
+
+    def test_same_state_enqueues_nothing(self):
+        self.assertIsNone(set_organization_active(self.org, True))
+        self.assertFalse(BackgroundJob.objects.exists())
+
+
+class BackgroundJobTests(TestCase):
+    """Cola de BackgroundJob: reclamo único, errores y tipos registrados."""
+
+    def test_jobs_are_claimed_once(self):
+        job_obj = enqueue("test_failing_job")
+        self.assertTrue(claim(job_obj))
+        self.assertFalse(claim(BackgroundJob.objects.get(pk=job_obj.pk)))
+
+    def test_failures_are_recorded_on_the_job(self):
+        job_obj = enqueue("test_failing_job")
+        with self.assertLogs("organizations.jobs", "ERROR"):
+            self.assertEqual(run_pending(), 1)
+        job_obj.refresh_from_db()
+
+        self.assertEqual(job_obj.status, BackgroundJob.Status.FAILED)
+        self.assertIn("RuntimeError: falla a propósito", job_obj.error)
+        self.assertIsNotNone(job_obj.finished_at)
+
+    def test_unknown_kinds_are_rejected(self):
+        with self.assertRaisesMessage(ValueError, "Tipo de trabajo no registrado: desconocido"):
+            enqueue("desconocido")
+
+
+class TenantCacheTests(TestCase):
+    """Claves de caché versionadas por organización."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_invalidation_only_moves_the_organization_version(self):
+        key_a, key_b = tenant_cache_key(1, "heatmap", "zone", 3), tenant_cache_key(2, "heatmap", "zone", 3)
+        self.assertEqual(key_a, tenant_cache_key(1, "heatmap", "zone", 3))
+
+        invalidate_tenant(1)
+        self.assertNotEqual(tenant_cache_key(1, "heatmap", "zone", 3), key_a)
+        self.assertEqual(tenant_cache_key(2, "heatmap", "zone", 3), key_b)
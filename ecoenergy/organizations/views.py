@@ -6,9 +6,11 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.db.models import Q
 from django.contrib.auth.models import User
-from .models import Usuario
-from django.http import Http404
+from .models import Organization, Usuario
+from .lifecycle import set_organization_active
+from django.http import Http404, JsonResponse
 from .decorators import encargado, cliente_admin
+from ecoenergy.routers import read_replica
 from .utils import filter_by_organization
 from django.core.exceptions import PermissionDenied
 from django.shortcuts import get_object_or_404
@@ -101,6 +103,7 @@ def errors(request, exception=None):
 
 
 @login_required
+@read_replica
 def usuario_list(request):
     # ==== GET SEARCH PARAMETERS ====
     q = (request.GET.get("q") or "").strip()
@@ -253,4 +256,26 @@ def eliminar_usuario(request, pk):
         return JsonResponse({
             'success': False,
             'message': f'❌ Error al eliminar el usuario: {str(e)}'
-        })
\ No newline at end of file
+        })
+
+
+@login_required
+@encargado()
+@require_POST
+def cambiar_estado_organizacion(request, organization_id):
+    """Deactivate/reactivate a whole organization; the cascade runs as a background job."""
+    organization = get_object_or_404(Organization, pk=organization_id)
+    active = request.POST.get('active') in ('1', 'true')
+    job = set_organization_active(organization, active)
+    if job is None:
+        estado = 'activa' if active else 'inactiva'
+        return JsonResponse({
+            'success': False,
+            'message': f'❌ La organización "{organization.name}" ya está {estado}.'
+        })
+    accion = 'reactivada' if active else 'desactivada'
+    return JsonResponse({
+        'success': True,
+        'message': f'✅ Organización "{organization.name}" {accion}. Usuarios, zonas y dispositivos se actualizan en segundo plano.',
+        'job_id': job.pk,
+    })